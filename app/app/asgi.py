@@ -9,8 +9,24 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from asgiref.sync import ThreadSensitiveContext
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
-application = get_asgi_application()
+
+class ASGIApplication(ASGIHandler):
+    """
+    Give every request its own thread for thread-sensitive sync code, as
+    Django 4.0 does. Django 3.2 runs all of it on one process-wide thread,
+    which serialises the database work of concurrent requests.
+    """
+
+    async def __call__(self, scope, receive, send):
+        async with ThreadSensitiveContext():
+            await super().__call__(scope, receive, send)
+
+
+django.setup(set_prefix=False)
+application = ASGIApplication()
@@ -0,0 +1,32 @@
+"""
+Settings for running the test and benchmark suites anywhere.
+
+Uses a local SQLite database and a fast password hasher:
+
+    python manage.py test --settings=app.bench_settings
+"""
+import os
+
+from app.settings import *  # noqa: F401,F403
+from app.settings import BASE_DIR
+
+SECRET_KEY = os.getenv('SECRET_KEY') or 'bench-insecure-secret-key'
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'bench.sqlite3',
+    }
+}
+
+# BENCH_REAL_HASHER=True keeps the production hashers, for benchmarks
+# where hashing cost matters.
+if os.getenv('BENCH_REAL_HASHER', 'False') != 'True':
+    PASSWORD_HASHERS = [
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+    ]
+
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost', 'testserver']
+
+# Load tests send every request from one address.
+THROTTLING = {**THROTTLING, 'RATES': {}}  # noqa: F405
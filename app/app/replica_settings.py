@@ -0,0 +1,27 @@
+"""
+Settings with two local SQLite databases standing in for a primary and
+a read replica, for exercising core.db.routers without PostgreSQL:
+
+    python manage.py test core.tests.test_routers \
+        --settings=app.replica_settings
+
+Nothing replicates between the two files, so the replica only holds
+what is written to it explicitly.
+"""
+from app.bench_settings import *  # noqa: F401,F403
+from app.settings import BASE_DIR, MIDDLEWARE, REPLICA_ROUTING
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'primary.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'replica.sqlite3',
+    },
+}
+
+REPLICA_ROUTING = {**REPLICA_ROUTING, 'REPLICAS': ['replica']}
+DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+MIDDLEWARE = ['core.db.routers.ReplicaPinningMiddleware', *MIDDLEWARE]
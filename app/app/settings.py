@@ -54,6 +54,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,6 +62,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -87,16 +89,54 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# DB_POOL reuses connections from a per-process pool instead of opening
+# one per request; see core/db/backends/postgresql_pool.
+DB_POOL = os.getenv('DB_POOL', 'False') == 'True'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': (
+            'core.db.backends.postgresql_pool' if DB_POOL
+            else 'django.db.backends.postgresql'
+        ),
         'NAME': os.getenv('DB_NAME'),
         'USER': os.getenv('DB_USER'),
         'PASSWORD': os.getenv('DB_PASS'),
         'HOST': os.getenv('DB_HOST'),
+        'POOL': {
+            'MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', 0)),
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'IDLE_TIMEOUT': int(os.getenv('DB_POOL_IDLE_TIMEOUT', 300)),
+            'PRE_PING': os.getenv('DB_POOL_PRE_PING', 'True') == 'True',
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        },
+    }
+}
+
+# Comma-separated hosts of read replicas of the default database. Reads
+# made by requests go to them; see core/db/routers.py.
+DB_REPLICA_HOSTS = [
+    host for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host
+]
+for index, host in enumerate(DB_REPLICA_HOSTS, 1):
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
     }
+
+REPLICA_ROUTING = {
+    'REPLICAS': [f'replica{i}' for i in range(1, len(DB_REPLICA_HOSTS) + 1)],
+    'MAX_LAG': float(os.getenv('DB_REPLICA_MAX_LAG', 5)),
+    'LAG_CHECK_INTERVAL': float(os.getenv('DB_REPLICA_LAG_CHECK_INTERVAL', 1)),
+    'PIN_SECONDS': int(os.getenv('DB_REPLICA_PIN_SECONDS', 10)),
+    'COOKIE_NAME': 'replica_pin',
 }
 
+if REPLICA_ROUTING['REPLICAS']:
+    DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+    MIDDLEWARE.insert(0, 'core.db.routers.ReplicaPinningMiddleware')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -109,13 +149,19 @@ AUTH_PASSWORD_VALIDATORS = [
         'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
     },
     {
-        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+        'NAME': 'core.password_validation.CommonPasswordValidator',
     },
     {
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
     },
 ]
 
+# Compiled by `manage.py build_common_passwords`; until it exists the
+# validator falls back to Django's gzip list.
+COMMON_PASSWORDS_FILE = os.getenv(
+    'COMMON_PASSWORDS_FILE', str(BASE_DIR / 'common-passwords.compiled')
+)
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -145,12 +191,72 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'core.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Reverse proxies in front of the app. Client addresses used by the
+    # throttles are read from X-Forwarded-For only this many hops deep;
+    # with 0 the header is ignored, since any client can set it.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 0)),
+}
+
+# 'session' logs the user into a Django session and returns a token;
+# 'token' only issues or returns the API token, skipping the session row
+# and the last_login update.
+API_LOGIN_MODE = os.getenv('API_LOGIN_MODE', 'session')
+
+# Serve the auth endpoints from users/async_views.py. Only useful when
+# running under ASGI (uvicorn app.asgi:application).
+USERS_ASYNC_VIEWS = os.getenv('USERS_ASYNC_VIEWS', 'False') == 'True'
+
+# Per-process token -> user cache used by CachedTokenAuthentication.
+# Set SHARED_CACHE_ALIAS to a CACHES alias to add a shared tier.
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': int(os.getenv('TOKEN_AUTH_CACHE_SIZE', 10000)),
+    'TTL': int(os.getenv('TOKEN_AUTH_CACHE_TTL', 60)),
+    'SHARED_CACHE_ALIAS': os.getenv('TOKEN_AUTH_SHARED_CACHE'),
+}
+
+# Process pool that hashes and verifies passwords off the request
+# thread. WORKERS = 0 hashes inline.
+PASSWORD_HASHING = {
+    'WORKERS': int(os.getenv('PASSWORD_HASHING_WORKERS', 0)),
+    'MAX_PENDING': int(os.getenv('PASSWORD_HASHING_MAX_PENDING', 32)),
+    'TIMEOUT': float(os.getenv('PASSWORD_HASHING_TIMEOUT', 5)),
+}
+
+# Verification pin storage. core.pins.HmacPinBackend derives pins from
+# an HMAC and a time window instead of storing them; pins then stay
+# valid for between WINDOW and 2 * WINDOW seconds.
+VERIFICATION_PIN = {
+    'BACKEND': os.getenv(
+        'VERIFICATION_PIN_BACKEND', 'core.pins.ModelPinBackend'
+    ),
+    'WINDOW': 12 * 3600,
+}
+
+# Token-bucket throttles for the unauthenticated endpoints, per URL name
+# and per client IP / submitted email. STORE is core.throttling's
+# LocalBucketStore (per process) or CacheBucketStore (shared through the
+# CACHE_ALIAS cache, for multi-node deployments).
+THROTTLING = {
+    'STORE': os.getenv(
+        'THROTTLE_STORE', 'core.throttling.LocalBucketStore'
+    ),
+    'CACHE_ALIAS': os.getenv('THROTTLE_CACHE_ALIAS', 'default'),
+    'LOCK_TIMEOUT': int(os.getenv('THROTTLE_LOCK_TIMEOUT', 1)),
+    'RATES': {
+        'login': {'ip': '30/min', 'email': '10/min'},
+        'register': {'ip': '20/hour', 'email': '5/hour'},
+        'forgot-password': {'ip': '20/hour', 'email': '5/hour'},
+        'resend-verification': {'ip': '20/hour', 'email': '5/hour'},
+        # Limit PIN guessing.
+        'verify-email': {'ip': '30/hour', 'email': '10/hour'},
+        'reset-password': {'ip': '30/hour', 'email': '10/hour'},
+    },
 }
 
 SPECTACULAR_SETTINGS = {
@@ -159,6 +265,87 @@ SPECTACULAR_SETTINGS = {
     'VERSION': '1.0.0',
 }
 
+# Serve /api/schema/ from a schema generated once per code version (by
+# `manage.py generate_schema`, or on the first request) instead of
+# introspecting every view on every request.
+OPENAPI_SCHEMA_CACHE = {
+    'ENABLED': os.getenv('OPENAPI_SCHEMA_CACHE', 'True') == 'True',
+    'FILE': os.getenv(
+        'OPENAPI_SCHEMA_FILE', str(BASE_DIR / 'openapi-schema.json')
+    ),
+    'MAX_AGE': int(os.getenv('OPENAPI_SCHEMA_MAX_AGE', 300)),
+}
+
+# Cached /me payloads served with ETags, see core.payload_cache. Off
+# unless CACHE_ALIAS names a cache shared by every worker.
+USER_PAYLOAD_CACHE = {
+    'ENABLED': os.getenv('USER_PAYLOAD_CACHE', 'True') == 'True',
+    'CACHE_ALIAS': os.getenv('USER_PAYLOAD_CACHE_ALIAS', ''),
+    'TTL': int(os.getenv('USER_PAYLOAD_CACHE_TTL', 60)),
+    'LOCK_TIMEOUT': float(os.getenv('USER_PAYLOAD_CACHE_LOCK_TIMEOUT', 2)),
+}
+
+# Prometheus metrics at /metrics, see core.metrics. Prefork servers
+# need a MULTIPROCESS_DIR shared by their workers. /metrics is only
+# served to scrapers sending TOKEN as a Bearer token, or to anyone with
+# METRICS_PUBLIC=True (for a scrape port not exposed publicly).
+METRICS = {
+    'ENABLED': os.getenv('METRICS_ENABLED', 'True') == 'True',
+    'MULTIPROCESS_DIR': os.getenv('METRICS_MULTIPROCESS_DIR', ''),
+    'FLUSH_INTERVAL': float(os.getenv('METRICS_FLUSH_INTERVAL', 1)),
+    'TOKEN': os.getenv('METRICS_TOKEN', ''),
+    'PUBLIC': os.getenv('METRICS_PUBLIC', 'False') == 'True',
+}
+
+# Request profiling, see core.profiling. Removed from the middleware
+# chain at startup unless enabled.
+PROFILING = {
+    'ENABLED': os.getenv('PROFILING_ENABLED', 'False') == 'True',
+    'DIR': os.getenv('PROFILING_DIR', str(BASE_DIR / 'profiles')),
+    'SAMPLE_RATE': float(os.getenv('PROFILING_SAMPLE_RATE', 0)),
+    'VIEW_MODULES': ['users.views', 'users.async_views'],
+    'HEADER': 'HTTP_X_PROFILE',
+    'TOKEN_MAX_AGE': int(os.getenv('PROFILING_TOKEN_MAX_AGE', 3600)),
+}
+
+# Structured JSON logs, written by a background thread; see
+# core.logging.
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'core.logging.JsonFormatter'},
+    },
+    'filters': {
+        'sample': {
+            '()': 'core.logging.SamplingFilter',
+            'rates': {
+                'users.serializers': float(
+                    os.getenv('LOG_SAMPLE_EMAIL_LOOKUPS', 0.1)
+                ),
+            },
+        },
+        'redact': {'()': 'core.logging.RedactingFilter'},
+    },
+    'handlers': {
+        'queue': {
+            'class': 'core.logging.QueueHandler',
+            'stream': 'ext://sys.stdout',
+            'formatter': 'json',
+            'filters': ['sample', 'redact'],
+        },
+    },
+    'loggers': {
+        'core': {
+            'handlers': ['queue'], 'level': LOG_LEVEL, 'propagate': False,
+        },
+        'users': {
+            'handlers': ['queue'], 'level': LOG_LEVEL, 'propagate': False,
+        },
+    },
+}
+
 AUTHENTICATION_BACKENDS = (
     'django.contrib.auth.backends.ModelBackend',
     'allauth.account.auth_backends.AuthenticationBackend',
@@ -184,11 +371,14 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 if DEBUG:
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 else:
-    EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    EMAIL_BACKEND = 'core.mail.PooledSMTPEmailBackend'
     EMAIL_HOST = os.getenv('EMAIL_HOST')
     EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))
     EMAIL_USE_TLS = True
     EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
     EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
+    # Authenticated SMTP connections kept open per worker process
+    EMAIL_POOL_SIZE = int(os.getenv('EMAIL_POOL_SIZE', 4))
+    EMAIL_POOL_IDLE_TIMEOUT = int(os.getenv('EMAIL_POOL_IDLE_TIMEOUT', 30))
 
 DEFAULT_FROM_EMAIL = os.getenv('EMAIL_HOST_USER')
@@ -13,18 +13,18 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView
-)
+from drf_spectacular.views import SpectacularSwaggerView
 from django.contrib import admin
 from django.urls import path, include
 
+from core.metrics import metrics_view
+from core.schema import CachedSchemaView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path(
         'api/schema/',
-        SpectacularAPIView.as_view(),
+        CachedSchemaView.as_view(),
         name='api-schema'
     ),
     path(
@@ -33,4 +33,5 @@ urlpatterns = [
         name='api-docs'
     ),
     path('api/users/', include('users.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
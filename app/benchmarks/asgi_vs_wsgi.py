@@ -0,0 +1,157 @@
+"""
+Benchmark concurrent-connection capacity of the ASGI and WSGI deployments.
+
+Starts the app under gunicorn (threaded WSGI workers, DRF views) and
+under uvicorn (ASGI, `USERS_ASYNC_VIEWS=True`), then drives the
+`users.loadgen` traffic mix through each at increasing numbers of
+concurrent keep-alive connections and reports throughput, p99 latency
+and error rate per level.
+
+    python benchmarks/asgi_vs_wsgi.py --concurrency 16,64,256 --duration 20
+
+Requires `uvicorn` (requirements.txt) and `gunicorn`
+(requirements.dev.txt). Defaults to app.bench_settings on SQLite with
+the production password hashers; pass `--settings app.settings` to run
+against Postgres, where write-heavy levels are not limited by SQLite's
+single writer.
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+
+def server_command(kind, port, workers, threads):
+    if kind == 'wsgi':
+        return [
+            sys.executable, '-m', 'gunicorn', 'app.wsgi:application',
+            '--bind', f'127.0.0.1:{port}',
+            '--workers', str(workers),
+            '--threads', str(threads),
+            '--worker-class', 'gthread',
+            '--log-level', 'warning',
+        ]
+    return [
+        sys.executable, '-m', 'uvicorn', 'app.asgi:application',
+        '--host', '127.0.0.1',
+        '--port', str(port),
+        '--workers', str(workers),
+        '--log-level', 'warning',
+        '--no-access-log',
+    ]
+
+
+def port_in_use(port):
+    try:
+        socket.create_connection(('127.0.0.1', port), 0.5).close()
+    except OSError:
+        return False
+    return True
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if port_in_use(port):
+            return
+        time.sleep(0.2)
+    raise RuntimeError(f'Server did not start on port {port}')
+
+
+def start_server(kind, args):
+    if port_in_use(args.port):
+        raise RuntimeError(f'Port {args.port} is already in use')
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE=args.settings,
+        USERS_ASYNC_VIEWS='True' if kind == 'asgi' else 'False',
+        PASSWORD_HASHING_WORKERS=str(args.hashing_workers),
+        API_LOGIN_MODE='token',
+    )
+    process = subprocess.Popen(
+        server_command(kind, args.port, args.workers, args.threads),
+        cwd=APP_DIR,
+        env=env,
+    )
+    try:
+        wait_for_port(args.port)
+    except RuntimeError:
+        process.kill()
+        raise
+    return process
+
+
+def summarize(elapsed, rows):
+    """Collapse per-endpoint rows into totals and the worst p99."""
+    total = sum(row['requests'] for row in rows.values())
+    errors = sum(
+        row['requests'] * row['error_rate'] for row in rows.values()
+    )
+    return {
+        'rps': total / elapsed if elapsed else 0.0,
+        'p99_ms': max((row['p99_ms'] for row in rows.values()), default=0),
+        'error_rate': errors / total if total else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--concurrency', default='16,64,256')
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument(
+        '--threads', type=int, default=8,
+        help='Threads per gunicorn worker.'
+    )
+    parser.add_argument('--hashing-workers', type=int, default=2)
+    parser.add_argument('--seed-users', type=int, default=200)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--settings', default='app.bench_settings')
+    args = parser.parse_args()
+
+    os.environ['DJANGO_SETTINGS_MODULE'] = args.settings
+    os.environ.setdefault('BENCH_REAL_HASHER', 'True')
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    from users.loadgen import run_load
+
+    call_command('migrate', verbosity=0)
+    levels = [int(level) for level in args.concurrency.split(',')]
+    base_url = f'http://127.0.0.1:{args.port}'
+
+    print(
+        f'{args.workers} worker(s), {args.threads} WSGI threads, '
+        f'{args.hashing_workers} hashing processes, {args.duration:.0f}s '
+        f'per level'
+    )
+    print(
+        f"{'server':<8}{'conns':>7}{'req/s':>10}{'p99 ms':>10}{'errors':>9}"
+    )
+    for kind in ('wsgi', 'asgi'):
+        process = start_server(kind, args)
+        try:
+            for concurrency in levels:
+                elapsed, rows = run_load(
+                    base_url, concurrency, args.duration,
+                    seed=args.seed_users,
+                )
+                result = summarize(elapsed, rows)
+                print(
+                    f"{kind:<8}{concurrency:>7}{result['rps']:>10.1f}"
+                    f"{result['p99_ms']:>10.1f}{result['error_rate']:>9.1%}"
+                )
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Benchmark per-request logging overhead under a burst.
+
+Each simulated registration logs what `RegisterView` and its helpers
+log: the (redacted) request payload, the user and the queued email,
+plus a sampled email lookup. Threads fire requests back to back and the
+time each request spends logging is compared for:
+
+- print:  the f-string print() calls these sites used to make
+- sync:   a StreamHandler formatting JSON on the calling thread
+- queue:  core.logging.QueueHandler, formatting on a listener thread
+
+Output goes to a line-buffered file in a temporary directory, like
+stdout under PYTHONUNBUFFERED (set in the Dockerfile): one write() per
+line.
+
+    python benchmarks/logging_overhead.py --threads 8 --requests 2000
+
+print() output does not depend on the level.
+"""
+import argparse
+import contextlib
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.logging import (  # noqa: E402
+    JsonFormatter,
+    QueueHandler,
+    RedactingFilter,
+    SamplingFilter,
+)
+
+PAYLOAD = {
+    'email': 'user@example.com',
+    'password': 'testpass123',
+    'name': 'Test Name',
+}
+
+
+def log_request(logger, i):
+    logger.debug('Registration request', extra={'data': PAYLOAD})
+    logging.getLogger('bench.users.serializers').debug(
+        'Checked whether email exists',
+        extra={'email': PAYLOAD['email'], 'exists': False},
+    )
+    logger.info('User registered', extra={'user_id': i})
+    logger.info(
+        'Queueing verification email',
+        extra={'user_id': i, 'from_email': 'noreply@example.com'},
+    )
+
+
+def print_request(i):
+    print(f"Request data: {PAYLOAD}")
+    print("Serializer is valid")
+    print(f"Checking if email {PAYLOAD['email']} exists: False")
+    print(f"User created: {PAYLOAD['email']}")
+    print(
+        f"Queueing email to {PAYLOAD['email']} with subject: "
+        "Verify your email with Darsana from noreply@example.com"
+    )
+
+
+def configure(handler, level):
+    handler.setFormatter(JsonFormatter())
+    handler.addFilter(SamplingFilter({'bench.users.serializers': 0.1}))
+    handler.addFilter(RedactingFilter())
+    logger = logging.getLogger('bench')
+    logger.handlers = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+    return logging.getLogger('bench.users.views')
+
+
+def burst(request, threads, requests):
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(offset):
+        local = []
+        for i in range(requests):
+            start = time.perf_counter()
+            request(offset + i)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    workers = [
+        threading.Thread(target=worker, args=(n * requests,))
+        for n in range(threads)
+    ]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return latencies, time.perf_counter() - start
+
+
+def drain(handler):
+    """Seconds until everything queued has been written."""
+    start = time.perf_counter()
+    handler.flush()
+    return time.perf_counter() - start
+
+
+def run(mode, path, threads, requests, level):
+    dropped = 0
+    with open(path, 'w', buffering=1) as stream:
+        if mode == 'print':
+            with contextlib.redirect_stdout(stream):
+                latencies, elapsed = burst(print_request, threads, requests)
+            written = elapsed
+        else:
+            if mode == 'sync':
+                handler = logging.StreamHandler(stream)
+            else:
+                handler = QueueHandler(stream, maxsize=100000)
+            logger = configure(handler, level)
+            latencies, elapsed = burst(
+                lambda i: log_request(logger, i), threads, requests
+            )
+            written = elapsed + drain(handler)
+            dropped = getattr(handler, 'dropped', 0)
+            handler.close()
+    latencies.sort()
+    return {
+        'p50_us': statistics.median(latencies) * 1e6,
+        'p99_us': latencies[int(len(latencies) * 0.99) - 1] * 1e6,
+        'burst_s': elapsed,
+        'written_s': written,
+        'bytes': os.path.getsize(path),
+        'dropped': dropped,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument(
+        '--level',
+        default='INFO',
+        choices=['DEBUG', 'INFO'],
+        help='LOG_LEVEL; DEBUG also logs the payload and email lookups.'
+    )
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    print(
+        f'{args.threads} threads x {args.requests} requests, {args.level}'
+    )
+    print(
+        f"{'mode':<6} {'p50 us':>8} {'p99 us':>8} {'burst s':>8} "
+        f"{'written s':>9} {'MB':>6} {'dropped':>8}"
+    )
+    for mode in ['print', 'sync', 'queue']:
+        result = run(
+            mode, os.path.join(directory, f'{mode}.log'),
+            args.threads, args.requests, args.level,
+        )
+        print(
+            f"{mode:<6} {result['p50_us']:>8.1f} {result['p99_us']:>8.1f} "
+            f"{result['burst_s']:>8.2f} {result['written_s']:>9.2f} "
+            f"{result['bytes'] / 1e6:>6.1f} {result['dropped']:>8}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark verification mail delivery against a local SMTP stand-in.
+
+Compares Django's stock SMTP backend (one session per message, the
+path `send_mail` takes today) with `core.mail.PooledSMTPEmailBackend`.
+
+    python benchmarks/smtp_transport.py --messages 2000 --threads 4
+
+Requires `aiosmtpd` (requirements.dev.txt). The stand-in has no TLS or
+AUTH, so real-relay savings from pooling are larger than shown here.
+"""
+import argparse
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+
+class SinkHandler:
+    """Accept and drop every message."""
+
+    async def handle_DATA(self, server, session, envelope):
+        return '250 Message accepted for delivery'
+
+
+def run(backend_path, messages, threads):
+    from django.core.mail import get_connection, send_mail
+
+    latencies = []
+    lock = threading.Lock()
+    per_thread = messages // threads
+
+    def worker():
+        local = []
+        for i in range(per_thread):
+            start = time.perf_counter()
+            send_mail(
+                'Verify your email with Darsana',
+                f'Your verification pin is: {i:06d}',
+                'noreply@example.com',
+                [f'user{i}@example.com'],
+                connection=get_connection(backend_path),
+            )
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'messages': len(latencies),
+        'msgs_per_sec': len(latencies) / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8025)
+    args = parser.parse_args()
+
+    from aiosmtpd.controller import Controller
+
+    controller = Controller(
+        SinkHandler(), hostname='127.0.0.1', port=args.port
+    )
+    controller.start()
+
+    settings.configure(
+        EMAIL_HOST='127.0.0.1',
+        EMAIL_PORT=args.port,
+        EMAIL_USE_TLS=False,
+        EMAIL_HOST_USER='',
+        EMAIL_HOST_PASSWORD='',
+        EMAIL_POOL_SIZE=args.threads,
+    )
+    django.setup()
+
+    backends = [
+        ('per-message', 'django.core.mail.backends.smtp.EmailBackend'),
+        ('pooled', 'core.mail.PooledSMTPEmailBackend'),
+    ]
+    print(f'{args.messages} messages, {args.threads} threads')
+    print(f"{'backend':<12} {'msgs/sec':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    try:
+        for name, path in backends:
+            result = run(path, args.messages, args.threads)
+            print(
+                f"{name:<12} {result['msgs_per_sec']:>10.1f} "
+                f"{result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}"
+            )
+    finally:
+        controller.stop()
+
+
+if __name__ == '__main__':
+    main()
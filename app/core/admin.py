@@ -4,15 +4,70 @@ Django admin customizations.
 
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
 from core import models
+from core.authentication import invalidate_user_tokens
+from core.exports import export_response
+from core.payload_cache import invalidate_user_payload
 
 
-class UserAdmin(BaseUserAdmin):
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator that takes the row count of an unfiltered PostgreSQL table
+    from the planner statistics instead of running COUNT(*), once the
+    table is large enough for the exact figure not to matter.
+    """
+    approximate_above = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] > self.approximate_above:
+                return int(row[0])
+        return super().count
+
+
+class CanonicalEmailSearchMixin:
+    """
+    Search on the canonical email column instead of `icontains`: a full
+    address is an equality lookup on the unique index and anything else
+    a prefix match, served on PostgreSQL by the varchar_pattern_ops index
+    on User.email_canonical.
+    """
+    email_canonical_lookup = 'email_canonical'
+
+    def get_search_results(self, request, queryset, search_term):
+        term = models.canonicalize_email(search_term)
+        if not term:
+            return queryset, False
+        lookup = self.email_canonical_lookup
+        if '@' in term and '.' in term.rsplit('@', 1)[1]:
+            return queryset.filter(**{lookup: term}), False
+        return queryset.filter(**{f'{lookup}__startswith': term}), False
+
+
+class UserAdmin(CanonicalEmailSearchMixin, BaseUserAdmin):
     """Define the admin pages for users."""
     ordering = ['id']
-    list_display = ['email', 'name']
+    list_display = ['email', 'name', 'is_active', 'email_verified']
+    list_select_related = ['emailverification']
+    search_fields = ['email_canonical']
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+    actions = ['activate', 'deactivate', 'export_ndjson', 'export_csv']
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         (
@@ -42,5 +97,69 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
+    @admin.display(boolean=True, description=_('Email verified'))
+    def email_verified(self, obj):
+        try:
+            return obj.emailverification.is_verified
+        except ObjectDoesNotExist:
+            return None
+
+    def _set_active(self, queryset, is_active):
+        with transaction.atomic():
+            user_ids = list(queryset.values_list('pk', flat=True))
+            updated = queryset.update(is_active=is_active)
+        # update() bypasses the post_save handlers in core.signals.
+        for user_id in user_ids:
+            invalidate_user_tokens(user_id)
+            invalidate_user_payload(user_id)
+        return updated
+
+    @admin.action(
+        description=_('Activate selected users'),
+        permissions=['change'],
+    )
+    def activate(self, request, queryset):
+        updated = self._set_active(queryset, True)
+        self.message_user(request, _('Activated %d users.') % updated)
+
+    @admin.action(
+        description=_('Deactivate selected users'),
+        permissions=['change'],
+    )
+    def deactivate(self, request, queryset):
+        updated = self._set_active(queryset, False)
+        self.message_user(request, _('Deactivated %d users.') % updated)
+
+    @admin.action(
+        description=_('Export selected users as NDJSON'),
+        permissions=['view'],
+    )
+    def export_ndjson(self, request, queryset):
+        return export_response('ndjson', queryset)
+
+    @admin.action(
+        description=_('Export selected users as CSV'),
+        permissions=['view'],
+    )
+    def export_csv(self, request, queryset):
+        return export_response('csv', queryset)
+
+
+class EmailVerificationAdmin(CanonicalEmailSearchMixin, admin.ModelAdmin):
+    """Admin pages for verification rows; pins are not shown."""
+    ordering = ['-id']
+    list_display = ['user', 'is_verified', 'created_at', 'expires_at']
+    list_select_related = ['user']
+    list_filter = ['is_verified']
+    date_hierarchy = 'created_at'
+    search_fields = ['user__email_canonical']
+    email_canonical_lookup = 'user__email_canonical'
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+    raw_id_fields = ['user']
+    fields = ['user', 'is_verified', 'created_at', 'updated_at', 'expires_at']
+    readonly_fields = ['created_at', 'updated_at']
+
 
 admin.site.register(models.User, UserAdmin)
+admin.site.register(models.EmailVerification, EmailVerificationAdmin)
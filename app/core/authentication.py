@@ -0,0 +1,193 @@
+"""
+Token authentication backed by a token -> user cache.
+
+DRF's TokenAuthentication runs a Token JOIN User query on every request.
+`CachedTokenAuthentication` keeps the result in a bounded per-process
+LRU with a TTL, optionally backed by a shared Django cache so that a
+cold worker does not have to hit the database either. Misses are read
+from the primary, since a lagging replica could still return a revoked
+user. Entries are dropped by the signal handlers in `core.signals` once
+the transaction changing the user or the token commits; dropping them
+earlier would let a concurrent miss cache the old row again. With a
+shared tier every lookup goes through it, so other processes see the
+change at once; without one they only see it once their local TTL runs
+out, so run several workers with a shared tier.
+
+The cached user is a snapshot for authentication only. Views that
+write to the user must load it again with `current_user`.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+
+class TokenUserCache:
+    """LRU + TTL cache of pickled Token objects, keyed by token key."""
+
+    key_prefix = 'tokenauth'
+
+    def __init__(self, max_size, ttl, shared_alias=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared_alias = shared_alias
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def _token_key(self, key):
+        return f'{self.key_prefix}:key:{key}'
+
+    def _user_key(self, user_id):
+        return f'{self.key_prefix}:user:{user_id}'
+
+    def get_local(self, key):
+        """
+        Like `get`, but without I/O. Always None with a shared tier,
+        which alone sees invalidations made by other processes.
+        """
+        if self.shared_alias:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, expires_at, user_id = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return pickle.loads(payload)
+                self._remove(key)
+        return None
+
+    def get(self, key):
+        """Return a fresh copy of the cached token, or None."""
+        if self.shared is None:
+            return self.get_local(key)
+        payload = self.shared.get(self._token_key(key))
+        if payload is None:
+            return None
+        return pickle.loads(payload)
+
+    def set(self, key, token):
+        payload = pickle.dumps(token)
+        if self.shared is None:
+            self._store(key, payload, token.user_id)
+            return
+        self.shared.set_many({
+            self._token_key(key): payload,
+            self._user_key(token.user_id): key,
+        }, timeout=self.ttl)
+
+    def invalidate_user(self, user_id):
+        """Forget every cached token belonging to `user_id`."""
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+        if self.shared is not None:
+            key = self.shared.get(self._user_key(user_id))
+            keys = [self._user_key(user_id)]
+            if key:
+                keys.append(self._token_key(key))
+            self.shared.delete_many(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _store(self, key, payload, user_id):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (
+                payload, time.monotonic() + self.ttl, user_id
+            )
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        _, _, user_id = self._entries.pop(key)
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+
+_token_cache = None
+
+
+def get_token_cache():
+    """Return the process-wide token cache configured in settings."""
+    global _token_cache
+    if _token_cache is None:
+        options = getattr(settings, 'TOKEN_AUTH_CACHE', {})
+        _token_cache = TokenUserCache(
+            max_size=options.get('MAX_SIZE', 10000),
+            ttl=options.get('TTL', 60),
+            shared_alias=options.get('SHARED_CACHE_ALIAS'),
+        )
+    return _token_cache
+
+
+def invalidate_user_tokens(user_id, using=DEFAULT_DB_ALIAS):
+    """Drop the user's cached tokens once the current transaction commits."""
+    transaction.on_commit(
+        lambda: get_token_cache().invalidate_user(user_id), using=using
+    )
+
+
+def current_user(user, using=DEFAULT_DB_ALIAS):
+    """
+    A fresh copy of `user`, which may be a cached snapshot up to a TTL
+    old. Saving the snapshot would write its stale fields back. It is
+    read from the primary, or from wherever the router sends reads if
+    `using` is None.
+    """
+    manager = type(user)._default_manager.db_manager(using)
+    try:
+        user = manager.get(pk=user.pk)
+    except ObjectDoesNotExist:
+        user = None
+    if user is None or not user.is_active:
+        raise AuthenticationFailed(_('User inactive or deleted.'))
+    return user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that skips the database on cache hits."""
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        token = cache.get(key)
+        if token is None:
+            token = self._load_token(key)
+            cache.set(key, token)
+        elif not token.user.is_active:
+            cache.invalidate_user(token.user_id)
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return (token.user, token)
+
+    def _load_token(self, key):
+        model = self.get_model()
+        try:
+            token = model.objects.using(DEFAULT_DB_ALIAS).select_related(
+                'user'
+            ).get(key=key)
+        except model.DoesNotExist:
+            raise AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return token
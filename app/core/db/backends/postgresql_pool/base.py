@@ -0,0 +1,63 @@
+"""
+PostgreSQL backend that reuses connections from a per-process pool.
+
+Django opens a connection on a thread's first query and closes it at the
+end of the request (with the default CONN_MAX_AGE of 0). This backend
+takes the connection from the pool instead and returns it on close, so
+a request only pays for the connection and authentication when the pool
+has to grow. It works the same for WSGI worker threads and for the
+threads `sync_to_async` runs database work in under ASGI.
+
+The pool is configured with a `POOL` dict next to the usual settings:
+
+    'POOL': {
+        'MIN_SIZE': 0,         # idle connections never closed for age
+        'MAX_SIZE': 10,        # connections per process
+        'IDLE_TIMEOUT': 300,   # seconds before an idle connection closes
+        'PRE_PING': True,      # SELECT 1 before handing a connection out
+        'TIMEOUT': 10,         # seconds to wait for a free connection
+    }
+"""
+from django.db.backends.postgresql import base
+from django.db.backends.base.base import NO_DB_ALIAS
+
+from .creation import DatabaseCreation
+from .pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    _pool = None
+
+    def get_new_connection(self, conn_params):
+        # Connections to the maintenance database (test database
+        # creation) are short-lived and must not linger in a pool.
+        if self.alias == NO_DB_ALIAS:
+            return super().get_new_connection(conn_params)
+
+        self._pool = get_pool(
+            self.alias, conn_params, self.settings_dict.get('POOL', {})
+        )
+        connection = self._pool.get(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            )
+        )
+        # Set by get_new_connection() on the wrapper that opened it.
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        pool, self._pool = self._pool, None
+        if pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            if self.in_atomic_block:
+                # Django keeps using this connection object until the
+                # atomic block exits, so it cannot be handed to others.
+                pool.discard(self.connection)
+            else:
+                pool.put(self.connection)
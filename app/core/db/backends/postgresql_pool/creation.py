@@ -0,0 +1,22 @@
+from django.db.backends.postgresql import creation
+
+from .pool import close_pools
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """
+    Close the pools before statements that fail while other sessions
+    are connected to the database being dropped or used as a template.
+    """
+
+    def _execute_create_test_db(self, cursor, parameters, keepdb=False):
+        close_pools()
+        super()._execute_create_test_db(cursor, parameters, keepdb)
+
+    def _clone_test_db(self, suffix, verbosity, keepdb=False):
+        close_pools()
+        super()._clone_test_db(suffix, verbosity, keepdb)
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
@@ -0,0 +1,265 @@
+"""
+Thread-safe pool of psycopg2 connections.
+
+One pool exists per process for each database alias and set of
+connection parameters. Idle connections are handed out most recently
+used first, so the oldest ones age past `idle_timeout` and are closed,
+down to `min_size`. With `pre_ping` a connection is checked with
+`SELECT 1` before it is handed out, which costs one round trip instead
+of the several a new, authenticated connection needs. Sizes and waits
+of the pools are exported at /metrics as `db_pool_*`, by alias.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+from core import metrics
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """No connection became available within the pool timeout."""
+
+
+class ConnectionPool:
+
+    def __init__(self, alias, min_size=0, max_size=10, idle_timeout=300,
+                 pre_ping=True, timeout=10):
+        self.alias = alias
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.pre_ping = pre_ping
+        self.timeout = timeout
+        self.closed = False
+        self._size = 0
+        self._idle = deque()  # (connection, returned at)
+        self._cond = threading.Condition()
+        self._stats = dict.fromkeys([
+            'checkouts', 'opened', 'closed', 'waits', 'timeouts',
+            'ping_failures',
+        ], 0)
+        self._stats.update(wait_seconds_total=0.0, wait_seconds_max=0.0)
+
+    def get(self, connect):
+        """
+        Return an idle connection, or one opened with `connect()` while
+        the pool is below `max_size`. Otherwise wait up to `timeout`
+        seconds for one to be returned.
+        """
+        wait_start = None
+        while True:
+            with self._cond:
+                self._reap()
+                if self._idle:
+                    connection, _ = self._idle.pop()
+                elif self._size < self.max_size:
+                    connection = None
+                    self._size += 1
+                else:
+                    now = time.monotonic()
+                    if wait_start is None:
+                        wait_start = now
+                        self._stats['waits'] += 1
+                    remaining = wait_start + self.timeout - now
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        self._record_wait(now - wait_start)
+                        raise PoolTimeout(
+                            f'No connection available in the {self.alias} '
+                            f'pool within {self.timeout}s '
+                            f'(max_size={self.max_size}).'
+                        )
+                    self._cond.wait(remaining)
+                    continue
+                if wait_start is not None:
+                    self._record_wait(time.monotonic() - wait_start)
+                    wait_start = None
+
+            if connection is None:
+                try:
+                    connection = connect()
+                except BaseException:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats['opened'] += 1
+                    self._stats['checkouts'] += 1
+                return connection
+            if not self.pre_ping or self._ping(connection):
+                with self._cond:
+                    self._stats['checkouts'] += 1
+                return connection
+            with self._cond:
+                self._stats['ping_failures'] += 1
+            self.discard(connection)
+
+    def put(self, connection):
+        """Return a connection, rolling back any open transaction."""
+        if not self.closed and self._reset(connection):
+            with self._cond:
+                if not self.closed:
+                    self._idle.append((connection, time.monotonic()))
+                    self._cond.notify()
+                    return
+        self.discard(connection)
+
+    def discard(self, connection):
+        """Close a checked-out connection and free its slot."""
+        with self._cond:
+            self._size -= 1
+            self._stats['closed'] += 1
+            self._cond.notify()
+        self._close(connection)
+
+    def close(self):
+        """Close the idle connections; the rest are closed when returned."""
+        with self._cond:
+            self.closed = True
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._stats['closed'] += len(idle)
+            self._cond.notify_all()
+        for connection in idle:
+            self._close(connection)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'alias': self.alias,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                **self._stats,
+            }
+
+    def _record_wait(self, waited):
+        self._stats['wait_seconds_total'] += waited
+        self._stats['wait_seconds_max'] = max(
+            self._stats['wait_seconds_max'], waited
+        )
+
+    def _reap(self):
+        # Called with the lock held; closing is cheap enough not to
+        # bother releasing it.
+        limit = time.monotonic() - self.idle_timeout
+        while (self._idle and self._size > self.min_size
+               and self._idle[0][1] < limit):
+            connection, _ = self._idle.popleft()
+            self._size -= 1
+            self._stats['closed'] += 1
+            self._close(connection)
+
+    def _ping(self, connection):
+        if connection.closed:
+            return False
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except psycopg2.Error:
+            return False
+        return True
+
+    def _reset(self, connection):
+        if connection.closed:
+            return False
+        status = connection.info.transaction_status
+        if status == extensions.TRANSACTION_STATUS_IDLE:
+            return True
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        try:
+            connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pid = os.getpid()
+# Pools inherited over fork(). Their sockets belong to the parent, so
+# they are kept referenced rather than closed or garbage collected.
+_inherited = []
+
+
+def get_pool(alias, conn_params, options):
+    """Return this process's pool for `alias` and `conn_params`."""
+    global _pid
+    key = (alias, repr(sorted(conn_params.items())))
+    with _pools_lock:
+        if _pid != os.getpid():
+            _inherited.extend(_pools.values())
+            _pools.clear()
+            _pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(
+                alias,
+                min_size=options.get('MIN_SIZE', 0),
+                max_size=options.get('MAX_SIZE', 10),
+                idle_timeout=options.get('IDLE_TIMEOUT', 300),
+                pre_ping=options.get('PRE_PING', True),
+                timeout=options.get('TIMEOUT', 10),
+            )
+        return pool
+
+
+def close_pools():
+    """Close every pool in this process, e.g. before dropping a database."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats():
+    """Counters of this process's open pools, by alias."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.alias: pool.stats() for pool in pools}
+
+
+POOL_METRICS = [
+    ('db_pool_size', 'gauge', 'size',
+     'Connections open or being opened by the pool.'),
+    ('db_pool_idle_connections', 'gauge', 'idle',
+     'Open connections waiting in the pool.'),
+    ('db_pool_in_use_connections', 'gauge', 'in_use',
+     'Connections checked out of the pool.'),
+    ('db_pool_waits_total', 'counter', 'waits',
+     'Checkouts that had to wait for a connection to be returned.'),
+    ('db_pool_timeouts_total', 'counter', 'timeouts',
+     'Checkouts that gave up waiting for a connection.'),
+    ('db_pool_wait_seconds_total', 'counter', 'wait_seconds_total',
+     'Time spent waiting for a connection to be returned.'),
+]
+
+
+def collect_metrics():
+    """`pool_stats` as metric families labelled by alias."""
+    stats = pool_stats()
+    return {
+        name: metrics.family(metric_type, documentation, ['alias'], {
+            (alias,): pool[key] for alias, pool in stats.items()
+        })
+        for name, metric_type, key, documentation in POOL_METRICS
+    }
+
+
+metrics.registry.register_collector(collect_metrics)
@@ -0,0 +1,43 @@
+"""
+Migration operations for large tables.
+"""
+from django.contrib.postgres import operations
+from django.db.migrations import AddIndex
+
+
+class AddIndexConcurrently(operations.AddIndexConcurrently):
+    """
+    Build the index with CREATE INDEX CONCURRENTLY on PostgreSQL, so
+    writes to the table are not blocked, and with a plain CREATE INDEX
+    elsewhere. The migration must set `atomic = False`.
+
+    A failed concurrent build leaves an invalid index behind, so any
+    index with the same name is dropped first.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            AddIndex.database_forwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+            return
+        self._ensure_not_in_transaction(schema_editor)
+        schema_editor.execute(
+            'DROP INDEX CONCURRENTLY IF EXISTS '
+            f'{schema_editor.quote_name(self.index.name)}'
+        )
+        super().database_forwards(
+            app_label, schema_editor, from_state, to_state
+        )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            AddIndex.database_backwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+            return
+        super().database_backwards(
+            app_label, schema_editor, from_state, to_state
+        )
@@ -0,0 +1,161 @@
+"""
+Read-replica routing with read-your-writes pinning.
+
+With `REPLICA_ROUTING['REPLICAS']` set, `ReplicaRouter` sends reads made
+while handling a request to one of the replicas and everything else to
+'default':
+
+- A request that has written (anything routed through `db_for_write`)
+  is pinned to the primary for the rest of the request, and
+  `ReplicaPinningMiddleware` sets a cookie that pins the client's
+  requests for the next `PIN_SECONDS`, so it reads its own writes.
+- Reads inside a transaction on the primary stay on the primary.
+- A replica more than `MAX_LAG` seconds behind, or unreachable, is
+  skipped for `LAG_CHECK_INTERVAL` seconds. A replica that has replayed
+  all the WAL it received has no lag, however long ago the last write
+  on the primary was; otherwise lag is the age of the last replayed
+  transaction.
+- Code outside a request (management commands, the outbox worker)
+  always uses the primary.
+"""
+import asyncio
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+_state = ContextVar('replica_routing_state', default=None)
+_health = {}  # alias -> (checked at, healthy)
+_health_lock = threading.Lock()
+
+
+def get_options():
+    return getattr(settings, 'REPLICA_ROUTING', {})
+
+
+class RoutingState:
+    """Routing decisions of one request, shared with its threads."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+
+def replica_lag(alias):
+    """Seconds the replica `alias` is behind its primary."""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        # now() - pg_last_xact_replay_timestamp() alone grows while the
+        # primary is idle, sending every read to the primary when the
+        # load is lowest.
+        cursor.execute(
+            'SELECT CASE WHEN pg_last_wal_receive_lsn() = '
+            'pg_last_wal_replay_lsn() THEN 0 ELSE COALESCE(EXTRACT(EPOCH '
+            'FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+        )
+        return float(cursor.fetchone()[0])
+
+
+def is_healthy(alias):
+    """
+    Whether `alias` is reachable and within MAX_LAG. Checked at most
+    every LAG_CHECK_INTERVAL seconds per process.
+    """
+    options = get_options()
+    now = time.monotonic()
+    checked = _health.get(alias)
+    if checked and now - checked[0] < options.get('LAG_CHECK_INTERVAL', 1):
+        return checked[1]
+    try:
+        healthy = replica_lag(alias) <= options.get('MAX_LAG', 5)
+    except DatabaseError:
+        healthy = False
+    with _health_lock:
+        _health[alias] = (now, healthy)
+    return healthy
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.pinned:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            healthy = [
+                alias for alias in get_options().get('REPLICAS', [])
+                if is_healthy(alias)
+            ]
+            state.replica = random.choice(healthy) if healthy else ''
+        return state.replica or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_options().get('REPLICAS', [])}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """
+    Give each request its routing state, pinned to the primary while the
+    client's pin cookie lasts, and renew the cookie when it writes.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark the instance as a coroutine function, as Django's
+            # MiddlewareMixin does, so that ASGI requests stay async.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        state = RoutingState(pinned=self.cookie in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.process_response(state, response)
+
+    async def __acall__(self, request):
+        state = RoutingState(pinned=self.cookie in request.COOKIES)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.process_response(state, response)
+
+    @property
+    def cookie(self):
+        return get_options().get('COOKIE_NAME', 'replica_pin')
+
+    def process_response(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                self.cookie, '1',
+                max_age=get_options().get('PIN_SECONDS', 10),
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,217 @@
+"""
+Password hashing on a dedicated process pool.
+
+PBKDF2 holds the GIL for hundreds of milliseconds, so hashing on the
+request thread stalls every other request served by the same worker.
+With `PASSWORD_HASHING['WORKERS']` > 0 hashes are computed in a fixed
+size process pool instead; at most `MAX_PENDING` hashes may be queued
+or running per worker and each waits at most `TIMEOUT` seconds. With
+0 workers everything runs inline, exactly like `user.set_password`.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core.metrics import PASSWORD_HASH_SECONDS
+
+
+class HashingUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Server is busy, please try again shortly.'
+    default_code = 'hashing_unavailable'
+
+
+def _init_worker(parent_pid):
+    import django
+    django.setup()
+    threading.Thread(
+        target=_exit_with_parent, args=(parent_pid,), daemon=True
+    ).start()
+
+
+def _exit_with_parent(parent_pid):
+    # A parent killed by a signal (uvicorn re-raises SIGTERM after its
+    # graceful shutdown) never shuts the pool down, and orphaned workers
+    # would keep its inherited listening socket open.
+    while os.getppid() == parent_pid:
+        time.sleep(1)
+    os._exit(0)
+
+
+def _make_password(password):
+    return hashers.make_password(password)
+
+
+def _check_password(password, encoded):
+    return hashers.check_password(password, encoded)
+
+
+OPERATIONS = {_make_password: 'make', _check_password: 'check'}
+
+
+def create_pool(workers):
+    """Process pool whose workers have Django set up."""
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(os.getpid(),),
+    )
+
+
+class HashingExecutor:
+    """Runs hashing functions on a lazily created process pool."""
+
+    def __init__(self, workers, max_pending, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pool_pid = None
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = create_pool(self.workers)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _submit(self, fn, *args):
+        """
+        Submit `fn(*args)` with a slot already acquired. The slot is
+        released when the job finishes, not when the caller gives up
+        waiting for it, so `MAX_PENDING` caps the work in the pool.
+        """
+        try:
+            future = self._get_pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda future: self._slots.release())
+        return future
+
+    def run(self, fn, *args):
+        """Run `fn(*args)` in the pool, or inline when it is disabled."""
+        with PASSWORD_HASH_SECONDS.time(OPERATIONS.get(fn, fn.__name__)):
+            return self._run(fn, *args)
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HashingUnavailable()
+        future = self._submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise HashingUnavailable()
+
+    async def arun(self, fn, *args):
+        """Awaitable `run` that does not hold a thread while hashing."""
+        with PASSWORD_HASH_SECONDS.time(OPERATIONS.get(fn, fn.__name__)):
+            return await self._arun(fn, *args)
+
+    async def _arun(self, fn, *args):
+        if not self.workers:
+            return await sync_to_async(fn, thread_sensitive=False)(*args)
+        deadline = time.monotonic() + self.timeout
+        while not self._slots.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                raise HashingUnavailable()
+            await asyncio.sleep(0.005)
+        future = asyncio.wrap_future(self._submit(fn, *args))
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise HashingUnavailable()
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_executor = None
+
+
+def get_executor():
+    """Return the process-wide executor configured in settings."""
+    global _executor
+    if _executor is None:
+        options = getattr(settings, 'PASSWORD_HASHING', {})
+        _executor = HashingExecutor(
+            workers=options.get('WORKERS', 0),
+            max_pending=options.get('MAX_PENDING', 32),
+            timeout=options.get('TIMEOUT', 5),
+        )
+    return _executor
+
+
+def make_password(password):
+    return get_executor().run(_make_password, password)
+
+
+def set_password(user, raw_password):
+    """Equivalent of `user.set_password` that hashes in the pool."""
+    if raw_password is None:
+        user.set_unusable_password()
+        return
+    user.password = make_password(raw_password)
+    user._password = raw_password
+
+
+def verify_password(user, raw_password):
+    """
+    Equivalent of `user.check_password` that verifies in the pool.
+    Hashes made with outdated parameters are upgraded and saved.
+    """
+    encoded = user.password
+    if not get_executor().run(_check_password, raw_password, encoded):
+        return False
+
+    preferred = hashers.get_hasher('default')
+    hasher = hashers.identify_hasher(encoded)
+    if (hasher.algorithm != preferred.algorithm
+            or preferred.must_update(encoded)):
+        set_password(user, raw_password)
+        user.save(update_fields=['password'])
+    return True
+
+
+async def amake_password(password):
+    return await get_executor().arun(_make_password, password)
+
+
+async def aset_password(user, raw_password):
+    """Async `set_password`."""
+    if raw_password is None:
+        user.set_unusable_password()
+        return
+    user.password = await amake_password(raw_password)
+    user._password = raw_password
+
+
+async def averify_password(user, raw_password):
+    """Async `verify_password`."""
+    encoded = user.password
+    if not await get_executor().arun(_check_password, raw_password, encoded):
+        return False
+
+    preferred = hashers.get_hasher('default')
+    hasher = hashers.identify_hasher(encoded)
+    if (hasher.algorithm != preferred.algorithm
+            or preferred.must_update(encoded)):
+        await aset_password(user, raw_password)
+        await sync_to_async(user.save)(update_fields=['password'])
+    return True
@@ -0,0 +1,189 @@
+"""
+Structured logging that keeps formatting and I/O off the request thread.
+
+`QueueHandler` puts records on a bounded queue that a `QueueListener`
+thread formats and writes to a stream. Filters on the handler still run
+on the calling thread, so `SamplingFilter` drops records before they
+cost anything more and `RedactingFilter` copies the structured fields it
+cleans, which also protects them from later mutation. When the queue is
+full, records are dropped and counted rather than blocking the request.
+
+Log structured data as `extra` fields, not by formatting it into the
+message, so that `JsonFormatter` emits it as JSON and sensitive fields
+can be redacted:
+
+    logger.info('Registration rejected', extra={'errors': errors})
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import weakref
+from collections.abc import Mapping
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler as BaseQueueHandler
+from logging.handlers import QueueListener
+
+REDACTED = '[redacted]'
+SENSITIVE_FIELDS = frozenset({
+    'password', 'password1', 'password2', 'old_password', 'new_password',
+    'verification_pin', 'pin', 'token', 'key', 'secret', 'authorization',
+})
+# Attributes every LogRecord has; anything else came in through `extra`.
+RECORD_ATTRS = frozenset(
+    logging.LogRecord('', 0, '', 0, '', None, None).__dict__
+) | {'message', 'asctime'}
+
+
+def extra_fields(record):
+    return {
+        name: value for name, value in record.__dict__.items()
+        if name not in RECORD_ATTRS
+    }
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the `extra` fields at top level."""
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(
+                record.created, timezone.utc
+            ).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            **extra_fields(record),
+        }
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            data['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(data, default=str)
+
+
+def redact(value, fields):
+    """Copy of `value` with the values of sensitive keys replaced."""
+    if isinstance(value, Mapping):
+        return {
+            key: REDACTED if str(key).lower() in fields
+            else redact(item, fields)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(item, fields) for item in value]
+    return value
+
+
+class RedactingFilter(logging.Filter):
+    """Redact sensitive keys in `extra` fields and mapping arguments."""
+
+    def __init__(self, fields=SENSITIVE_FIELDS):
+        super().__init__()
+        self.fields = frozenset(field.lower() for field in fields)
+
+    def filter(self, record):
+        for name, value in extra_fields(record).items():
+            if name.lower() in self.fields:
+                setattr(record, name, REDACTED)
+            elif isinstance(value, (Mapping, list, tuple)):
+                setattr(record, name, redact(value, self.fields))
+        if isinstance(record.args, Mapping):
+            record.args = redact(record.args, self.fields)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a fraction of the records below WARNING from some loggers.
+    `rates` maps logger names to the fraction kept; a rate applies to
+    the logger's children too, and the most specific name wins.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = dict(rates or {})
+
+    def rate(self, name):
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        return random.random() < self.rate(record.name)
+
+
+class QueueHandler(BaseQueueHandler):
+    """
+    Queue records for a listener thread that writes them to `stream`
+    with this handler's formatter. Up to `maxsize` records are buffered.
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.target = logging.StreamHandler(stream)
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        _handlers.add(self)
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # The stdlib formats and copies the record here, on the calling
+        # thread. The listener formats instead, and JsonFormatter does
+        # not change the record, so it is queued as it is.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Wait until the listener has written every queued record."""
+        if self.listener._thread is not None:
+            self.queue.join()
+        self.target.flush()
+
+    def close(self):
+        if self.listener._thread is not None:
+            self.listener.stop()
+        self.target.close()
+        _handlers.discard(self)
+        super().close()
+
+    def after_fork(self):
+        # The listener thread does not survive fork() and the queue's
+        # locks may have been held by it, so the child starts afresh.
+        self.queue = queue.Queue(self.maxsize)
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+
+
+_handlers = weakref.WeakSet()
+
+
+def _restart_after_fork():
+    for handler in list(_handlers):
+        handler.after_fork()
+
+
+def _stop_listeners():
+    for handler in list(_handlers):
+        handler.close()
+
+
+atexit.register(_stop_listeners)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
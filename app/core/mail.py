@@ -0,0 +1,158 @@
+"""
+Pooled SMTP email backend.
+
+Django's SMTP backend opens a new TCP+TLS+AUTH session for every
+`send_mail` call. This backend keeps a bounded pool of authenticated
+connections per worker process and hands them out instead.
+"""
+import os
+import smtplib
+import ssl
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail.backends.smtp import EmailBackend
+
+
+class SMTPConnectionPool:
+    """Bounded pool of open SMTP connections for one relay."""
+
+    def __init__(self, max_size, idle_timeout, wait_timeout):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        # (connection, last_used) pairs, most recently used last.
+        self._idle = []
+
+    def acquire(self):
+        """Reserve a slot, returning an idle connection if one is fresh."""
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            raise smtplib.SMTPException(
+                'Timed out waiting for a pooled SMTP connection.'
+            )
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                connection, last_used = self._idle.pop()
+            if now - last_used <= self.idle_timeout:
+                return connection
+            # The relay has most likely dropped it already.
+            _quit(connection)
+
+    def release(self, connection):
+        """Return a healthy connection to the pool and free its slot."""
+        with self._lock:
+            self._idle.append((connection, time.monotonic()))
+        self._slots.release()
+
+    def discard(self, connection):
+        """Drop a broken connection and free its slot."""
+        _quit(connection)
+        self._slots.release()
+
+    def cancel(self):
+        """Free a slot reserved by `acquire` that was never connected."""
+        self._slots.release()
+
+    def clear(self):
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            _quit(connection)
+
+
+def _quit(connection):
+    try:
+        connection.quit()
+    except (ssl.SSLError, smtplib.SMTPException, OSError):
+        connection.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(key, max_size, idle_timeout, wait_timeout):
+    """Return the process-wide pool for `key`, creating it if needed."""
+    global _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # Forked worker: sockets inherited from the parent are shared
+            # with it and must not be reused here.
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = SMTPConnectionPool(
+                max_size, idle_timeout, wait_timeout
+            )
+        return pool
+
+
+class PooledSMTPEmailBackend(EmailBackend):
+    """SMTP backend that borrows connections from a per-process pool."""
+
+    def __init__(self, pool_size=None, idle_timeout=None, wait_timeout=None,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.pool = get_pool(
+            (self.host, self.port, self.username, self.use_tls, self.use_ssl),
+            pool_size or getattr(settings, 'EMAIL_POOL_SIZE', 4),
+            idle_timeout or getattr(settings, 'EMAIL_POOL_IDLE_TIMEOUT', 30),
+            wait_timeout or getattr(settings, 'EMAIL_POOL_WAIT_TIMEOUT', 10),
+        )
+
+    def open(self):
+        if self.connection:
+            return False
+        connection = self.pool.acquire()
+        if connection is not None:
+            self.connection = connection
+            return True
+        try:
+            created = super().open()
+        except BaseException:
+            self.pool.cancel()
+            raise
+        if not created:
+            # Failed silently, nothing was checked out.
+            self.pool.cancel()
+        return created
+
+    def close(self):
+        """Give the connection back to the pool instead of quitting."""
+        if self.connection is None:
+            return
+        connection, self.connection = self.connection, None
+        self.pool.release(connection)
+
+    def send_messages(self, email_messages):
+        opened = self.connection is None
+        try:
+            return super().send_messages(email_messages)
+        except BaseException:
+            # Django only closes connections it opened after a clean run.
+            # The session is in an unknown state, so drop it rather than
+            # pool it, and free its slot.
+            if opened and self.connection is not None:
+                connection, self.connection = self.connection, None
+                self.pool.discard(connection)
+            raise
+
+    def _send(self, email_message):
+        try:
+            return super()._send(email_message)
+        except smtplib.SMTPServerDisconnected:
+            # A pooled connection went stale between uses; reconnect once.
+            connection, self.connection = self.connection, None
+            self.pool.discard(connection)
+            if not self.open():
+                raise
+            return super()._send(email_message)
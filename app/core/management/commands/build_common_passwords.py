@@ -0,0 +1,51 @@
+"""
+Django command to compile a common-password list for the validator
+"""
+from typing import Any
+from django.conf import settings
+from django.contrib.auth.password_validation import (
+    CommonPasswordValidator as DjangoCommonPasswordValidator,
+)
+from django.core.management.base import BaseCommand, CommandError
+
+from core.password_validation import compile_word_list, read_word_list
+
+
+class Command(BaseCommand):
+    """Django command to build the compiled common-password list"""
+
+    help = (
+        'Compile a word list (one password per line, optionally gzipped) '
+        'into the sorted file memory-mapped by '
+        'core.password_validation.CommonPasswordValidator. Defaults to '
+        "Django's own list and settings.COMMON_PASSWORDS_FILE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source',
+            nargs='?',
+            default=str(
+                DjangoCommonPasswordValidator.DEFAULT_PASSWORD_LIST_PATH
+            ),
+        )
+        parser.add_argument('--output', default=None)
+
+    def handle(self, *args: Any, **options: Any):
+        """Entrypoint for command"""
+        output = options['output'] or getattr(
+            settings, 'COMMON_PASSWORDS_FILE', None
+        )
+        if not output:
+            raise CommandError(
+                'Pass --output or set settings.COMMON_PASSWORDS_FILE.'
+            )
+        try:
+            count = compile_word_list(
+                read_word_list(options['source']), output
+            )
+        except (OSError, UnicodeError) as e:
+            raise CommandError(f'Cannot compile word list: {e}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {count} passwords to {output}'
+        ))
@@ -0,0 +1,43 @@
+"""
+Django command to precompute the cached OpenAPI schema
+"""
+from typing import Any
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.schema import build_schema_file
+
+
+class Command(BaseCommand):
+    """Django command to write the schema served by CachedSchemaView"""
+
+    help = (
+        'Generate the OpenAPI schema into OPENAPI_SCHEMA_CACHE["FILE"] '
+        'unless the file already matches the current code.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None)
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate even if the file is up to date.'
+        )
+
+    def handle(self, *args: Any, **options: Any):
+        """Entrypoint for command"""
+        path = options['output'] or getattr(
+            settings, 'OPENAPI_SCHEMA_CACHE', {}
+        ).get('FILE')
+        if not path:
+            raise CommandError(
+                'Pass --output or set OPENAPI_SCHEMA_CACHE["FILE"].'
+            )
+        try:
+            _, generated = build_schema_file(path, force=options['force'])
+        except OSError as e:
+            raise CommandError(f'Cannot write {path}: {e}')
+        if generated:
+            self.stdout.write(self.style.SUCCESS(f'Wrote schema to {path}'))
+        else:
+            self.stdout.write(f'Schema in {path} is up to date.')
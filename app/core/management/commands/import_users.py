@@ -0,0 +1,243 @@
+"""
+Django command to bulk import users from CSV or NDJSON
+"""
+import csv
+import json
+import os
+import sys
+import time
+from datetime import timedelta
+from itertools import islice
+from typing import Any
+
+from django.contrib.auth import get_user_model, hashers
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from core.hashing import create_pool
+from core.models import EmailVerification, canonicalize_email, generate_pin
+from core.pins import ModelPinBackend, get_pin_backend
+
+
+def read_rows(stream, fmt):
+    """Yield one dict per input record without reading ahead."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield record if isinstance(record, dict) else {}
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    """Django command to stream users into the database in batches"""
+
+    help = (
+        'Import users from CSV or NDJSON records with an email and either '
+        'a plain "password" or an already hashed "password_hash", plus an '
+        'optional "name". Passwords are hashed on a process pool while the '
+        'previous batch is inserted. Existing or repeated emails and '
+        'invalid records are skipped. No verification emails are sent.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default='-',
+            help='Input file, or - to read standard input.'
+        )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'ndjson'],
+            help='Input format. Defaults to the file extension, or ndjson.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--hashing-workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Hashing processes; 0 hashes in this process.'
+        )
+        parser.add_argument(
+            '--active',
+            action='store_true',
+            help='Import users as already verified.'
+        )
+
+    def handle(self, *args: Any, **options: Any):
+        """Entrypoint for command"""
+        path = options['path']
+        fmt = options['format'] or (
+            'csv' if path.lower().endswith('.csv') else 'ndjson'
+        )
+        self.active = options['active']
+        # Pins of other backends are not stored on EmailVerification rows.
+        self.create_verifications = not self.active and isinstance(
+            get_pin_backend(), ModelPinBackend
+        )
+        self.counts = {'created': 0, 'duplicate': 0, 'invalid': 0}
+        self.workers = options['hashing_workers']
+        self.pool = create_pool(self.workers) if self.workers else None
+
+        try:
+            if path == '-':
+                self.run(read_rows(sys.stdin, fmt), options['batch_size'])
+            else:
+                try:
+                    stream = open(path, newline='', encoding='utf-8')
+                except OSError as e:
+                    raise CommandError(f'Cannot read {path}: {e}')
+                with stream:
+                    self.run(read_rows(stream, fmt), options['batch_size'])
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+
+    def run(self, rows, batch_size):
+        self.started = time.monotonic()
+        # Hash batch N while batch N-1 is written, so at most two
+        # batches are held in memory.
+        pending = None
+        for batch in batches(rows, batch_size):
+            prepared = self.prepare(batch, pending)
+            if pending is not None:
+                self.insert(*pending)
+            pending = prepared
+        if pending is not None:
+            self.insert(*pending)
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.counts['created']} users, skipped "
+            f"{self.counts['duplicate']} duplicates and "
+            f"{self.counts['invalid']} invalid records in {elapsed:.2f}s "
+            f"({self.rate():.0f} rows/sec)"
+        ))
+
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        total = sum(self.counts.values())
+        return total / elapsed if elapsed else total
+
+    def prepare(self, batch, pending):
+        """Validate and dedupe a batch and start hashing its passwords."""
+        User = get_user_model()
+        seen = set(pending[0]) if pending is not None else set()
+        records = {}
+        for row in batch:
+            email = User.objects.normalize_email(
+                str(row.get('email') or '').strip()
+            )
+            try:
+                validate_email(email)
+                password_hash = row.get('password_hash') or None
+                if password_hash:
+                    hashers.identify_hasher(password_hash)
+            except (ValidationError, ValueError):
+                self.counts['invalid'] += 1
+                continue
+            canonical = canonicalize_email(email)
+            if canonical in seen or canonical in records:
+                self.counts['duplicate'] += 1
+                continue
+            records[canonical] = (
+                email,
+                row.get('name') or '',
+                row.get('password') or None,
+                password_hash,
+            )
+
+        existing = set(User.objects.filter(
+            email_canonical__in=list(records)
+        ).values_list('email_canonical', flat=True))
+        for canonical in existing:
+            del records[canonical]
+        self.counts['duplicate'] += len(existing)
+
+        to_hash = [
+            record[2] for record in records.values()
+            if record[2] and not record[3]
+        ]
+        if self.pool is not None:
+            hashed = self.pool.map(
+                hashers.make_password, to_hash,
+                chunksize=max(len(to_hash) // (4 * self.workers), 1),
+            )
+        else:
+            hashed = map(hashers.make_password, to_hash)
+        return records, hashed
+
+    def insert(self, records, hashed):
+        User = get_user_model()
+        hashed = iter(hashed)
+        users = []
+        for canonical, record in records.items():
+            email, name, password, password_hash = record
+            if not password_hash:
+                password_hash = (
+                    next(hashed) if password else hashers.make_password(None)
+                )
+            users.append(User(
+                email=email,
+                email_canonical=canonical,
+                name=name,
+                password=password_hash,
+                is_active=self.active,
+            ))
+
+        try:
+            created = self.create(users)
+        except IntegrityError:
+            # Someone registered one of these emails since `prepare`.
+            existing = set(User.objects.filter(
+                email_canonical__in=list(records)
+            ).values_list('email_canonical', flat=True))
+            self.counts['duplicate'] += len(existing)
+            created = self.create([
+                user for user in users
+                if user.email_canonical not in existing
+            ])
+        self.counts['created'] += created
+        self.stdout.write(
+            f"{sum(self.counts.values())} rows processed "
+            f"({self.rate():.0f} rows/sec)"
+        )
+
+    def create(self, users):
+        User = get_user_model()
+        with transaction.atomic():
+            users = User.objects.bulk_create(users)
+            if self.create_verifications and users:
+                if users[0].pk is None:
+                    users = User.objects.filter(email_canonical__in=[
+                        user.email_canonical for user in users
+                    ])
+                expires_at = timezone.now() + timedelta(days=1)
+                EmailVerification.objects.bulk_create([
+                    EmailVerification(
+                        user=user,
+                        verification_pin=generate_pin(),
+                        expires_at=expires_at,
+                    )
+                    for user in users
+                ])
+        return len(users)
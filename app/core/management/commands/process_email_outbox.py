@@ -0,0 +1,62 @@
+"""
+Django command to deliver queued emails from the outbox
+"""
+import time
+from typing import Any
+from django.core.management.base import BaseCommand
+
+from core.outbox import deliver_batch
+
+
+class Command(BaseCommand):
+    """Django command to drain the email outbox"""
+
+    help = 'Deliver pending outbox emails with retries and backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=5,
+            help='Attempts before a message is moved to the dead state.'
+        )
+        parser.add_argument(
+            '--backoff',
+            type=int,
+            default=30,
+            help='Base retry delay in seconds, doubled on each failure.'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5,
+            help='Seconds to sleep when the outbox is empty.'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain everything that is currently due, then exit.'
+        )
+
+    def handle(self, *args: Any, **options: Any):
+        """Entrypoint for command"""
+        self.stdout.write('Processing email outbox...')
+        while True:
+            result = deliver_batch(
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts'],
+                backoff_seconds=options['backoff'],
+            )
+            if any(result.values()):
+                self.stdout.write(
+                    'Sent {sent}, retrying {retried}, dead {dead}'.format(
+                        **result
+                    )
+                )
+                continue
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
+
+        self.stdout.write(self.style.SUCCESS('Outbox drained.'))
@@ -0,0 +1,22 @@
+"""
+Django command to issue a request profiling token
+"""
+from typing import Any
+from django.core.management.base import BaseCommand
+
+from core.profiling import make_token
+
+
+class Command(BaseCommand):
+    """Django command to print a signed X-Profile header"""
+
+    help = (
+        'Print a signed X-Profile header. Requests to the profiled views '
+        'that send it are profiled, on servers with profiling enabled '
+        'and the same SECRET_KEY, until the token is older than '
+        'PROFILING["TOKEN_MAX_AGE"] seconds.'
+    )
+
+    def handle(self, *args: Any, **options: Any):
+        """Entrypoint for command"""
+        self.stdout.write(f'X-Profile: {make_token()}')
@@ -0,0 +1,92 @@
+"""
+Django command to profile worker startup
+"""
+import json
+from typing import Any
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.startup import profile_startup
+
+
+class Command(BaseCommand):
+    """Django command to time settings, setup, URLconf and first request"""
+
+    help = (
+        'Boot Django in fresh interpreters and report the time spent '
+        'loading settings, in django.setup() and each app ready(), '
+        'loading the URLconf and serving a first and second request, '
+        'plus import time aggregated by top-level package. Writes the '
+        'report as JSON for diffing between releases.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default='/api/users/login/',
+            help='Path of the warm-up requests. Use one that needs no '
+                 'database if none is running.'
+        )
+        parser.add_argument('--method', default='GET')
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=3,
+            help='Boots to take the median of.'
+        )
+        parser.add_argument(
+            '--output',
+            default='startup-profile.json',
+            help='JSON report to write, or - to skip.'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=15,
+            help='Packages to show in the import report.'
+        )
+
+    def handle(self, *args: Any, **options: Any):
+        """Entrypoint for command"""
+        try:
+            report = profile_startup(
+                runs=max(options['runs'], 1),
+                path=options['path'],
+                method=options['method'].upper(),
+                settings_module=settings.SETTINGS_MODULE,
+                cwd=str(settings.BASE_DIR),
+            )
+        except RuntimeError as e:
+            raise CommandError(f'Startup probe failed: {e}')
+
+        self.report(report, options['top'])
+        if options['output'] != '-':
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+                f.write('\n')
+            self.stdout.write(f"Wrote {options['output']}")
+
+    def report(self, report, top):
+        write = self.stdout.write
+        write(
+            f"Startup of {report['settings_module']} "
+            f"(median of {report['runs']}, wall {report['wall_ms']:.1f} ms)"
+        )
+        write('')
+        write(f"{'phase':<24}{'ms':>10}{'imports ms':>12}")
+        imports = report['import_phases_ms']
+        for phase, ms in report['phases_ms'].items():
+            write(f'{phase:<24}{ms:>10.1f}{imports.get(phase, 0):>12.1f}')
+        for label, ms in report['ready_ms'].items():
+            write(f'{"  ready " + label:<24}{ms:>10.1f}')
+        write('')
+        write(f"{'package':<24}{'import ms':>10}{'modules':>10}")
+        for package, entry in list(report['imports'].items())[:top]:
+            write(
+                f"{package:<24}{entry['ms']:>10.1f}{entry['modules']:>10}"
+            )
+        write(
+            f"{'total':<24}"
+            f"{sum(e['ms'] for e in report['imports'].values()):>10.1f}"
+            f"{sum(e['modules'] for e in report['imports'].values()):>10}"
+        )
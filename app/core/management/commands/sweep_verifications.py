@@ -0,0 +1,78 @@
+"""
+Django command to delete expired and consumed verification rows
+"""
+import time
+from typing import Any
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from core.models import EmailVerification
+
+
+class Command(BaseCommand):
+    """Django command to sweep EmailVerification in primary key batches"""
+
+    help = (
+        'Delete expired or already verified EmailVerification rows in '
+        'bounded primary-key-range batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Width of each primary key range deleted in one statement.'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.1,
+            help='Seconds to pause between batches.'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Repeat the sweep every N seconds instead of exiting.'
+        )
+
+    def handle(self, *args: Any, **options: Any):
+        """Entrypoint for command"""
+        while True:
+            self.sweep(options['batch_size'], options['sleep'])
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def sweep(self, batch_size, sleep):
+        now = timezone.now()
+        bounds = EmailVerification.objects.aggregate(
+            lo=Min('id'), hi=Max('id')
+        )
+        if bounds['lo'] is None:
+            self.stdout.write('No verification rows to sweep.')
+            return 0
+
+        sweepable = Q(expires_at__lt=now) | Q(is_verified=True)
+        deleted = 0
+        started = time.monotonic()
+        lo = bounds['lo']
+        while lo <= bounds['hi']:
+            # Each batch is its own short autocommit DELETE, so row locks
+            # are only held for one primary key range at a time.
+            count, _ = EmailVerification.objects.filter(
+                sweepable, id__gte=lo, id__lt=lo + batch_size
+            ).delete()
+            deleted += count
+            lo += batch_size
+            if sleep and lo <= bounds['hi']:
+                time.sleep(sleep)
+
+        elapsed = time.monotonic() - started
+        rate = deleted / elapsed if elapsed else deleted
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} rows in {elapsed:.2f}s ({rate:.0f} rows/sec)'
+        ))
+        return deleted
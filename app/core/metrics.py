@@ -0,0 +1,470 @@
+"""
+Prometheus metrics, exported in the text format at /metrics.
+
+`MetricsMiddleware` records, per resolved URL name (`view`):
+
+- `http_requests_total{view,method,status}`
+- `http_request_duration_seconds{view,method}`, a histogram
+- `db_queries_total{view}` and `db_query_duration_seconds_total{view}`
+
+and `core.hashing` and `core.outbox` record
+`password_hash_duration_seconds{operation}` and
+`mail_send_duration_seconds{result}`. State kept elsewhere, such as the
+database connection pools, is read by collectors registered with
+`registry.register_collector` each time a snapshot is taken.
+
+Every process counts on its own. Under a prefork server set
+`METRICS['MULTIPROCESS_DIR']` to a directory shared by the workers and
+emptied on deploy: each process then writes a snapshot of its counts to
+`metrics-<pid>-<token>.json` in it at most every `FLUSH_INTERVAL`
+seconds and at exit, and a scrape of any worker adds up every snapshot.
+Snapshots of processes that have exited are folded into `archive.json`,
+so the totals never go backwards. Liveness is checked by PID, so only
+processes in the same PID namespace (one container) may share the
+directory. Another worker's counts show up at most `FLUSH_INTERVAL`
+seconds late, or are lost if it is killed before flushing.
+"""
+import asyncio
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+ARCHIVE = 'archive.json'
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+def get_options():
+    return getattr(settings, 'METRICS', {})
+
+
+class Registry:
+    """The metrics of this process and their snapshot file."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.collectors = []
+        self.lock = threading.Lock()
+        self._reset_process()
+
+    def _reset_process(self):
+        self._token = uuid.uuid4().hex[:8]
+        self._next_flush = 0.0
+        self._flushed = False
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def register_collector(self, collect):
+        """
+        Add the families returned by `collect()`, built with `family`,
+        to every snapshot.
+        """
+        self.collectors.append(collect)
+
+    def clear(self):
+        with self.lock:
+            for metric in self.metrics.values():
+                metric.values.clear()
+
+    def after_fork(self):
+        # A forked worker starts from zero; the parent reports its own.
+        self.clear()
+        self._reset_process()
+
+    def snapshot(self):
+        """Copy of the current values, by metric name."""
+        with self.lock:
+            snapshot = {
+                name: family(
+                    metric.type, metric.documentation, metric.labelnames,
+                    {
+                        key: list(value) if isinstance(value, list) else value
+                        for key, value in metric.values.items()
+                    },
+                    metric.buckets,
+                )
+                for name, metric in self.metrics.items()
+            }
+        for collect in self.collectors:
+            snapshot.update(collect())
+        return snapshot
+
+    @property
+    def path(self):
+        directory = get_options().get('MULTIPROCESS_DIR')
+        if not directory:
+            return None
+        return os.path.join(
+            directory, f'metrics-{os.getpid()}-{self._token}.json'
+        )
+
+    def flush(self):
+        """Write this process's snapshot to the multiprocess directory."""
+        path = self.path
+        if path is None:
+            return
+        _write(path, self.snapshot())
+        self._flushed = True
+
+    def maybe_flush(self):
+        """`flush` if the last one was `FLUSH_INTERVAL` seconds ago."""
+        now = time.monotonic()
+        if now < self._next_flush:
+            return
+        self._next_flush = now + get_options().get('FLUSH_INTERVAL', 1)
+        self.flush()
+
+    def flush_at_exit(self):
+        if self._flushed or any(m.values for m in self.metrics.values()):
+            self.flush()
+
+    def collect(self):
+        """The values of every process sharing the directory, summed."""
+        directory = get_options().get('MULTIPROCESS_DIR')
+        if not directory:
+            return self.snapshot()
+        self.flush()
+        with open(os.path.join(directory, 'archive.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            archive_path = os.path.join(directory, ARCHIVE)
+            merged = _read(archive_path)
+            dead = []
+            for name in os.listdir(directory):
+                if not (name.startswith('metrics-')
+                        and name.endswith('.json')):
+                    continue
+                path = os.path.join(directory, name)
+                snapshot = _read(path)
+                if not _is_alive(int(name.split('-')[1])):
+                    # Gauges describe live processes only.
+                    snapshot = {
+                        key: value for key, value in snapshot.items()
+                        if value['type'] != 'gauge'
+                    }
+                    dead.append((path, snapshot))
+                merge(merged, snapshot)
+            if dead:
+                archive = _read(archive_path)
+                for _, snapshot in dead:
+                    merge(archive, snapshot)
+                _write(archive_path, archive)
+                for path, _ in dead:
+                    os.remove(path)
+        return merged
+
+
+registry = Registry()
+atexit.register(registry.flush_at_exit)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry.after_fork)
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    for family in data.values():
+        family['values'] = {
+            tuple(key): value for key, value in family['values']
+        }
+    return data
+
+
+def _write(path, snapshot):
+    data = {
+        name: {**family, 'values': list(family['values'].items())}
+        for name, family in snapshot.items()
+    }
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def family(metric_type, documentation, labelnames, values, buckets=()):
+    """One metric family of a snapshot; `values` is keyed by labels."""
+    return {
+        'type': metric_type,
+        'help': documentation,
+        'labels': list(labelnames),
+        'buckets': list(buckets),
+        'values': values,
+    }
+
+
+def merge(into, snapshot):
+    """Add the values of `snapshot` to `into`."""
+    for name, family in snapshot.items():
+        target = into.get(name)
+        if target is None:
+            into[name] = target = {**family, 'values': {}}
+        elif (target['type'], target['buckets']) != (
+                family['type'], family['buckets']):
+            # Written by a deploy with different buckets; not comparable.
+            continue
+        values = target['values']
+        for key, value in family['values'].items():
+            current = values.get(key)
+            if current is None:
+                values[key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                values[key] = [a + b for a, b in zip(current, value)]
+            else:
+                values[key] = current + value
+    return into
+
+
+class Counter:
+    type = 'counter'
+    buckets = ()
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self._lock = registry.lock
+        registry.register(self)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Histogram(Counter):
+    """
+    Counts of observations at or below each bucket bound. Each value is
+    the per-bucket counts, the +Inf count and the sum; the exposition
+    makes the counts cumulative.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self.values.get(labels)
+            if counts is None:
+                counts = self.values[labels] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+
+HTTP_REQUESTS = Counter(
+    'http_requests_total',
+    'Requests handled, by URL name, method and status code.',
+    ['view', 'method', 'status'],
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds',
+    'Time spent handling a request, until the response is returned.',
+    ['view', 'method'],
+)
+DB_QUERIES = Counter(
+    'db_queries_total',
+    'SQL queries run while handling requests.',
+    ['view'],
+)
+DB_QUERY_SECONDS = Counter(
+    'db_query_duration_seconds_total',
+    'Time spent running SQL queries while handling requests.',
+    ['view'],
+)
+PASSWORD_HASH_SECONDS = Histogram(
+    'password_hash_duration_seconds',
+    'Time spent making or checking a password hash, including queueing.',
+    ['operation'],
+)
+MAIL_SEND_SECONDS = Histogram(
+    'mail_send_duration_seconds',
+    'Time spent handing one email to the mail relay.',
+    ['result'],
+)
+
+
+def _escape(value):
+    return (
+        str(value).replace('\\', r'\\').replace('\n', r'\n')
+        .replace('"', r'\"')
+    )
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+def render(snapshot):
+    """Prometheus text exposition of a snapshot."""
+    lines = []
+    for name, family in sorted(snapshot.items()):
+        if not family['values']:
+            continue
+        help_text = family['help'].replace('\\', r'\\').replace('\n', r'\n')
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {family["type"]}')
+        names = family['labels']
+        for key, value in sorted(family['values'].items()):
+            if family['type'] != 'histogram':
+                lines.append(f'{name}{_labels(names, key)} {value}')
+                continue
+            bounds = [repr(float(b)) for b in family['buckets']] + ['+Inf']
+            cumulative = 0
+            for bound, count in zip(bounds, value):
+                cumulative += count
+                lines.append(
+                    f'{name}_bucket{_labels([*names, "le"], [*key, bound])} '
+                    f'{cumulative}'
+                )
+            lines.append(f'{name}_sum{_labels(names, key)} {value[-1]}')
+            lines.append(f'{name}_count{_labels(names, key)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+class QueryTimer:
+    """Queries run and time spent in them by one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+_queries = ContextVar('metrics_query_timer', default=None)
+
+
+def _time_query(execute, sql, params, many, context):
+    timer = _queries.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.count += 1
+        timer.seconds += time.perf_counter() - start
+
+
+def install_query_timer(connection):
+    """
+    Time the queries of `connection` for the request being handled.
+    Installed once per connection object instead of per request with
+    `execute_wrapper`, which costs more than the rest of the middleware.
+    """
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+class MetricsMiddleware:
+    """Record the request metrics; goes first so it times everything."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not get_options().get('ENABLED', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # As MiddlewareMixin does: keep ASGI request chains async.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        queries = QueryTimer()
+        token = _queries.set(queries)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _queries.reset(token)
+        self.record(request, response, queries, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        queries = QueryTimer()
+        token = _queries.set(queries)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _queries.reset(token)
+        self.record(request, response, queries, time.perf_counter() - start)
+        return response
+
+    def record(self, request, response, queries, duration):
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        method = request.method if request.method in METHODS else 'other'
+        HTTP_REQUESTS.inc(view, method, str(response.status_code))
+        HTTP_REQUEST_SECONDS.observe(duration, view, method)
+        if queries.count:
+            DB_QUERIES.inc(view, amount=queries.count)
+            DB_QUERY_SECONDS.inc(view, amount=queries.seconds)
+        registry.maybe_flush()
+
+
+@never_cache
+@require_GET
+def metrics_view(request):
+    """
+    Serve the metrics to scrapers sending `METRICS['TOKEN']` as
+    `Authorization: Bearer <token>`. Without a token the endpoint does
+    not exist, unless `PUBLIC` is set.
+    """
+    options = get_options()
+    token = options.get('TOKEN')
+    if not options.get('ENABLED', True) or not (
+            token or options.get('PUBLIC', False)):
+        raise Http404()
+    if token and not constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    return HttpResponse(render(registry.collect()), content_type=CONTENT_TYPE)
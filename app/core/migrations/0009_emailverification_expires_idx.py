@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+from core.db.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0008_user_pin_counter'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='emailverification',
+            index=models.Index(fields=['expires_at'], name='core_emailver_expires_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+import unicodedata
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 1000
+
+
+def canonicalize_email(email):
+    return unicodedata.normalize('NFKC', email or '').strip().lower()
+
+
+def fill_email_canonical(apps, schema_editor):
+    """Backfill in primary key order, one short transaction per batch."""
+    User = apps.get_model('core', 'User')
+    db = schema_editor.connection.alias
+    last_pk = 0
+    while True:
+        batch = list(
+            User.objects.using(db)
+            .filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', 'email')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        with transaction.atomic(using=db):
+            User.objects.using(db).bulk_update(
+                [
+                    User(pk=pk, email_canonical=canonicalize_email(email))
+                    for pk, email in batch
+                ],
+                ['email_canonical'],
+            )
+        last_pk = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0010_user_email_canonical'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_email_canonical, migrations.RunPython.noop),
+    ]
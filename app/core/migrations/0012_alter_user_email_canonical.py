@@ -0,0 +1,130 @@
+from django.core.management.base import CommandError
+from django.db import migrations, models
+from django.db.models import Count
+
+INDEX_NAME = 'core_user_email_canonical_uniq'
+CHECK_NAME = 'core_user_email_canonical_notnull'
+
+
+def email_canonical_field(unique):
+    field = models.EmailField(
+        editable=False, max_length=255, null=not unique, unique=unique
+    )
+    field.set_attributes_from_name('email_canonical')
+    return field
+
+
+def check_email_canonical(apps, schema_editor):
+    """
+    Abort before touching the schema if the backfilled column cannot be
+    made unique. Emails differing only in case were distinct before.
+    """
+    User = apps.get_model('core', 'User')
+    users = User.objects.using(schema_editor.connection.alias)
+    duplicates = list(
+        users.values('email_canonical')
+        .annotate(count=Count('pk'))
+        .filter(count__gt=1)
+        .values_list('email_canonical', flat=True)[:20]
+    )
+    missing = users.filter(email_canonical__isnull=True).count()
+    if duplicates or missing:
+        raise CommandError(
+            'Cannot make core_user.email_canonical unique. '
+            f'Users sharing an email up to case: {duplicates}. '
+            f'Users with no canonical email: {missing} (re-run '
+            '0011_fill_email_canonical). Merge or rename the duplicate '
+            'accounts, then migrate again.'
+        )
+
+
+def add_unique_index(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    if schema_editor.connection.vendor != 'postgresql':
+        field = email_canonical_field(unique=False)
+        field.model = User
+        new_field = email_canonical_field(unique=True)
+        new_field.model = User
+        schema_editor.alter_field(User, field, new_field)
+        return
+
+    # Build the index without blocking writes, then attach it as the
+    # constraint. A failed concurrent build leaves an invalid index
+    # behind, so start from scratch.
+    table = schema_editor.quote_name(User._meta.db_table)
+    index = schema_editor.quote_name(INDEX_NAME)
+    column = schema_editor.quote_name('email_canonical')
+    schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {index}')
+    schema_editor.execute(
+        f'CREATE UNIQUE INDEX CONCURRENTLY {index} ON {table} ({column})'
+    )
+    schema_editor.execute(
+        f'ALTER TABLE {table} ADD CONSTRAINT {index} UNIQUE USING INDEX {index}'
+    )
+    # SET NOT NULL scans the table under an ACCESS EXCLUSIVE lock unless
+    # a validated check already proves it. VALIDATE scans it holding a
+    # lock that lets writes through.
+    check = schema_editor.quote_name(CHECK_NAME)
+    schema_editor.execute(
+        f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {check}'
+    )
+    schema_editor.execute(
+        f'ALTER TABLE {table} ADD CONSTRAINT {check} '
+        f'CHECK ({column} IS NOT NULL) NOT VALID'
+    )
+    schema_editor.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {check}')
+    schema_editor.execute(
+        f'ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL'
+    )
+    schema_editor.execute(f'ALTER TABLE {table} DROP CONSTRAINT {check}')
+
+
+def remove_unique_index(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    if schema_editor.connection.vendor != 'postgresql':
+        field = email_canonical_field(unique=True)
+        field.model = User
+        new_field = email_canonical_field(unique=False)
+        new_field.model = User
+        schema_editor.alter_field(User, field, new_field)
+        return
+
+    table = schema_editor.quote_name(User._meta.db_table)
+    column = schema_editor.quote_name('email_canonical')
+    schema_editor.execute(
+        f'ALTER TABLE {table} DROP CONSTRAINT '
+        f'{schema_editor.quote_name(INDEX_NAME)}'
+    )
+    schema_editor.execute(
+        f'ALTER TABLE {table} ALTER COLUMN {column} DROP NOT NULL'
+    )
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0011_fill_email_canonical'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            check_email_canonical, migrations.RunPython.noop
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_unique_index, remove_unique_index),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='user',
+                    name='email_canonical',
+                    field=models.EmailField(
+                        editable=False, max_length=255, unique=True
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+from core.db.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0012_alter_user_email_canonical'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='emailverification',
+            index=models.Index(fields=['created_at'], name='core_emailver_created_idx'),
+        ),
+    ]
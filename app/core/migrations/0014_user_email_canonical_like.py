@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+from core.db.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0013_emailverification_created_idx'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='user',
+            index=models.Index(fields=['email_canonical'], name='core_user_email_canonical_like', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
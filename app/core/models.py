@@ -9,13 +9,31 @@ from django.contrib.auth.models import (
 )
 from django.conf import settings
 import random
+import unicodedata
 from django.utils import timezone
 from datetime import timedelta
 
 
+def canonicalize_email(email):
+    """Lower-cased, NFKC-normalized email used for all lookups."""
+    return unicodedata.normalize('NFKC', email or '').strip().lower()
+
+
+def generate_pin():
+    """Random six digit verification pin."""
+    return ''.join([str(random.randint(0, 9)) for _ in range(6)])
+
+
 class UserManager(BaseUserManager):
     """Manager for users."""
 
+    def with_email(self, email):
+        """Users matching `email`, resolved through the canonical index."""
+        return self.filter(email_canonical=canonicalize_email(email))
+
+    def get_by_natural_key(self, email):
+        return self.with_email(email).get()
+
     def create_user(self, email, password=None, **extra_fields):
         """
         Create save and return a new user, in django it creates
@@ -44,15 +62,41 @@ class UserManager(BaseUserManager):
 class User(AbstractBaseUser, PermissionsMixin):
     """User in the system."""
     email = models.EmailField(max_length=255, unique=True)
+    # canonicalize_email(email), kept in sync by save()
+    email_canonical = models.EmailField(
+        max_length=255,
+        unique=True,
+        editable=False
+    )
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # bumped to invalidate stateless verification pins (core.pins)
+    pin_counter = models.PositiveIntegerField(default=0, editable=False)
 
     # assign a user manager to this class
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
+    class Meta:
+        indexes = [
+            # admin prefix search; the unique index built by migration
+            # 0012 cannot serve LIKE under a non-C collation
+            models.Index(
+                fields=['email_canonical'],
+                name='core_user_email_canonical_like',
+                opclasses=['varchar_pattern_ops'],
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.email_canonical = canonicalize_email(self.email)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'email' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'email_canonical'}
+        super().save(*args, **kwargs)
+
 
 class EmailVerification(models.Model):
     user = models.OneToOneField(
@@ -67,18 +111,64 @@ class EmailVerification(models.Model):
         default=timezone.now() + timedelta(days=1)
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['expires_at'],
+                name='core_emailver_expires_idx'
+            ),
+            # admin date_hierarchy
+            models.Index(
+                fields=['created_at'],
+                name='core_emailver_created_idx'
+            ),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.verification_pin:
-            self.verification_pin = ''.join(
-                [str(random.randint(0, 9)) for _ in range(6)]
-            )
+            self.verification_pin = generate_pin()
         if not self.pk:  # Only set expires_at when creating a new object
             self.expires_at = timezone.now() + timedelta(days=1)
         super().save(*args, **kwargs)
 
     def generate_new_pin(self):
-        self.verification_pin = ''.join(
-            [str(random.randint(0, 9)) for _ in range(6)]
-            )
+        self.verification_pin = generate_pin()
+        self.is_verified = False
         self.expires_at = timezone.now() + timezone.timedelta(days=1)
         self.save()
+
+
+class EmailOutbox(models.Model):
+    """Outgoing email, written in the caller's transaction and
+    delivered later by the `process_email_outbox` worker."""
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_DEAD, 'Dead'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['status', 'next_attempt_at'],
+                name='core_outbox_due_idx'
+            ),
+        ]
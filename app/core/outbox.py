@@ -0,0 +1,127 @@
+"""
+Transactional email outbox.
+
+Request handlers only insert an `EmailOutbox` row, inside whatever
+transaction they are already running. The `process_email_outbox`
+command drains the table and talks to the mail relay.
+"""
+import time
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from core.metrics import MAIL_SEND_SECONDS, registry
+from core.models import EmailOutbox
+
+# A claimed row is hidden from other workers for this long. If the
+# worker dies mid-batch the row becomes due again after the lease.
+LEASE_SECONDS = 300
+MAX_BACKOFF_SECONDS = 3600
+
+
+def enqueue_email(subject, message, from_email, recipient_list):
+    """Queue an email for delivery by the outbox worker."""
+    return EmailOutbox.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or '',
+        recipients=list(recipient_list),
+    )
+
+
+def backoff_delay(attempts, backoff_seconds):
+    """Exponential backoff for the given number of failed attempts."""
+    delay = backoff_seconds * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(delay, MAX_BACKOFF_SECONDS))
+
+
+def claim_batch(batch_size, lease_seconds=LEASE_SECONDS):
+    """Lease up to `batch_size` due rows to the calling worker."""
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            EmailOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                status=EmailOutbox.STATUS_PENDING,
+                next_attempt_at__lte=now,
+            )
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if rows:
+            EmailOutbox.objects.filter(
+                pk__in=[row.pk for row in rows]
+            ).update(next_attempt_at=now + timedelta(seconds=lease_seconds))
+    return rows
+
+
+def _record_failure(row, error, max_attempts, backoff_seconds):
+    row.attempts += 1
+    row.last_error = str(error)
+    if row.attempts >= max_attempts:
+        row.status = EmailOutbox.STATUS_DEAD
+    else:
+        row.next_attempt_at = (
+            timezone.now() + backoff_delay(row.attempts, backoff_seconds)
+        )
+    row.save(update_fields=[
+        'attempts', 'last_error', 'status', 'next_attempt_at'
+    ])
+
+
+def deliver_batch(batch_size=50, max_attempts=5, backoff_seconds=30):
+    """
+    Send one batch of due emails over a single mail connection.
+    Returns a dict with the number of sent, retried and dead rows.
+    """
+    result = {'sent': 0, 'retried': 0, 'dead': 0}
+    rows = claim_batch(batch_size)
+    if not rows:
+        return result
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        for row in rows:
+            _record_failure(row, e, max_attempts, backoff_seconds)
+            result['dead' if row.status == row.STATUS_DEAD else 'retried'] += 1
+        return result
+
+    try:
+        for row in rows:
+            message = EmailMessage(
+                row.subject,
+                row.body,
+                row.from_email or None,
+                row.recipients,
+                connection=connection,
+            )
+            start = time.perf_counter()
+            try:
+                message.send()
+            except Exception as e:
+                MAIL_SEND_SECONDS.observe(
+                    time.perf_counter() - start, 'failed'
+                )
+                _record_failure(row, e, max_attempts, backoff_seconds)
+                result[
+                    'dead' if row.status == row.STATUS_DEAD else 'retried'
+                ] += 1
+            else:
+                MAIL_SEND_SECONDS.observe(time.perf_counter() - start, 'sent')
+                row.attempts += 1
+                row.status = EmailOutbox.STATUS_SENT
+                row.sent_at = timezone.now()
+                row.last_error = ''
+                row.save(update_fields=[
+                    'attempts', 'status', 'sent_at', 'last_error'
+                ])
+                result['sent'] += 1
+    finally:
+        connection.close()
+        registry.maybe_flush()
+
+    return result
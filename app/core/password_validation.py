@@ -0,0 +1,134 @@
+"""
+Common-password validation from a precompiled, memory-mapped word list.
+
+Django's `CommonPasswordValidator` decompresses and parses its gzip word
+list into a set in every worker process. `build_common_passwords`
+compiles a list once into a file of sorted, unique, lowercased UTF-8
+lines, which `CompiledWordList` memory-maps read-only and binary
+searches. The pages are shared by every process through the page cache,
+so a much larger list costs no per-worker memory and nothing is parsed
+at startup.
+
+The compiled file is mapped once per process; rebuild it with
+`build_common_passwords` (which replaces it atomically) and restart the
+workers to pick up a new list.
+"""
+import gzip
+import mmap
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+from django.contrib.auth import password_validation
+from django.core.exceptions import ImproperlyConfigured
+
+HEADER = b'common-passwords 1\n'
+
+_lists = {}
+_lock = threading.Lock()
+
+
+def normalize(password):
+    """The form passwords are stored and looked up in."""
+    return password.lower().strip()
+
+
+def read_word_list(path):
+    """Yield the words of a plain or gzipped word list, one per line."""
+    opener = gzip.open if str(path).endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            word = normalize(line)
+            if word:
+                yield word
+
+
+def compile_word_list(words, path):
+    """
+    Write `words` to `path` in the compiled format and return how many
+    unique words were written. The file is replaced atomically, so
+    processes that already mapped the old one are not affected.
+    """
+    entries = sorted({
+        word.encode('utf-8') for word in map(normalize, words)
+        if word and '\n' not in word
+    })
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.common-passwords-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER)
+            for entry in entries:
+                f.write(entry + b'\n')
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return len(entries)
+
+
+class CompiledWordList:
+    """Read-only, memory-mapped view of a compiled word list."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(HEADER)] != HEADER:
+            self._map.close()
+            raise ImproperlyConfigured(
+                f'{path} is not a compiled common-password list; '
+                f'rebuild it with build_common_passwords.'
+            )
+        self.path = path
+
+    def __contains__(self, word):
+        if not isinstance(word, str):
+            return False
+        target = word.encode('utf-8')
+        data = self._map
+        # `lo` is always the start of a line; [lo, hi) is still unsearched.
+        lo, hi = len(HEADER), len(data)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = data.rfind(b'\n', lo, mid) + 1 or lo
+            end = data.find(b'\n', start)
+            entry = data[start:end]
+            if entry == target:
+                return True
+            if entry < target:
+                lo = end + 1
+            else:
+                hi = start
+        return False
+
+
+def get_word_list(path):
+    """Return the process-wide mapping of the compiled list at `path`."""
+    path = os.fspath(path)
+    word_list = _lists.get(path)
+    if word_list is None:
+        with _lock:
+            word_list = _lists.get(path)
+            if word_list is None:
+                word_list = _lists[path] = CompiledWordList(path)
+    return word_list
+
+
+class CommonPasswordValidator(password_validation.CommonPasswordValidator):
+    """
+    Drop-in replacement for Django's validator that checks the compiled
+    list at `compiled_path` (default `settings.COMMON_PASSWORDS_FILE`).
+    Without a compiled file it loads `password_list_path` as Django does.
+    """
+
+    def __init__(self, password_list_path=None, compiled_path=None):
+        if compiled_path is None:
+            compiled_path = getattr(settings, 'COMMON_PASSWORDS_FILE', None)
+        if compiled_path and os.path.exists(compiled_path):
+            self.passwords = get_word_list(compiled_path)
+        else:
+            super().__init__(
+                password_list_path or self.DEFAULT_PASSWORD_LIST_PATH
+            )
@@ -0,0 +1,195 @@
+"""
+Cache of serialized /me payloads, served with strong ETags.
+
+Each user has a version token in the `USER_PAYLOAD_CACHE['CACHE_ALIAS']`
+cache. The signal handlers in `core.signals` (and the admin bulk
+actions, which bypass them) replace it once the transaction saving or
+deleting the user commits; bumping earlier would let a concurrent miss
+cache the old row under the new version. Payloads are stored under the
+user id and version, so after a change every reader misses without old
+entries having to be found; they expire after `TTL`.
+
+Versions must be seen by every worker, so the cache is off unless
+`CACHE_ALIAS` names a cache they share; a per-process cache such as
+LocMemCache would serve each worker's stale payloads for the `TTL`.
+
+Concurrent misses for the same payload are coalesced. Within a process
+the other threads wait for the one loading it, and across processes the
+loader holds a lock key for up to `LOCK_TIMEOUT` seconds while the
+others poll for its result.
+"""
+import hashlib
+import json
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+from core.authentication import current_user
+
+
+def make_etag(data):
+    """Strong ETag of a JSON-serializable payload."""
+    body = json.dumps(
+        data, sort_keys=True, separators=(',', ':'), default=str
+    ).encode()
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def not_modified(request, etag):
+    """Whether the request's If-None-Match matches `etag`."""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    return '*' in etags or any(
+        tag.replace('W/', '', 1) == etag for tag in etags
+    )
+
+
+def add_validators(response, etag):
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+class Flight:
+    """A load in progress that other threads can wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+
+
+class UserPayloadCache:
+    """Versioned `(etag, data)` entries, keyed by user id."""
+
+    key_prefix = 'userpayload'
+
+    def __init__(self, alias='default', ttl=60, lock_timeout=2):
+        self.alias = alias
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _version_key(self, user_id):
+        return f'{self.key_prefix}:version:{user_id}'
+
+    def version(self, user_id):
+        key = self._version_key(user_id)
+        version = self.cache.get(key)
+        if version is None:
+            # Random rather than counted, so a version lost to eviction
+            # is never reissued and cannot revive an old entry.
+            self.cache.add(key, uuid.uuid4().hex, None)
+            version = self.cache.get(key)
+        return version
+
+    def bump(self, user_id):
+        self.cache.set(self._version_key(user_id), uuid.uuid4().hex, None)
+
+    def get(self, user_id, load):
+        """
+        `(etag, data)` of the user's payload. On a miss `load()` builds
+        the data; it is called after the version is read, so it must
+        read the user itself rather than use an older copy.
+        """
+        key = f'{self.key_prefix}:{user_id}:{self.version(user_id)}'
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+        if not leader:
+            flight.done.wait(self.lock_timeout)
+            return flight.entry or self._load(key, load)
+        try:
+            flight.entry = self._load_once(key, load)
+            return flight.entry
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _load_once(self, key, load):
+        lock_key = f'{key}:lock'
+        if self.cache.add(lock_key, 1, self.lock_timeout):
+            try:
+                return self._load(key, load)
+            finally:
+                self.cache.delete(lock_key)
+
+        # Another process is loading it.
+        deadline = time.monotonic() + self.lock_timeout
+        delay = 0.005
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            entry = self.cache.get(key)
+            if entry is not None:
+                return entry
+            delay = min(delay * 2, 0.1)
+        return self._load(key, load)
+
+    def _load(self, key, load):
+        data = dict(load())
+        entry = (make_etag(data), data)
+        self.cache.set(key, entry, self.ttl)
+        return entry
+
+
+_cache = None
+
+
+def get_payload_cache():
+    """The process-wide cache configured in settings, or None if off."""
+    global _cache
+    options = getattr(settings, 'USER_PAYLOAD_CACHE', {})
+    if not options.get('ENABLED', True) or not options.get('CACHE_ALIAS'):
+        return None
+    if _cache is None:
+        _cache = UserPayloadCache(
+            alias=options['CACHE_ALIAS'],
+            ttl=options.get('TTL', 60),
+            lock_timeout=options.get('LOCK_TIMEOUT', 2),
+        )
+    return _cache
+
+
+def invalidate_user_payload(user_id, using=DEFAULT_DB_ALIAS):
+    """Bump the user's version once the current transaction commits."""
+    cache = get_payload_cache()
+    if cache is not None:
+        transaction.on_commit(lambda: cache.bump(user_id), using=using)
+
+
+def user_payload(user, serialize):
+    """`(etag, data)` of `serialize(user)`, cached when enabled."""
+    cache = get_payload_cache()
+    if cache is None:
+        # The request's copy of the user may come from a token cache
+        # that other workers' writes have not reached yet.
+        data = serialize(current_user(user, using=None))
+        return make_etag(data), data
+
+    def load():
+        # The request's copy of the user may predate the change that
+        # bumped the version, and a replica may not have it yet. A user
+        # deleted since it was authenticated is rejected with a 401.
+        return serialize(current_user(user))
+
+    return cache.get(user.pk, load)
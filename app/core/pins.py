@@ -0,0 +1,140 @@
+"""
+Verification PIN backends.
+
+`ModelPinBackend` keeps the PIN on the user's EmailVerification row.
+`HmacPinBackend` derives it TOTP-style from an HMAC of the user id, the
+purpose, the user's `pin_counter` and the current time window, so
+issuing and checking a PIN never touch the EmailVerification table.
+Consuming a PIN bumps the counter, which invalidates it.
+"""
+import hmac
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+from django.utils.module_loading import import_string
+
+from core.models import EmailVerification
+
+PURPOSE_VERIFY = 'verify'
+PURPOSE_RESET = 'reset'
+
+
+class InvalidPin(Exception):
+    """The PIN does not match."""
+
+
+class ExpiredPin(Exception):
+    """The PIN matched but is no longer valid."""
+
+
+class ModelPinBackend:
+    """PINs stored on `EmailVerification` rows."""
+
+    def issue(self, user, purpose, created=False):
+        """
+        Return a fresh PIN for `user`. `created` means the user was just
+        inserted and cannot have a row yet.
+        """
+        if created:
+            return EmailVerification.objects.create(
+                user=user
+            ).verification_pin
+        verification, created = EmailVerification.objects.get_or_create(
+            user=user
+        )
+        if not created:
+            verification.generate_new_pin()
+        return verification.verification_pin
+
+    def peek(self, user, purpose):
+        """Return the outstanding PIN without issuing a new one."""
+        return EmailVerification.objects.filter(user=user).values_list(
+            'verification_pin', flat=True
+        ).first()
+
+    def check(self, user, pin, purpose):
+        """
+        Validate `pin`, raising InvalidPin or ExpiredPin. Returns a record
+        to hand to `consume`.
+        """
+        filters = {'user': user, 'verification_pin': pin}
+        if purpose == PURPOSE_VERIFY:
+            filters['is_verified'] = False
+        try:
+            verification = EmailVerification.objects.get(**filters)
+        except EmailVerification.DoesNotExist:
+            raise InvalidPin()
+        if verification.expires_at <= timezone.now():
+            raise ExpiredPin()
+        return verification
+
+    def consume(self, user, record):
+        """Mark the PIN as used."""
+        record.is_verified = True
+        record.save()
+
+
+class HmacPinBackend:
+    """
+    Stateless PINs. A PIN is accepted during the window it was issued in
+    and the one after it, so it stays valid for between one and two
+    `WINDOW`s; only two PINs per user and purpose are ever live, so a
+    guess is no likelier to succeed than against a stored PIN twice
+    over. `consume` bumps `user.pin_counter`; the caller is expected to
+    save the user.
+    """
+    key_salt = 'core.pins.HmacPinBackend'
+    # Windows checked; PINs older than the first VALID_WINDOWS are
+    # reported as expired rather than invalid.
+    VALID_WINDOWS = 2
+    CHECKED_WINDOWS = 4
+
+    def __init__(self):
+        options = getattr(settings, 'VERIFICATION_PIN', {})
+        self.window = options.get('WINDOW', 12 * 3600)
+
+    def _step(self):
+        return int(timezone.now().timestamp()) // self.window
+
+    def _pin(self, user, purpose, step):
+        digest = salted_hmac(
+            self.key_salt,
+            f'{user.pk}:{purpose}:{user.pin_counter}:{step}',
+            algorithm='sha256',
+        ).digest()
+        # RFC 4226 dynamic truncation.
+        offset = digest[-1] & 0x0F
+        code = int.from_bytes(digest[offset:offset + 4], 'big') & 0x7FFFFFFF
+        return f'{code % 10 ** 6:06d}'
+
+    def issue(self, user, purpose, created=False):
+        return self._pin(user, purpose, self._step())
+
+    peek = issue
+
+    def check(self, user, pin, purpose):
+        step = self._step()
+        for age in range(self.CHECKED_WINDOWS):
+            if hmac.compare_digest(self._pin(user, purpose, step - age), pin):
+                if age >= self.VALID_WINDOWS:
+                    raise ExpiredPin()
+                return None
+        raise InvalidPin()
+
+    def consume(self, user, record):
+        user.pin_counter += 1
+
+
+_backend = None
+
+
+def get_pin_backend():
+    """Return the backend named in `VERIFICATION_PIN['BACKEND']`."""
+    global _backend
+    if _backend is None:
+        options = getattr(settings, 'VERIFICATION_PIN', {})
+        _backend = import_string(
+            options.get('BACKEND', 'core.pins.ModelPinBackend')
+        )()
+    return _backend
@@ -0,0 +1,213 @@
+"""
+On-demand profiling of single requests in production.
+
+With `PROFILING['ENABLED']`, `ProfilingMiddleware` runs a request to one
+of the `VIEW_MODULES` under cProfile when it carries a valid signed
+`X-Profile` header (see the `profile_token` command) or is picked at
+random with probability `SAMPLE_RATE`. At most one request per process
+is profiled at a time. Each profile is written to `DIR` as
+
+    <time>-<url name>-<duration>ms-<pid>.pstats     (pstats dump)
+    <time>-<url name>-<duration>ms-<pid>.collapsed  (for flamegraph.pl)
+
+and its base name is returned in the `X-Profile-Id` response header.
+Disabled, the middleware removes itself from the chain at startup.
+
+cProfile sees the thread the middleware runs on. Under ASGI the
+middleware stays async and runs on the event loop thread: profiles
+cover async views (USERS_ASYNC_VIEWS) and the middleware, while work
+done in other threads (sync views, `sync_to_async` calls) only shows up
+as waiting, and other requests served meanwhile show up too.
+"""
+import asyncio
+import cProfile
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+SALT = 'core.profiling'
+# Call paths attributed less than this many seconds are left out.
+MIN_SHARE = 1e-6
+
+_lock = threading.Lock()
+
+
+def get_options():
+    return getattr(settings, 'PROFILING', {})
+
+
+def make_token():
+    """Value for the profiling header, valid for `TOKEN_MAX_AGE`."""
+    return signing.TimestampSigner(salt=SALT).sign('profile')
+
+
+def check_token(value):
+    try:
+        signing.TimestampSigner(salt=SALT).unsign(
+            value, max_age=get_options().get('TOKEN_MAX_AGE', 3600)
+        )
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def _label(func):
+    filename, line, name = func
+    if filename == '~':
+        return name
+    module = os.path.splitext(os.path.basename(filename))[0]
+    return f'{module}.{name}:{line}'
+
+
+def collapse(stats):
+    """
+    Collapsed stacks ("a;b;c <microseconds>" lines) from a profile.
+
+    cProfile only records caller/callee pairs, so each function's time is
+    split among its callers in proportion to what each spent calling it.
+    Stacks are therefore estimates, exact wherever a function has one
+    caller.
+    """
+    callees = defaultdict(dict)
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees[caller][func] = edge[3]
+
+    samples = defaultdict(float)
+
+    def walk(func, share, path, seen):
+        _, _, tottime, cumtime, _ = stats[func]
+        if not cumtime:
+            return
+        fraction = share / cumtime
+        path = f'{path};{_label(func)}' if path else _label(func)
+        samples[path] += tottime * fraction
+        for callee, edge_time in callees[func].items():
+            child = edge_time * fraction
+            if callee not in seen and child >= MIN_SHARE:
+                walk(callee, child, path, seen | {callee})
+
+    for func, (_, _, _, cumtime, callers) in stats.items():
+        if not callers:
+            walk(func, cumtime, '', {func})
+
+    return ''.join(
+        f'{path} {round(seconds * 1e6)}\n'
+        for path, seconds in sorted(samples.items())
+        if round(seconds * 1e6)
+    )
+
+
+def write_profile(profiler, url_name, duration):
+    """Write the pstats and collapsed files; returns their base name."""
+    directory = get_options().get('DIR')
+    os.makedirs(directory, exist_ok=True)
+    name = '{}-{}-{}ms-{}'.format(
+        time.strftime('%Y%m%dT%H%M%S'),
+        re.sub(r'[^\w.-]', '_', url_name),
+        round(duration * 1000),
+        os.getpid(),
+    )
+    base = os.path.join(directory, name)
+    profiler.dump_stats(f'{base}.pstats')
+    with open(f'{base}.collapsed', 'w') as f:
+        f.write(collapse(pstats.Stats(profiler).stats))
+    return name
+
+
+class ProfilingMiddleware:
+    """Profile requests picked by a signed header or at random."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not get_options().get('ENABLED'):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # As MiddlewareMixin does: keep ASGI request chains async.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def should_profile(self, request):
+        options = get_options()
+        header = request.META.get(options.get('HEADER', 'HTTP_X_PROFILE'))
+        if header:
+            if not check_token(header):
+                return False
+        elif random.random() >= options.get('SAMPLE_RATE', 0):
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        view = getattr(match.func, 'view_class', match.func)
+        return view.__module__ in options.get('VIEW_MODULES', ())
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not self.should_profile(request):
+            return self.get_response(request)
+        if not _lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request)
+        finally:
+            _lock.release()
+
+    async def __acall__(self, request):
+        if not self.should_profile(request):
+            return await self.get_response(request)
+        if not _lock.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - start
+            return await sync_to_async(self.save)(
+                request, response, profiler, duration
+            )
+        finally:
+            _lock.release()
+
+    def profile(self, request):
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration = time.perf_counter() - start
+        return self.save(request, response, profiler, duration)
+
+    def save(self, request, response, profiler, duration):
+        match = request.resolver_match
+        try:
+            name = write_profile(
+                profiler, match.view_name if match else 'unmatched', duration
+            )
+        except OSError:
+            logger.exception('Could not write request profile')
+        else:
+            response['X-Profile-Id'] = name
+        return response
@@ -0,0 +1,241 @@
+"""
+OpenAPI schema served from a precomputed cache.
+
+`SpectacularAPIView` introspects every view and serializer on each
+request. `CachedSchemaView` instead builds the schema once per code
+version: the JSON and YAML renderings, their gzip encodings and strong
+ETags are computed on first use and kept in memory, so a request costs a
+dict lookup, and a matching If-None-Match costs a 304.
+
+The schema is also written to `OPENAPI_SCHEMA_CACHE['FILE']` together
+with a fingerprint of the code and settings it was generated from
+(`manage.py generate_schema` writes it at deploy time). A process whose
+fingerprint matches the file loads it instead of generating; any change
+to a project source file, the relevant settings or the schema-related
+packages generates a fresh one. Source files are hashed by content and
+path relative to `BASE_DIR`, so a file built into an image still
+matches once the tree is copied elsewhere, and the resolved URL
+patterns are hashed too, since settings such as `USERS_ASYNC_VIEWS`
+change which views are routed.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from importlib.metadata import PackageNotFoundError, version
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.urls import URLResolver, get_resolver
+from django.utils.http import parse_etags
+from drf_spectacular.generators import SchemaGenerator
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+PACKAGES = (
+    'Django', 'djangorestframework', 'drf-spectacular', 'dj-rest-auth',
+    'django-allauth',
+)
+RENDERERS = {
+    'json': OpenApiJsonRenderer,
+    'yaml': OpenApiYamlRenderer,
+}
+gzip_re = re.compile(r'\bgzip\b')
+
+
+def get_options():
+    return getattr(settings, 'OPENAPI_SCHEMA_CACHE', {})
+
+
+def describe_urls(patterns, prefix=''):
+    """One line per URL pattern: route, name and the view it resolves to."""
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from describe_urls(pattern.url_patterns, route)
+            continue
+        views = [pattern.callback, getattr(pattern.callback, 'cls', None)]
+        yield ' '.join([route, str(pattern.name)] + [
+            f'{view.__module__}.{view.__qualname__}' for view in views if view
+        ])
+
+
+def code_fingerprint():
+    """
+    Hash every project source file, the resolved URL patterns and the
+    settings and package versions the schema depends on.
+    """
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(settings.BASE_DIR):
+        dirs[:] = sorted(
+            d for d in dirs if not d.startswith('.') and d != '__pycache__'
+        )
+        for name in sorted(files):
+            if name.endswith('.py'):
+                path = os.path.join(root, name)
+                relpath = os.path.relpath(path, settings.BASE_DIR)
+                digest.update(f'{relpath}\n'.encode())
+                with open(path, 'rb') as f:
+                    digest.update(hashlib.sha256(f.read()).digest())
+    for line in describe_urls(get_resolver().url_patterns):
+        digest.update(f'{line}\n'.encode())
+    for package in PACKAGES:
+        try:
+            digest.update(f'{package}=={version(package)}\n'.encode())
+        except PackageNotFoundError:
+            pass
+    digest.update(json.dumps([
+        settings.ROOT_URLCONF,
+        getattr(settings, 'SPECTACULAR_SETTINGS', {}),
+        getattr(settings, 'REST_FRAMEWORK', {}),
+    ], sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def generate_schema():
+    """Introspect the API and return the schema as plain JSON data."""
+    schema = SchemaGenerator().get_schema(request=None, public=True)
+    return json.loads(OpenApiJsonRenderer().render(schema))
+
+
+def load_schema_file(path, fingerprint):
+    """Return the schema stored at `path` if it matches `fingerprint`."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('fingerprint') != fingerprint:
+        return None
+    return data.get('schema')
+
+
+def write_schema_file(path, fingerprint, schema):
+    """Atomically replace the schema file at `path`."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.openapi-schema-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': fingerprint, 'schema': schema}, f)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def build_schema_file(path, force=False):
+    """
+    Make sure `path` holds the schema for the current code. Returns the
+    schema data and whether it had to be generated.
+    """
+    fingerprint = code_fingerprint()
+    schema = None if force else load_schema_file(path, fingerprint)
+    if schema is not None:
+        return schema, False
+    schema = generate_schema()
+    write_schema_file(path, fingerprint, schema)
+    return schema, True
+
+
+class SchemaVariant:
+    """One rendering of the schema, plain and gzipped."""
+
+    def __init__(self, body):
+        self.body = body
+        self.gzipped = gzip.compress(body, mtime=0)
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+
+
+class SchemaCache:
+    """The schema rendered in every format, built once per process."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self._variants = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        fingerprint = code_fingerprint()
+        schema = None
+        if self.path:
+            schema = load_schema_file(self.path, fingerprint)
+        if schema is None:
+            schema = generate_schema()
+            if self.path:
+                try:
+                    write_schema_file(self.path, fingerprint, schema)
+                except OSError:
+                    pass  # read-only deployments still serve from memory
+        return {
+            fmt: SchemaVariant(renderer().render(schema))
+            for fmt, renderer in RENDERERS.items()
+        }
+
+    def get(self, fmt):
+        if self._variants is None:
+            with self._lock:
+                if self._variants is None:
+                    self._variants = self.load()
+        return self._variants[fmt]
+
+
+_cache = None
+
+
+def get_schema_cache():
+    """Return the process-wide schema cache configured in settings."""
+    global _cache
+    if _cache is None:
+        _cache = SchemaCache(get_options().get('FILE'))
+    return _cache
+
+
+class CachedSchemaView(SpectacularAPIView):
+    # `SpectacularAPIView` answering from the schema cache. Requests for
+    # a specific version or language, or with the cache disabled, are
+    # generated as before. The docstring is published in the schema.
+    __doc__ = SpectacularAPIView.__doc__
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        options = get_options()
+        if (not options.get('ENABLED')
+                or 'version' in request.GET
+                or 'lang' in request.GET):
+            return super().get(request, *args, **kwargs)
+
+        renderer = request.accepted_renderer
+        variant = get_schema_cache().get(renderer.format)
+        accepts_gzip = gzip_re.search(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        etag = variant.gzip_etag if accepts_gzip else variant.etag
+
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            content_type = request.accepted_media_type
+            if renderer.charset:
+                content_type += f'; charset={renderer.charset}'
+            response = HttpResponse(
+                variant.gzipped if accepts_gzip else variant.body,
+                content_type=content_type,
+            )
+            if accepts_gzip:
+                response['Content-Encoding'] = 'gzip'
+            response['Content-Disposition'] = (
+                f'inline; filename="{self._get_filename(request, None)}"'
+            )
+        response['ETag'] = etag
+        response['Cache-Control'] = (
+            f"public, max-age={options.get('MAX_AGE', 0)}"
+        )
+        response['Vary'] = 'Accept, Accept-Encoding'
+        return response
@@ -0,0 +1,64 @@
+"""
+Signal handlers for core models.
+"""
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import (
+    authentication,
+    hashing,
+    metrics,
+    payload_cache,
+    pins,
+    throttling,
+)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, update_fields=None, using=None, **kwargs):
+    """Drop cached tokens and payloads when the user may have changed."""
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    authentication.invalidate_user_tokens(instance.pk, using)
+    payload_cache.invalidate_user_payload(instance.pk, using)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_deleted(sender, instance, using=None, **kwargs):
+    authentication.invalidate_user_tokens(instance.pk, using)
+    payload_cache.invalidate_user_payload(instance.pk, using)
+
+
+@receiver(post_save, sender='authtoken.Token')
+@receiver(post_delete, sender='authtoken.Token')
+def token_changed(sender, instance, using=None, **kwargs):
+    """A created or deleted token means the key has been rotated."""
+    authentication.invalidate_user_tokens(instance.user_id, using)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    metrics.install_query_timer(connection)
+
+
+@receiver(setting_changed)
+def reset_cached_components(setting, **kwargs):
+    if setting == 'TOKEN_AUTH_CACHE':
+        authentication._token_cache = None
+    elif setting == 'USER_PAYLOAD_CACHE':
+        payload_cache._cache = None
+    elif setting == 'PASSWORD_HASHING':
+        if hashing._executor is not None:
+            hashing._executor.shutdown()
+        hashing._executor = None
+    elif setting == 'VERIFICATION_PIN':
+        pins._backend = None
+    elif setting == 'THROTTLING':
+        throttling._store = None
+    elif setting == 'OPENAPI_SCHEMA_CACHE':
+        # Imported here so app loading does not pull in drf_spectacular.
+        from core import schema
+        schema._cache = None
@@ -0,0 +1,192 @@
+"""
+Startup profiling for `manage.py startup_profile`.
+
+`python -X importtime -m core.startup PATH METHOD` boots Django the way
+a worker does and prints the duration of each phase as JSON on stdout:
+loading settings, `django.setup()` (with each app's `ready()` timed
+separately), loading the URLconf, and a first and second request to
+PATH. Before each phase it writes a marker to stderr, so the
+`-X importtime` lines that follow can be attributed to the phase that
+triggered the imports.
+
+`profile_startup()` runs that in fresh interpreters and aggregates the
+import times by top-level package. This module only imports the
+standard library at the top so the probe does not skew what it measures.
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+MARKER = 'startup_profile phase '
+importtime_re = re.compile(
+    r'^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)\s*$'
+)
+
+
+def probe(path, method):
+    phases = {}
+    ready = {}
+
+    def phase(name):
+        print(MARKER + name, file=sys.stderr, flush=True)
+        return time.perf_counter()
+
+    start = phase('settings')
+    from django.conf import settings
+    settings.INSTALLED_APPS
+    phases['settings'] = time.perf_counter() - start
+
+    start = phase('setup')
+    import django
+    from django.apps.config import AppConfig
+
+    create = AppConfig.create.__func__
+
+    def timed_create(cls, entry):
+        config = create(cls, entry)
+        original = config.ready
+
+        def timed_ready():
+            ready_start = time.perf_counter()
+            original()
+            ready[config.label] = time.perf_counter() - ready_start
+
+        config.ready = timed_ready
+        return config
+
+    AppConfig.create = classmethod(timed_create)
+    django.setup()
+    AppConfig.create = classmethod(create)
+    phases['setup'] = time.perf_counter() - start
+
+    start = phase('urlconf')
+    from django.urls import get_resolver
+    get_resolver().reverse_dict
+    phases['urlconf'] = time.perf_counter() - start
+
+    from django.test import Client
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+    client = Client()
+    status = None
+    for name in ('first_request', 'second_request'):
+        start = phase(name)
+        status = client.generic(method, path).status_code
+        phases[name] = time.perf_counter() - start
+
+    print(json.dumps({'phases': phases, 'ready': ready, 'status': status}))
+
+
+def parse_importtime(stderr):
+    """
+    Aggregate `-X importtime` output. Returns the self time in seconds
+    and module count per top-level package, and the self time of all
+    imports per phase.
+    """
+    packages = {}
+    phases = {}
+    current = 'interpreter'
+    for line in stderr.splitlines():
+        if line.startswith(MARKER):
+            current = line[len(MARKER):].strip()
+            continue
+        match = importtime_re.match(line)
+        if not match:
+            continue
+        seconds = int(match.group(1)) / 1e6
+        package = match.group(4).split('.')[0]
+        entry = packages.setdefault(package, {'seconds': 0.0, 'modules': 0})
+        entry['seconds'] += seconds
+        entry['modules'] += 1
+        phases[current] = phases.get(current, 0.0) + seconds
+    return packages, phases
+
+
+def run_probe(path='/', method='GET', settings_module=None, cwd=None):
+    """Boot Django once in a fresh interpreter and return its timings."""
+    env = dict(os.environ)
+    if settings_module:
+        env['DJANGO_SETTINGS_MODULE'] = settings_module
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-m', 'core.startup',
+         path, method],
+        cwd=cwd, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    packages, import_phases = parse_importtime(result.stderr)
+    data.update(wall=wall, imports=packages, import_phases=import_phases)
+    return data
+
+
+def median_of(runs, *keys):
+    """Median per key of the dicts found at `keys` in every run."""
+    values = {}
+    for run in runs:
+        item = run
+        for key in keys:
+            item = item[key]
+        for name, value in item.items():
+            values.setdefault(name, []).append(value)
+    return {
+        name: statistics.median(samples)
+        for name, samples in values.items()
+    }
+
+
+def profile_startup(runs=1, **kwargs):
+    """
+    Run the probe `runs` times and return the median of every timing,
+    in milliseconds, as a JSON-serializable report.
+    """
+    results = [run_probe(**kwargs) for _ in range(runs)]
+    ms = 1000
+
+    def to_ms(values):
+        return {
+            name: round(value * ms, 3)
+            for name, value in sorted(
+                values.items(), key=lambda item: item[1], reverse=True
+            )
+        }
+
+    modules = {}
+    for result in results:
+        for package, entry in result['imports'].items():
+            modules[package] = entry['modules']
+    imports = {
+        package: {'ms': seconds, 'modules': modules[package]}
+        for package, seconds in to_ms(median_of(
+            [{
+                package: entry['seconds']
+                for package, entry in result['imports'].items()
+            } for result in results]
+        )).items()
+    }
+    return {
+        'python': sys.version.split()[0],
+        'settings_module': kwargs.get('settings_module'),
+        'path': kwargs.get('path', '/'),
+        'runs': runs,
+        'status': results[-1]['status'],
+        'wall_ms': round(statistics.median(
+            result['wall'] for result in results
+        ) * ms, 3),
+        'phases_ms': {
+            name: round(value * ms, 3)
+            for name, value in median_of(results, 'phases').items()
+        },
+        'ready_ms': to_ms(median_of(results, 'ready')),
+        'import_phases_ms': to_ms(median_of(results, 'import_phases')),
+        'imports': imports,
+    }
+
+
+if __name__ == '__main__':
+    probe(*sys.argv[1:3])
@@ -1,11 +1,21 @@
 """
 Tests for the Django admin modifications.
 """
+import json
+from unittest.mock import MagicMock, patch
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import Client
 
+from core.admin import ApproximateCountPaginator
+from core.authentication import get_token_cache
+from core.models import EmailVerification
+from rest_framework.authtoken.models import Token
+
 
 class AdminSiteTests(TestCase):
     """Tests for Django admin."""
@@ -45,3 +55,96 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+    def test_export_users_action_streams_ndjson(self):
+        """Test the export action streams the selected users."""
+        EmailVerification.objects.create(user=self.user)
+        url = reverse('admin:core_user_changelist')
+        res = self.client.post(url, {
+            'action': 'export_ndjson',
+            '_selected_action': [self.user.pk],
+        })
+
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        rows = [
+            json.loads(line)
+            for line in b''.join(res.streaming_content).splitlines()
+        ]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['email'], self.user.email)
+        self.assertIs(rows[0]['email_verified'], False)
+        self.assertNotIn('password', rows[0])
+
+    def test_export_users_action_csv(self):
+        url = reverse('admin:core_user_changelist')
+        res = self.client.post(url, {
+            'action': 'export_csv',
+            '_selected_action': [self.admin_user.pk, self.user.pk],
+        })
+
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith('id,email,name'))
+        self.assertEqual(len(lines), 3)
+
+    def test_search_by_email_prefix_and_exact(self):
+        other = get_user_model().objects.create_user(
+            email='userx@example.com', password='testpass123'
+        )
+        url = reverse('admin:core_user_changelist')
+
+        res = self.client.get(url, {'q': 'USER'})
+        self.assertContains(res, self.user.email)
+        self.assertContains(res, other.email)
+
+        res = self.client.get(url, {'q': 'User@Example.com'})
+        self.assertContains(res, self.user.email)
+        self.assertNotContains(res, other.email)
+
+    def test_bulk_deactivate_single_update(self):
+        """Test deactivation is one UPDATE and drops cached tokens."""
+        token = Token.objects.create(user=self.user)
+        get_token_cache().set(token.key, token)
+        url = reverse('admin:core_user_changelist')
+
+        with CaptureQueriesContext(connection) as ctx, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {
+                'action': 'deactivate',
+                '_selected_action': [self.user.pk],
+            })
+
+        updates = [
+            q for q in ctx.captured_queries
+            if q['sql'].startswith('UPDATE "core_user"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertIsNone(get_token_cache().get_local(token.key))
+
+    def test_email_verification_changelist(self):
+        EmailVerification.objects.create(user=self.user)
+        url = reverse('admin:core_emailverification_changelist')
+
+        res = self.client.get(url, {'q': 'user@'})
+
+        self.assertContains(res, self.user.email)
+        self.assertNotContains(
+            res, self.user.emailverification.verification_pin
+        )
+
+    def test_approximate_count_for_large_postgres_table(self):
+        queryset = get_user_model().objects.all()
+        fake = MagicMock(vendor='postgresql')
+        cursor = fake.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = (250000.0,)
+
+        with patch('core.admin.connections', {'default': fake}):
+            paginator = ApproximateCountPaginator(queryset, 100)
+            self.assertEqual(paginator.count, 250000)
+
+            filtered = ApproximateCountPaginator(
+                queryset.filter(is_active=True), 100
+            )
+            self.assertEqual(filtered.count, 2)
@@ -0,0 +1,217 @@
+"""
+Tests for cached token authentication.
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from django.urls import reverse
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.authentication import (
+    CachedTokenAuthentication,
+    TokenUserCache,
+    get_token_cache,
+)
+
+
+@override_settings(TOKEN_AUTH_CACHE={'MAX_SIZE': 100, 'TTL': 60})
+class CachedTokenAuthenticationTests(TestCase):
+    """Test token lookups are cached and invalidated."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.token = Token.objects.create(user=self.user)
+        get_token_cache().clear()
+
+    def authenticate(self, key=None):
+        request = APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Token {key or self.token.key}'
+        )
+        return CachedTokenAuthentication().authenticate(request)
+
+    def test_second_lookup_skips_database(self):
+        """Test a cached token authenticates without queries."""
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_cache_hit_returns_copy(self):
+        """Test callers cannot mutate the cached user."""
+        user, _ = self.authenticate()
+        user.name = 'Changed'
+
+        cached, _ = self.authenticate()
+        self.assertEqual(cached.name, '')
+
+    def test_password_change_invalidates(self):
+        """Test saving the user drops the cached entry."""
+        self.authenticate()
+        self.user.set_password('newpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        with self.assertNumQueries(1):
+            user, _ = self.authenticate()
+        self.assertTrue(user.check_password('newpass123'))
+
+    def test_last_login_update_keeps_cache(self):
+        """Test a last_login-only save does not invalidate."""
+        self.authenticate()
+        self.user.save(update_fields=['last_login'])
+
+        with self.assertNumQueries(0):
+            self.authenticate()
+
+    def test_deactivated_user_rejected(self):
+        """Test deactivating a user takes effect immediately."""
+        self.authenticate()
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deleted_user_rejected(self):
+        """Test deleting a user drops the cached token."""
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_rotated_token_rejected(self):
+        """Test the old key stops working once the token is rotated."""
+        old_key = self.token.key
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+            new_token = Token.objects.create(user=self.user)
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(old_key)
+        user, _ = self.authenticate(new_token.key)
+        self.assertEqual(user.pk, self.user.pk)
+
+    def test_invalidated_on_commit(self):
+        """Test a miss before the commit cannot re-cache the old row."""
+        self.authenticate()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.is_active = False
+            self.user.save()
+            self.assertIsNotNone(get_token_cache().get(self.token.key))
+        for callback in callbacks:
+            callback()
+
+        self.assertIsNone(get_token_cache().get(self.token.key))
+
+    def test_miss_reads_primary(self):
+        """Test cache misses are not routed to a replica."""
+        with patch.object(
+            QuerySet, 'using', autospec=True, side_effect=QuerySet.using
+        ) as using:
+            self.authenticate()
+
+        self.assertEqual(using.call_args.args[1], DEFAULT_DB_ALIAS)
+
+    def test_inactive_snapshot_rejected(self):
+        """Test a cached user is checked for is_active on every hit."""
+        self.user.is_active = False
+        get_token_cache().set(self.token.key, self.token)
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_update_starts_from_current_row(self):
+        """Test writes through /me do not save the cached snapshot."""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        client.get(reverse('user-detail'))
+        # Another process resets the password; its signals do not
+        # reach this process's cache.
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            password='changed-elsewhere'
+        )
+
+        res = client.patch(reverse('user-detail'), {'name': 'New'})
+
+        self.assertEqual(res.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password, 'changed-elsewhere')
+        self.assertEqual(self.user.name, 'New')
+
+    def test_get_reads_current_row(self):
+        """Test /me shows writes whose signals did not reach this cache."""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        client.get(reverse('user-detail'))
+        get_user_model().objects.filter(pk=self.user.pk).update(name='New')
+
+        res = client.get(reverse('user-detail'))
+
+        self.assertEqual(res.json()['name'], 'New')
+
+    @override_settings(TOKEN_AUTH_CACHE={'MAX_SIZE': 1, 'TTL': 60})
+    def test_cache_is_bounded(self):
+        """Test the least recently used entry is evicted."""
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        other_token = Token.objects.create(user=other)
+        self.authenticate()
+        self.authenticate(other_token.key)
+
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+    @override_settings(TOKEN_AUTH_CACHE={'MAX_SIZE': 100, 'TTL': 0})
+    def test_expired_entry_reloaded(self):
+        """Test entries past their TTL are looked up again."""
+        self.authenticate()
+
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+    @override_settings(TOKEN_AUTH_CACHE={
+        'MAX_SIZE': 100, 'TTL': 60, 'SHARED_CACHE_ALIAS': 'default'
+    })
+    def test_shared_tier_used_by_cold_process(self):
+        """Test a process with an empty local cache reads the shared tier."""
+        self.authenticate()
+        cache = get_token_cache()
+        cache.clear()
+
+        with self.assertNumQueries(0):
+            self.authenticate()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+    def test_shared_tier_invalidation_reaches_other_processes(self):
+        """Test an invalidation by one process is seen by another."""
+        this = TokenUserCache(100, 60, shared_alias='default')
+        other = TokenUserCache(100, 60, shared_alias='default')
+        this.set(self.token.key, self.token)
+        self.assertIsNotNone(other.get(self.token.key))
+
+        this.invalidate_user(self.user.pk)
+
+        self.assertIsNone(other.get(self.token.key))
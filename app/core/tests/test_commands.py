@@ -1,13 +1,24 @@
 """
 Test custom Django management commands.
 """
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
 from psycopg2 import OperationalError as Psycopg2OpError
 
 # call command lets call a django command
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core import mail
 from django.core.management import call_command
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from core.models import EmailOutbox, EmailVerification
+from core.outbox import enqueue_email
 
 
 # patch is to mock db behaviour -
@@ -37,3 +48,226 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class EmailOutboxCommandTests(TestCase):
+    """Test the email outbox worker command."""
+
+    def setUp(self):
+        self.row = enqueue_email(
+            'Subject',
+            'Body',
+            'from@example.com',
+            ['to@example.com']
+        )
+
+    def test_process_outbox_sends_pending(self):
+        """Test pending emails are delivered and marked sent."""
+        call_command('process_email_outbox', '--once', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['to@example.com'])
+        self.row.refresh_from_db()
+        self.assertEqual(self.row.status, EmailOutbox.STATUS_SENT)
+        self.assertIsNotNone(self.row.sent_at)
+
+    @patch('core.outbox.EmailMessage.send')
+    def test_process_outbox_retries_with_backoff(self, patched_send):
+        """Test a failed send is rescheduled instead of raising."""
+        patched_send.side_effect = Exception('relay down')
+        before = timezone.now()
+
+        call_command('process_email_outbox', '--once', stdout=StringIO())
+
+        self.row.refresh_from_db()
+        self.assertEqual(self.row.status, EmailOutbox.STATUS_PENDING)
+        self.assertEqual(self.row.attempts, 1)
+        self.assertEqual(self.row.last_error, 'relay down')
+        self.assertGreater(self.row.next_attempt_at, before)
+
+    @patch('core.outbox.EmailMessage.send')
+    def test_process_outbox_dead_letter(self, patched_send):
+        """Test a message is dead-lettered after max attempts."""
+        patched_send.side_effect = Exception('relay down')
+
+        call_command(
+            'process_email_outbox',
+            '--once',
+            '--max-attempts=1',
+            stdout=StringIO()
+        )
+
+        self.row.refresh_from_db()
+        self.assertEqual(self.row.status, EmailOutbox.STATUS_DEAD)
+        self.assertEqual(len(mail.outbox), 0)
+
+
+class SweepVerificationsCommandTests(TestCase):
+    """Test the verification sweeper command."""
+
+    def make_verification(self, email, **fields):
+        user = get_user_model().objects.create_user(email, 'testpass123')
+        verification = EmailVerification.objects.create(user=user)
+        EmailVerification.objects.filter(pk=verification.pk).update(**fields)
+        return verification
+
+    def test_sweep_deletes_expired_and_verified(self):
+        """Test only expired or consumed rows are deleted."""
+        expired = self.make_verification(
+            'expired@example.com',
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        verified = self.make_verification(
+            'verified@example.com', is_verified=True
+        )
+        fresh = self.make_verification('fresh@example.com')
+        out = StringIO()
+
+        call_command(
+            'sweep_verifications', '--batch-size=1', '--sleep=0', stdout=out
+        )
+
+        remaining = set(
+            EmailVerification.objects.values_list('pk', flat=True)
+        )
+        self.assertEqual(remaining, {fresh.pk})
+        self.assertNotIn(expired.pk, remaining)
+        self.assertNotIn(verified.pk, remaining)
+        self.assertIn('Deleted 2 rows', out.getvalue())
+
+    def test_sweep_empty_table(self):
+        out = StringIO()
+        call_command('sweep_verifications', stdout=out)
+
+        self.assertIn('No verification rows', out.getvalue())
+
+
+@override_settings(PASSWORD_HASHERS=[
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+])
+class ImportUsersCommandTests(TestCase):
+    """Test the bulk user import command."""
+
+    def import_file(self, content, suffix, *args):
+        out = StringIO()
+        with tempfile.NamedTemporaryFile('w', suffix=suffix) as f:
+            f.write(content)
+            f.flush()
+            call_command(
+                'import_users', f.name, '--hashing-workers=0', *args,
+                stdout=out
+            )
+        return out.getvalue()
+
+    def test_import_csv(self):
+        """Test users and verification pins are created in batches."""
+        out = self.import_file(
+            'email,password,name\n'
+            'one@example.com,testpass123,One\n'
+            'two@example.com,testpass123,Two\n'
+            'three@example.com,testpass123,Three\n',
+            '.csv', '--batch-size=2',
+        )
+
+        users = get_user_model().objects.order_by('email')
+        self.assertEqual(users.count(), 3)
+        user = users.get(email='one@example.com')
+        self.assertEqual(user.name, 'One')
+        self.assertEqual(user.email_canonical, 'one@example.com')
+        self.assertFalse(user.is_active)
+        self.assertTrue(user.check_password('testpass123'))
+        self.assertRegex(
+            user.emailverification.verification_pin, r'^\d{6}$'
+        )
+        self.assertEqual(EmailVerification.objects.count(), 3)
+        self.assertIn('Imported 3 users', out)
+        self.assertIn('rows/sec', out)
+
+    def test_import_ndjson_prehashed(self):
+        encoded = make_password('testpass123')
+        rows = [
+            {'email': 'hashed@example.com', 'password_hash': encoded},
+            {'email': 'bad-hash@example.com', 'password_hash': 'nope'},
+        ]
+        self.import_file(
+            '\n'.join(json.dumps(row) for row in rows), '.ndjson', '--active'
+        )
+
+        user = get_user_model().objects.get()
+        self.assertEqual(user.password, encoded)
+        self.assertTrue(user.is_active)
+        self.assertFalse(EmailVerification.objects.exists())
+
+    def test_skips_duplicates_and_invalid_rows(self):
+        get_user_model().objects.create_user(
+            'existing@example.com', 'testpass123'
+        )
+        out = self.import_file(
+            'email,password\n'
+            'EXISTING@example.com,testpass123\n'
+            'new@example.com,testpass123\n'
+            'New@Example.com,testpass123\n'
+            'not-an-email,testpass123\n'
+            'later@example.com,testpass123\n',
+            '.csv', '--batch-size=2',
+        )
+
+        self.assertEqual(get_user_model().objects.count(), 3)
+        self.assertIn('Imported 2 users', out)
+        self.assertIn('skipped 2 duplicates and 1 invalid', out)
+
+    def test_import_from_stdin(self):
+        stdin = StringIO('{"email": "piped@example.com"}\n')
+        with patch('sys.stdin', stdin):
+            call_command(
+                'import_users', '--hashing-workers=0', stdout=StringIO()
+            )
+
+        user = get_user_model().objects.get()
+        self.assertEqual(user.email, 'piped@example.com')
+        self.assertFalse(user.has_usable_password())
+
+    def test_import_hashes_on_pool(self):
+        self.import_file(
+            '{"email": "pooled@example.com", "password": "testpass123"}\n',
+            '.ndjson', '--hashing-workers=1',
+        )
+
+        user = get_user_model().objects.get()
+        self.assertTrue(user.check_password('testpass123'))
+
+
+class ExportUsersCommandTests(TestCase):
+    """Test the user export command."""
+
+    def setUp(self):
+        for i in range(3):
+            get_user_model().objects.create_user(
+                f'user{i}@example.com', 'testpass123'
+            )
+
+    def test_export_ndjson(self):
+        out = StringIO()
+        call_command(
+            'export_users', '--chunk-size=2', stdout=out, stderr=StringIO()
+        )
+
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(
+            [row['email'] for row in rows],
+            [f'user{i}@example.com' for i in range(3)],
+        )
+        self.assertIsNone(rows[0]['email_verified'])
+
+    def test_export_csv_to_file(self):
+        err = StringIO()
+        with tempfile.NamedTemporaryFile('r', suffix='.csv') as f:
+            call_command(
+                'export_users', '--format=csv', f'--output={f.name}',
+                stderr=err
+            )
+            lines = f.read().splitlines()
+
+        self.assertEqual(lines[0].split(',')[:2], ['id', 'email'])
+        self.assertEqual(len(lines), 4)
+        self.assertIn('Exported 3 users', err.getvalue())
@@ -0,0 +1,270 @@
+"""
+Tests for the pooled PostgreSQL backend.
+"""
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import psycopg2
+from django.db import connection
+from django.test import SimpleTestCase
+from psycopg2 import extensions
+
+from core import metrics
+from core.db.backends.postgresql_pool import pool as pool_module
+from core.db.backends.postgresql_pool.base import DatabaseWrapper
+from core.db.backends.postgresql_pool.pool import (
+    ConnectionPool,
+    PoolTimeout,
+    close_pools,
+    get_pool,
+    pool_stats,
+)
+
+
+class FakeConnection:
+    """The parts of a psycopg2 connection the pool and Django touch."""
+
+    isolation_level = None
+    autocommit = False
+
+    def __init__(self):
+        self.closed = 0
+        self.pings = 0
+        self.rollbacks = 0
+        self.broken = False
+        self.info = SimpleNamespace(
+            transaction_status=extensions.TRANSACTION_STATUS_IDLE
+        )
+
+    def cursor(self):
+        outer = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql, params=None):
+                if outer.broken:
+                    raise psycopg2.OperationalError('server closed')
+                outer.pings += 1
+
+        return Cursor()
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+    def set_client_encoding(self, encoding):
+        pass
+
+    def get_parameter_status(self, name):
+        return 'UTC'
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test checking connections out of and into the pool."""
+
+    def setUp(self):
+        self.opened = []
+
+    def connect(self):
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+    def test_reuses_returned_connection(self):
+        pool = ConnectionPool('default', pre_ping=False)
+        first = pool.get(self.connect)
+        pool.put(first)
+
+        self.assertIs(pool.get(self.connect), first)
+        self.assertEqual(len(self.opened), 1)
+        stats = pool.stats()
+        self.assertEqual(stats['checkouts'], 2)
+        self.assertEqual(stats['opened'], 1)
+        self.assertEqual(stats['in_use'], 1)
+
+    def test_pre_ping_replaces_broken_connection(self):
+        pool = ConnectionPool('default', pre_ping=True)
+        first = pool.get(self.connect)
+        pool.put(first)
+        first.broken = True
+
+        second = pool.get(self.connect)
+
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        stats = pool.stats()
+        self.assertEqual(stats['ping_failures'], 1)
+        self.assertEqual(stats['size'], 1)
+
+    def test_put_rolls_back_open_transaction(self):
+        pool = ConnectionPool('default', pre_ping=False)
+        conn = pool.get(self.connect)
+        conn.info.transaction_status = extensions.TRANSACTION_STATUS_INERROR
+
+        pool.put(conn)
+
+        self.assertEqual(conn.rollbacks, 1)
+        self.assertIs(pool.get(self.connect), conn)
+
+    def test_put_discards_closed_connection(self):
+        pool = ConnectionPool('default', pre_ping=False)
+        conn = pool.get(self.connect)
+        conn.closed = 2
+
+        pool.put(conn)
+
+        self.assertEqual(pool.stats()['size'], 0)
+        self.assertIsNot(pool.get(self.connect), conn)
+
+    def test_waits_for_returned_connection(self):
+        pool = ConnectionPool('default', max_size=1, pre_ping=False)
+        conn = pool.get(self.connect)
+        timer = threading.Timer(0.05, pool.put, [conn])
+        timer.start()
+
+        self.assertIs(pool.get(self.connect), conn)
+        timer.join()
+        stats = pool.stats()
+        self.assertEqual(stats['waits'], 1)
+        self.assertGreater(stats['wait_seconds_max'], 0)
+
+    def test_timeout_when_exhausted(self):
+        pool = ConnectionPool(
+            'default', max_size=1, pre_ping=False, timeout=0.01
+        )
+        pool.get(self.connect)
+
+        with self.assertRaises(PoolTimeout):
+            pool.get(self.connect)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_stats_exported_as_metrics(self):
+        self.addCleanup(close_pools)
+        pool = get_pool('pooled', {}, {
+            'MAX_SIZE': 1, 'PRE_PING': False, 'TIMEOUT': 0.01,
+        })
+        pool.get(self.connect)
+        with self.assertRaises(PoolTimeout):
+            pool.get(self.connect)
+
+        text = metrics.render(metrics.registry.snapshot())
+
+        for line in [
+            '# TYPE db_pool_size gauge',
+            'db_pool_size{alias="pooled"} 1',
+            'db_pool_idle_connections{alias="pooled"} 0',
+            'db_pool_in_use_connections{alias="pooled"} 1',
+            '# TYPE db_pool_waits_total counter',
+            'db_pool_waits_total{alias="pooled"} 1',
+            'db_pool_timeouts_total{alias="pooled"} 1',
+        ]:
+            self.assertIn(line, text.splitlines())
+        self.assertIn('db_pool_wait_seconds_total{alias="pooled"} ', text)
+
+    def test_failed_connect_frees_slot(self):
+        pool = ConnectionPool('default', max_size=1)
+
+        def fail():
+            raise psycopg2.OperationalError('refused')
+
+        with self.assertRaises(psycopg2.OperationalError):
+            pool.get(fail)
+        self.assertEqual(pool.stats()['size'], 0)
+        pool.get(self.connect)
+
+    def test_idle_timeout_keeps_min_size(self):
+        pool = ConnectionPool(
+            'default', min_size=1, idle_timeout=60, pre_ping=False
+        )
+        conns = [pool.get(self.connect) for _ in range(3)]
+        with patch.object(pool_module.time, 'monotonic', return_value=0):
+            for conn in conns:
+                pool.put(conn)
+
+        with patch.object(pool_module.time, 'monotonic', return_value=61):
+            pool.get(self.connect)
+
+        self.assertEqual(sum(1 for c in conns if c.closed), 2)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_close_drains_idle_and_returned(self):
+        pool = ConnectionPool('default', pre_ping=False)
+        idle, busy = pool.get(self.connect), pool.get(self.connect)
+        pool.put(idle)
+
+        pool.close()
+        self.assertTrue(idle.closed)
+        pool.put(busy)
+        self.assertTrue(busy.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+
+@patch('psycopg2.extras.register_default_jsonb')
+@patch('django.db.backends.postgresql.base.Database.connect')
+class PooledBackendTests(SimpleTestCase):
+    """Test the backend checks connections out and back in."""
+
+    def setUp(self):
+        self.addCleanup(close_pools)
+
+    def make_wrapper(self, alias='pooled'):
+        settings_dict = {
+            **connection.settings_dict,
+            'ENGINE': 'core.db.backends.postgresql_pool',
+            'NAME': 'pooled', 'USER': 'user', 'PASSWORD': '',
+            'HOST': 'localhost', 'PORT': '',
+            'POOL': {'PRE_PING': False},
+        }
+        return DatabaseWrapper(settings_dict, alias=alias)
+
+    def test_close_returns_connection_to_pool(self, connect, register):
+        connect.side_effect = lambda **kwargs: FakeConnection()
+        wrapper = self.make_wrapper()
+
+        wrapper.connect()
+        conn = wrapper.connection
+        wrapper.close()
+        self.assertFalse(conn.closed)
+
+        other = self.make_wrapper()
+        other.connect()
+        self.assertIs(other.connection, conn)
+        self.assertEqual(connect.call_count, 1)
+        other.close()
+        self.assertEqual(pool_stats()['pooled']['idle'], 1)
+
+    def test_close_in_atomic_block_discards(self, connect, register):
+        connect.side_effect = lambda **kwargs: FakeConnection()
+        wrapper = self.make_wrapper()
+
+        wrapper.connect()
+        conn = wrapper.connection
+        wrapper.in_atomic_block = True
+        wrapper.close()
+
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool_stats()['pooled']['size'], 0)
+
+    def test_close_pools_before_dropping_test_database(self, connect,
+                                                       register):
+        connect.side_effect = lambda **kwargs: FakeConnection()
+        wrapper = self.make_wrapper()
+        wrapper.connect()
+        conn = wrapper.connection
+        wrapper.close()
+
+        with patch('django.db.backends.postgresql.creation.'
+                   'DatabaseCreation._destroy_test_db'):
+            wrapper.creation._destroy_test_db('test_pooled', verbosity=0)
+
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool_stats(), {})
@@ -0,0 +1,115 @@
+"""
+Tests for the password hashing executor.
+"""
+import asyncio
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password as django_make_password
+from django.test import TestCase, override_settings
+
+from core import hashing
+
+
+class HashingInlineTests(TestCase):
+    """Test hashing helpers with the pool disabled."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+
+    def test_set_and_verify_password(self):
+        """Test set_password produces a hash verify_password accepts."""
+        hashing.set_password(self.user, 'newpass123')
+
+        self.assertTrue(self.user.check_password('newpass123'))
+        self.assertTrue(hashing.verify_password(self.user, 'newpass123'))
+        self.assertFalse(hashing.verify_password(self.user, 'wrongpass'))
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ])
+    def test_outdated_hash_upgraded(self):
+        """Test a hash from a non-default hasher is upgraded on login."""
+        self.user.password = django_make_password(
+            'testpass123', hasher='pbkdf2_sha1'
+        )
+        self.user.save()
+
+        self.assertTrue(hashing.verify_password(self.user, 'testpass123'))
+
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.password.startswith('pbkdf2_sha1$'))
+        self.assertTrue(self.user.check_password('testpass123'))
+
+
+@override_settings(PASSWORD_HASHING={
+    'WORKERS': 1, 'MAX_PENDING': 1, 'TIMEOUT': 30
+})
+class HashingPoolTests(TestCase):
+    """Test hashing on the process pool."""
+
+    def test_hashes_in_worker_process(self):
+        """Test the pool hashes and verifies passwords."""
+        encoded = hashing.make_password('testpass123')
+
+        user = get_user_model()(email='user@example.com', password=encoded)
+        self.assertTrue(hashing.verify_password(user, 'testpass123'))
+        self.assertFalse(hashing.verify_password(user, 'wrongpass'))
+
+    @override_settings(PASSWORD_HASHING={
+        'WORKERS': 1, 'MAX_PENDING': 1, 'TIMEOUT': 0.01
+    })
+    def test_full_queue_raises_unavailable(self):
+        """Test callers give up once the concurrency cap is reached."""
+        executor = hashing.get_executor()
+        executor._slots.acquire()
+        try:
+            with self.assertRaises(hashing.HashingUnavailable):
+                hashing.make_password('testpass123')
+        finally:
+            executor._slots.release()
+
+    def test_async_hashing_in_worker_process(self):
+        """Test the awaitable API hashes and verifies on the pool."""
+        encoded = asyncio.run(hashing.amake_password('testpass123'))
+
+        user = get_user_model()(email='user@example.com', password=encoded)
+        self.assertTrue(asyncio.run(
+            hashing.averify_password(user, 'testpass123')
+        ))
+        self.assertFalse(asyncio.run(
+            hashing.averify_password(user, 'wrongpass')
+        ))
+
+    @override_settings(PASSWORD_HASHING={
+        'WORKERS': 1, 'MAX_PENDING': 1, 'TIMEOUT': 0.01
+    })
+    def test_async_full_queue_raises_unavailable(self):
+        executor = hashing.get_executor()
+        executor._slots.acquire()
+        try:
+            with self.assertRaises(hashing.HashingUnavailable):
+                asyncio.run(hashing.amake_password('testpass123'))
+        finally:
+            executor._slots.release()
+
+    @override_settings(PASSWORD_HASHING={
+        'WORKERS': 1, 'MAX_PENDING': 1, 'TIMEOUT': 30
+    })
+    def test_timed_out_job_keeps_slot(self):
+        """Test a job still running after its caller gave up holds a slot."""
+        executor = hashing.get_executor()
+        executor.run(time.sleep, 0)  # Start the pool.
+        executor.timeout = 0.05
+
+        with self.assertRaises(hashing.HashingUnavailable):
+            executor.run(time.sleep, 0.5)
+        self.assertFalse(executor._slots.acquire(blocking=False))
+
+        time.sleep(1)
+        self.assertTrue(executor._slots.acquire(blocking=False))
+        executor._slots.release()
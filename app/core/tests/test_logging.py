@@ -0,0 +1,163 @@
+"""
+Tests for the structured logging pipeline.
+"""
+import json
+import logging
+import threading
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core.logging import (
+    REDACTED,
+    JsonFormatter,
+    QueueHandler,
+    RedactingFilter,
+    SamplingFilter,
+)
+from core.utils import send_verification_email
+
+REGISTER_URL = reverse('register')
+
+
+def make_record(name='users.views', level=logging.INFO, msg='Event',
+                args=None, **extra):
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class LoggingTests(SimpleTestCase):
+    """Test the formatter and filters."""
+
+    def test_json_formatter_includes_extra_fields(self):
+        record = make_record(
+            msg='User %s', args=(7,), user_id=7, errors={'email': ['Bad']}
+        )
+
+        data = json.loads(JsonFormatter().format(record))
+
+        self.assertEqual(data['message'], 'User 7')
+        self.assertEqual(data['level'], 'INFO')
+        self.assertEqual(data['logger'], 'users.views')
+        self.assertEqual(data['user_id'], 7)
+        self.assertEqual(data['errors'], {'email': ['Bad']})
+
+    def test_redacts_nested_fields(self):
+        data = {
+            'email': 'user@example.com',
+            'Password1': 'secret123',
+            'nested': [{'token': 'abc'}],
+        }
+        record = make_record(data=data, pin='123456')
+
+        RedactingFilter().filter(record)
+
+        self.assertEqual(record.data, {
+            'email': 'user@example.com',
+            'Password1': REDACTED,
+            'nested': [{'token': REDACTED}],
+        })
+        self.assertEqual(record.pin, REDACTED)
+        # The caller's data is copied, not changed.
+        self.assertEqual(data['Password1'], 'secret123')
+
+    def test_redacts_mapping_args(self):
+        record = make_record(
+            msg='%(email)s %(password)s',
+            args=({'email': 'a@example.com', 'password': 'x'},),
+        )
+
+        RedactingFilter().filter(record)
+
+        self.assertEqual(record.getMessage(), f'a@example.com {REDACTED}')
+
+    @patch('core.logging.random.random', return_value=0.5)
+    def test_sampling_by_logger(self, random):
+        sampler = SamplingFilter({'users': 0.9, 'users.serializers': 0.1})
+
+        self.assertTrue(sampler.filter(make_record('users.views')))
+        self.assertFalse(sampler.filter(make_record('users.serializers')))
+        self.assertTrue(sampler.filter(make_record('core.utils')))
+        self.assertTrue(sampler.filter(
+            make_record('users.serializers', level=logging.WARNING)
+        ))
+
+
+class QueueHandlerTests(TestCase):
+    """Test writing through the listener thread."""
+
+    def make_handler(self, **kwargs):
+        stream = StringIO()
+        handler = QueueHandler(stream=stream, **kwargs)
+        handler.setFormatter(JsonFormatter())
+        handler.addFilter(RedactingFilter())
+        self.addCleanup(handler.close)
+        return handler, stream
+
+    def test_writes_on_listener_thread(self):
+        handler, stream = self.make_handler()
+        threads = []
+        formatter = handler.formatter
+        original = formatter.format
+
+        def format(record):
+            threads.append(threading.current_thread())
+            return original(record)
+
+        with patch.object(formatter, 'format', format):
+            handler.handle(make_record(user_id=1))
+            handler.flush()
+
+        self.assertEqual(json.loads(stream.getvalue())['user_id'], 1)
+        self.assertNotEqual(threads, [threading.current_thread()])
+
+    def test_full_queue_drops_records(self):
+        handler, stream = self.make_handler(maxsize=1)
+        handler.listener.stop()
+
+        for _ in range(3):
+            handler.handle(make_record())
+
+        self.assertEqual(handler.dropped, 2)
+
+    def test_registration_logs_without_password(self):
+        handler, stream = self.make_handler()
+        logger = logging.getLogger('users.views')
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.DEBUG)
+
+        with patch.object(logger, 'handlers', [handler]):
+            self.client.post(REGISTER_URL, {
+                'email': 'test@example.com',
+                'password': 'testpass123',
+                'name': 'Test Name',
+            })
+        handler.flush()
+
+        output = stream.getvalue()
+        self.assertIn('Registration request', output)
+        self.assertIn('User registered', output)
+        self.assertNotIn('testpass123', output)
+        self.assertIn(REDACTED, output)
+
+    @override_settings(DEBUG=True)
+    def test_verification_email_logs_without_pin(self):
+        handler, stream = self.make_handler()
+        logger = logging.getLogger('core.utils')
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.DEBUG)
+        user = get_user_model().objects.create_user(
+            email='test@example.com', password='testpass123'
+        )
+
+        with patch.object(logger, 'handlers', [handler]):
+            send_verification_email(user, '493817')
+        handler.flush()
+
+        output = stream.getvalue()
+        self.assertIn('Queueing verification email', output)
+        self.assertNotIn('493817', output)
@@ -0,0 +1,89 @@
+"""
+Tests for the pooled SMTP email backend.
+"""
+import smtplib
+from unittest.mock import patch
+
+from django.core.mail import EmailMessage
+from django.test import SimpleTestCase
+
+from core import mail
+
+
+def send(backend):
+    message = EmailMessage(
+        'Subject', 'Body', 'from@example.com', ['to@example.com']
+    )
+    return backend.send_messages([message])
+
+
+@patch('smtplib.SMTP')
+class PooledSMTPBackendTests(SimpleTestCase):
+    """Test connection reuse in the pooled backend."""
+
+    def setUp(self):
+        mail._pools.clear()
+
+    def get_backend(self, **kwargs):
+        kwargs.setdefault('pool_size', 2)
+        return mail.PooledSMTPEmailBackend(
+            host='localhost', port=2525, username='', password='',
+            use_tls=False, use_ssl=False, **kwargs
+        )
+
+    def test_connection_reused_across_backends(self, patched_smtp):
+        """Test consecutive sends share one SMTP session."""
+        self.assertEqual(send(self.get_backend()), 1)
+        self.assertEqual(send(self.get_backend()), 1)
+
+        patched_smtp.assert_called_once()
+        self.assertEqual(patched_smtp.return_value.sendmail.call_count, 2)
+        patched_smtp.return_value.quit.assert_not_called()
+
+    def test_idle_connection_replaced(self, patched_smtp):
+        """Test a connection idle past the timeout is not reused."""
+        send(self.get_backend(idle_timeout=1))
+
+        with patch('core.mail.time.monotonic', return_value=10 ** 9):
+            send(self.get_backend(idle_timeout=1))
+
+        self.assertEqual(patched_smtp.call_count, 2)
+        patched_smtp.return_value.quit.assert_called_once()
+
+    def test_reconnects_when_server_disconnected(self, patched_smtp):
+        """Test a stale pooled connection is retried on a new one."""
+        send(self.get_backend())
+        patched_smtp.return_value.sendmail.side_effect = [
+            smtplib.SMTPServerDisconnected('gone'), {}
+        ]
+
+        self.assertEqual(send(self.get_backend()), 1)
+        self.assertEqual(patched_smtp.call_count, 2)
+
+    def test_pool_size_is_bounded(self, patched_smtp):
+        """Test no more than pool_size connections are checked out."""
+        first = self.get_backend(pool_size=1, wait_timeout=0.01)
+        second = self.get_backend(pool_size=1, wait_timeout=0.01)
+        first.open()
+
+        with self.assertRaises(smtplib.SMTPException):
+            second.open()
+
+        first.close()
+        self.assertTrue(second.open())
+        patched_smtp.assert_called_once()
+
+    def test_failed_send_frees_slot(self, patched_smtp):
+        """Test a send that raises does not keep its connection."""
+        backend = self.get_backend(pool_size=1, wait_timeout=0.01)
+        patched_smtp.return_value.sendmail.side_effect = (
+            smtplib.SMTPRecipientsRefused({})
+        )
+
+        with self.assertRaises(smtplib.SMTPRecipientsRefused):
+            send(backend)
+
+        self.assertIsNone(backend.connection)
+        patched_smtp.return_value.quit.assert_called_once()
+        patched_smtp.return_value.sendmail.side_effect = None
+        self.assertEqual(send(self.get_backend(pool_size=1)), 1)
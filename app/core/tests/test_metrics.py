@@ -0,0 +1,280 @@
+"""
+Tests for the Prometheus metrics.
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import resolve, reverse
+
+from core import hashing, metrics
+from core.metrics import registry
+
+METRICS_URL = reverse('metrics')
+LOGIN_URL = reverse('login')
+
+
+def sample(name, **labels):
+    """The value of one sample in the collected metrics."""
+    family = registry.collect().get(name, {})
+    names = family.get('labels', [])
+    return family.get('values', {}).get(tuple(labels[n] for n in names))
+
+
+class MetricsMiddlewareTests(TestCase):
+    """Test recording and serving request metrics."""
+
+    def setUp(self):
+        registry.clear()
+
+    def test_records_request_by_url_name(self):
+        self.client.post(LOGIN_URL, {'email': 'x@example.com'})
+
+        self.assertEqual(sample(
+            'http_requests_total',
+            view='login', method='POST', status='400',
+        ), 1)
+        counts = sample(
+            'http_request_duration_seconds', view='login', method='POST'
+        )
+        self.assertEqual(sum(counts[:-1]), 1)
+        self.assertGreater(counts[-1], 0)
+
+    def test_records_queries(self):
+        self.client.post(
+            LOGIN_URL, {'email': 'x@example.com', 'password': 'pass123'}
+        )
+
+        self.assertGreater(sample('db_queries_total', view='login'), 0)
+        self.assertGreater(
+            sample('db_query_duration_seconds_total', view='login'), 0
+        )
+
+    def test_unmatched_url(self):
+        self.client.get('/no-such-page/')
+
+        self.assertEqual(sample(
+            'http_requests_total',
+            view='unmatched', method='GET', status='404',
+        ), 1)
+
+    @override_settings(METRICS={**settings.METRICS, 'TOKEN': 'secret'})
+    def test_exposition(self):
+        self.client.post(LOGIN_URL, {'email': 'x@example.com'})
+
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION='Bearer secret'
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], metrics.CONTENT_TYPE)
+        body = res.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn(
+            'http_requests_total{view="login",method="POST",'
+            'status="400"} 1\n', body
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{view="login",'
+            'method="POST",le="+Inf"} 1\n', body
+        )
+        self.assertIn(
+            'http_request_duration_seconds_count{view="login",'
+            'method="POST"} 1\n', body
+        )
+
+    @override_settings(METRICS={**settings.METRICS, 'TOKEN': 'secret'})
+    def test_token_required(self):
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 401)
+
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(METRICS={**settings.METRICS, 'TOKEN': ''})
+    def test_not_served_without_token(self):
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 404)
+
+        with override_settings(METRICS={
+            **settings.METRICS, 'PUBLIC': True,
+        }):
+            self.assertEqual(self.client.get(METRICS_URL).status_code, 200)
+
+    @override_settings(DEBUG=True)  # Django only logs adaptions then.
+    def test_async_chain_not_adapted(self):
+        """Test ASGI requests are not wrapped in async_to_sync."""
+        with patch('django.core.handlers.base.logger') as logger:
+            ASGIHandler()
+
+        adapted = [
+            call.args[1] for call in logger.debug.call_args_list
+            if call.args[0] == 'Asynchronous %s adapted.'
+        ]
+        self.assertNotIn('middleware core.metrics.MetricsMiddleware', adapted)
+        self.assertNotIn(
+            'middleware core.profiling.ProfilingMiddleware', adapted
+        )
+
+    def test_records_async_request(self):
+        async def view(request):
+            request.resolver_match = resolve(LOGIN_URL)
+            return HttpResponse(status=204)
+
+        middleware = metrics.MetricsMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        asyncio.run(middleware(RequestFactory().get(LOGIN_URL)))
+
+        self.assertEqual(sample(
+            'http_requests_total', view='login', method='GET', status='204',
+        ), 1)
+
+    @override_settings(PASSWORD_HASHING={'WORKERS': 0})
+    def test_records_password_hashing(self):
+        hashing.make_password('testpass123')
+
+        counts = sample('password_hash_duration_seconds', operation='make')
+        self.assertEqual(sum(counts[:-1]), 1)
+
+
+class HistogramTests(SimpleTestCase):
+    """Test bucketing and the text format."""
+
+    def setUp(self):
+        registry.clear()
+
+    def test_bucket_bounds_are_inclusive(self):
+        metrics.PASSWORD_HASH_SECONDS.observe(0.5, 'make')
+        metrics.PASSWORD_HASH_SECONDS.observe(20, 'make')
+
+        body = metrics.render(registry.snapshot())
+
+        self.assertIn(
+            'password_hash_duration_seconds_bucket{operation="make",'
+            'le="0.25"} 0\n', body
+        )
+        self.assertIn(
+            'password_hash_duration_seconds_bucket{operation="make",'
+            'le="0.5"} 1\n', body
+        )
+        self.assertIn(
+            'password_hash_duration_seconds_bucket{operation="make",'
+            'le="+Inf"} 2\n', body
+        )
+        self.assertIn(
+            'password_hash_duration_seconds_sum{operation="make"} 20.5\n',
+            body
+        )
+
+    def test_label_values_escaped(self):
+        metrics.MAIL_SEND_SECONDS.observe(0.1, 'a"b\\c\n')
+
+        body = metrics.render(registry.snapshot())
+
+        self.assertIn('result="a\\"b\\\\c\\n"', body)
+
+
+class MultiprocessTests(SimpleTestCase):
+    """Test adding up the snapshots of several processes."""
+
+    def setUp(self):
+        registry.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        options = override_settings(METRICS={
+            **settings.METRICS, 'MULTIPROCESS_DIR': self.dir,
+        })
+        options.enable()
+        self.addCleanup(options.disable)
+
+    def run_worker(self, requests):
+        """Count requests in a child process that then exits."""
+        script = (
+            'import django; django.setup()\n'
+            'from core import metrics\n'
+            f'for _ in range({requests}):\n'
+            '    metrics.HTTP_REQUESTS.inc("login", "POST", "200")\n'
+        )
+        subprocess.run(
+            [sys.executable, '-c', script],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, 'METRICS_MULTIPROCESS_DIR': self.dir},
+            check=True,
+        )
+
+    def test_sums_live_and_exited_processes(self):
+        self.run_worker(2)
+        self.run_worker(3)
+        metrics.HTTP_REQUESTS.inc('login', 'POST', '200')
+
+        self.assertEqual(sample(
+            'http_requests_total',
+            view='login', method='POST', status='200',
+        ), 6)
+        # Exited workers are archived, the live process is not.
+        files = sorted(os.listdir(self.dir))
+        self.assertIn(metrics.ARCHIVE, files)
+        self.assertEqual(
+            [f for f in files if f.startswith('metrics-')],
+            [os.path.basename(registry.path)],
+        )
+
+        # Archived counts are kept on the next scrape.
+        metrics.HTTP_REQUESTS.inc('login', 'POST', '200')
+        self.assertEqual(sample(
+            'http_requests_total',
+            view='login', method='POST', status='200',
+        ), 7)
+
+    def test_exited_process_gauges_dropped(self):
+        metrics._write(os.path.join(self.dir, 'metrics-999999999-x.json'), {
+            'db_pool_size': metrics.family(
+                'gauge', 'Size.', ['alias'], {('default',): 4}
+            ),
+            'db_pool_waits_total': metrics.family(
+                'counter', 'Waits.', ['alias'], {('default',): 2}
+            ),
+        })
+
+        for _ in range(2):
+            self.assertIsNone(sample('db_pool_size', alias='default'))
+            self.assertEqual(
+                sample('db_pool_waits_total', alias='default'), 2
+            )
+
+    def test_flush_interval(self):
+        registry._next_flush = 0
+        registry.maybe_flush()
+        metrics.HTTP_REQUESTS.inc('login', 'POST', '200')
+        registry.maybe_flush()
+
+        snapshot = metrics._read(registry.path)
+        self.assertEqual(snapshot['http_requests_total']['values'], {})
+
+    def test_forked_child_starts_from_zero(self):
+        metrics.HTTP_REQUESTS.inc('login', 'POST', '200')
+        parent_path = registry.path
+
+        pid = os.fork()
+        if pid == 0:
+            code = 0 if (
+                registry.path != parent_path
+                and not metrics.HTTP_REQUESTS.values
+            ) else 1
+            os._exit(code)
+        _, status = os.waitpid(pid, 0)
+
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
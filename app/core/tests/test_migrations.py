@@ -0,0 +1,119 @@
+"""
+Tests for data-dependent migrations.
+"""
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection
+from django.db.backends.postgresql.base import DatabaseWrapper
+from django.db.migrations.executor import MigrationExecutor
+from django.db.migrations.loader import MigrationLoader
+from django.test import SimpleTestCase, TransactionTestCase
+
+BEFORE = [('core', '0011_fill_email_canonical')]
+AFTER = [('core', '0012_alter_user_email_canonical')]
+
+
+class EmailCanonicalMigrationTests(TransactionTestCase):
+    """Test making email_canonical unique."""
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        # Leave the schema as the other tests expect it.
+        executor = MigrationExecutor(connection)
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM core_user')
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def create_user(self, apps, email):
+        return apps.get_model('core', 'User').objects.create(
+            email=email, email_canonical=email.lower(), password='x'
+        )
+
+    def test_unique_after_migration(self):
+        apps = self.migrate(BEFORE)
+        self.create_user(apps, 'user@example.com')
+
+        apps = self.migrate(AFTER)
+
+        with self.assertRaises(IntegrityError):
+            self.create_user(apps, 'user@example.com')
+
+    def test_duplicates_abort_with_message(self):
+        apps = self.migrate(BEFORE)
+        self.create_user(apps, 'User@example.com')
+        self.create_user(apps, 'user@example.com')
+
+        with self.assertRaisesMessage(CommandError, "['user@example.com']"):
+            self.migrate(AFTER)
+
+
+def postgresql_sql(name):
+    """The SQL migration `name` of core runs on PostgreSQL."""
+    # Never connects; only the SQL is collected.
+    postgresql = DatabaseWrapper(connection.settings_dict)
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    state = loader.project_state(('core', name), at_end=False)
+    migration = loader.get_migration('core', name)
+    with postgresql.schema_editor(collect_sql=True, atomic=False) as editor:
+        migration.apply(state, editor, collect_sql=True)
+    return [
+        sql.rstrip(';') for sql in editor.collected_sql
+        if not sql.startswith('--')
+    ]
+
+
+class LargeTableMigrationTests(SimpleTestCase):
+    """Test migrations of large tables do not block writes on PostgreSQL."""
+
+    def test_expires_index_built_concurrently(self):
+        sql = postgresql_sql('0009_emailverification_expires_idx')
+
+        self.assertEqual(sql, [
+            'DROP INDEX CONCURRENTLY IF EXISTS "core_emailver_expires_idx"',
+            'CREATE INDEX CONCURRENTLY "core_emailver_expires_idx" ON '
+            '"core_emailverification" ("expires_at")',
+        ])
+
+    def test_email_canonical_constrained_without_long_locks(self):
+        sql = postgresql_sql('0012_alter_user_email_canonical')
+
+        self.assertEqual(sql, [
+            'DROP INDEX CONCURRENTLY IF EXISTS '
+            '"core_user_email_canonical_uniq"',
+            'CREATE UNIQUE INDEX CONCURRENTLY '
+            '"core_user_email_canonical_uniq" ON "core_user" '
+            '("email_canonical")',
+            'ALTER TABLE "core_user" ADD CONSTRAINT '
+            '"core_user_email_canonical_uniq" UNIQUE USING INDEX '
+            '"core_user_email_canonical_uniq"',
+            'ALTER TABLE "core_user" DROP CONSTRAINT IF EXISTS '
+            '"core_user_email_canonical_notnull"',
+            'ALTER TABLE "core_user" ADD CONSTRAINT '
+            '"core_user_email_canonical_notnull" CHECK '
+            '("email_canonical" IS NOT NULL) NOT VALID',
+            'ALTER TABLE "core_user" VALIDATE CONSTRAINT '
+            '"core_user_email_canonical_notnull"',
+            'ALTER TABLE "core_user" ALTER COLUMN "email_canonical" '
+            'SET NOT NULL',
+            'ALTER TABLE "core_user" DROP CONSTRAINT '
+            '"core_user_email_canonical_notnull"',
+        ])
+
+    def test_created_index_built_concurrently(self):
+        sql = postgresql_sql('0013_emailverification_created_idx')
+
+        self.assertEqual(sql[-1], (
+            'CREATE INDEX CONCURRENTLY "core_emailver_created_idx" ON '
+            '"core_emailverification" ("created_at")'
+        ))
+
+    def test_email_prefix_index_built_concurrently(self):
+        sql = postgresql_sql('0014_user_email_canonical_like')
+
+        self.assertEqual(sql[-1], (
+            'CREATE INDEX CONCURRENTLY "core_user_email_canonical_like" ON '
+            '"core_user" ("email_canonical" varchar_pattern_ops)'
+        ))
@@ -1,6 +1,7 @@
 """
 Tests for models
 """
+from django.db import IntegrityError
 from django.test import TestCase
 # provided by django to get default user model
 from django.contrib.auth import get_user_model
@@ -49,3 +50,34 @@ class ModelTests(TestCase):
 
         self.assertTrue(user.is_superuser)
         self.assertTrue(user.is_staff)
+
+    def test_email_canonical_set_on_save(self):
+        """Test the canonical email is lower-cased and kept in sync."""
+        user = get_user_model().objects.create_user(
+            'Test1@Example.com', 'sample123'
+        )
+        self.assertEqual(user.email_canonical, 'test1@example.com')
+
+        user.email = 'Other@Example.com'
+        user.save(update_fields=['email'])
+        user.refresh_from_db()
+        self.assertEqual(user.email_canonical, 'other@example.com')
+
+    def test_lookup_by_email_is_case_insensitive(self):
+        """Test users are found through the canonical email."""
+        user = get_user_model().objects.create_user(
+            'Test1@example.com', 'sample123'
+        )
+        manager = get_user_model().objects
+
+        self.assertEqual(manager.with_email('TEST1@EXAMPLE.COM').get(), user)
+        self.assertEqual(manager.get_by_natural_key('test1@example.com'), user)
+
+    def test_canonical_email_unique(self):
+        """Test emails differing only in case cannot both register."""
+        get_user_model().objects.create_user('test@example.com', 'sample123')
+
+        with self.assertRaises(IntegrityError):
+            get_user_model().objects.create_user(
+                'TEST@example.com', 'sample123'
+            )
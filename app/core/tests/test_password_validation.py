@@ -0,0 +1,100 @@
+"""
+Tests for the compiled common-password validator.
+"""
+import gzip
+import os
+import tempfile
+from io import StringIO
+
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from core.password_validation import (
+    CommonPasswordValidator,
+    CompiledWordList,
+    compile_word_list,
+)
+
+
+class CompiledWordListTests(SimpleTestCase):
+    """Test compiling and searching word lists."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.path = os.path.join(self.dir, 'common.compiled')
+
+    def test_lookup_matches_set(self):
+        words = [f'word{i:05d}' for i in range(0, 5000, 3)] + [
+            'a', 'zz', 'pässwörd', 'Mixed Case',
+        ]
+        count = compile_word_list(words + ['a', ' zz '], self.path)
+        word_list = CompiledWordList(self.path)
+        expected = {w.lower().strip() for w in words}
+
+        self.assertEqual(count, len(expected))
+        for i in range(5000):
+            word = f'word{i:05d}'
+            self.assertEqual(word in word_list, word in expected, word)
+        for word in ['a', 'zz', 'pässwörd', 'mixed case']:
+            self.assertIn(word, word_list)
+        for word in ['', 'b', 'zzz', 'word', 'word000010', '0']:
+            self.assertNotIn(word, word_list)
+
+    def test_empty_list(self):
+        compile_word_list([], self.path)
+
+        self.assertNotIn('password', CompiledWordList(self.path))
+
+    def test_rejects_other_files(self):
+        with open(self.path, 'w') as f:
+            f.write('password\n')
+
+        with self.assertRaises(ImproperlyConfigured):
+            CompiledWordList(self.path)
+
+    def test_validator_uses_compiled_list(self):
+        compile_word_list(['hunter2'], self.path)
+        validator = CommonPasswordValidator(compiled_path=self.path)
+
+        self.assertIsInstance(validator.passwords, CompiledWordList)
+        with self.assertRaises(ValidationError) as cm:
+            validator.validate(' HUNTER2 ')
+        self.assertEqual(cm.exception.error_list[0].code,
+                         'password_too_common')
+        validator.validate('password')  # not in this list
+
+    def test_validator_falls_back_without_compiled_list(self):
+        validator = CommonPasswordValidator(
+            compiled_path=os.path.join(self.dir, 'missing')
+        )
+
+        self.assertIsInstance(validator.passwords, set)
+        with self.assertRaises(ValidationError):
+            validator.validate('password')
+
+    def test_build_command(self):
+        source = os.path.join(self.dir, 'list.txt.gz')
+        with gzip.open(source, 'wt', encoding='utf-8') as f:
+            f.write('Secret1\nletmein\n\nletmein\n')
+        out = StringIO()
+
+        call_command(
+            'build_common_passwords', source, output=self.path, stdout=out
+        )
+
+        self.assertIn('Wrote 2 passwords', out.getvalue())
+        word_list = CompiledWordList(self.path)
+        self.assertIn('secret1', word_list)
+        self.assertIn('letmein', word_list)
+
+    def test_build_command_default_list(self):
+        call_command(
+            'build_common_passwords', output=self.path, stdout=StringIO()
+        )
+
+        validator = CommonPasswordValidator(compiled_path=self.path)
+        with self.assertRaises(ValidationError):
+            validator.validate('password')
@@ -0,0 +1,196 @@
+"""
+Tests for the cached /me payloads.
+"""
+import threading
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.payload_cache import UserPayloadCache, get_payload_cache, make_etag
+
+ME_URL = reverse('user-detail')
+ENABLED = override_settings(USER_PAYLOAD_CACHE={
+    **settings.USER_PAYLOAD_CACHE, 'ENABLED': True, 'CACHE_ALIAS': 'default',
+})
+
+
+@ENABLED
+class PayloadCacheApiTests(TestCase):
+    """Test ETags and conditional GETs on /me."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123', name='Name'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_get_sets_validators(self):
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['ETag'], make_etag(res.json()))
+        self.assertEqual(res['Cache-Control'], 'private, no-cache')
+        self.assertIn('Authorization', res['Vary'])
+
+    def test_cached_payload_needs_no_queries(self):
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.json(), {'email': 'user@example.com',
+                                      'name': 'Name'})
+
+    def test_matching_etag_not_modified(self):
+        etag = self.client.get(ME_URL)['ETag']
+
+        for header in [etag, f'W/{etag}', f'"other", {etag}', '*']:
+            res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=header)
+            self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(res.content, b'')
+            self.assertEqual(res['ETag'], etag)
+
+    def test_update_changes_etag(self):
+        etag = self.client.get(ME_URL)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(ME_URL, {'name': 'New'})
+        res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['name'], 'New')
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_save_elsewhere_changes_payload(self):
+        self.client.get(ME_URL)
+
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+
+        # The request's user is older than the save; the cache reloads.
+        self.assertEqual(self.client.get(ME_URL).json()['name'], 'Renamed')
+
+    def test_admin_bulk_action_bumps_version(self):
+        payloads = get_payload_cache()
+        version = payloads.version(self.user.pk)
+        model_admin = admin.site._registry[get_user_model()]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            model_admin._set_active(
+                get_user_model().objects.filter(pk=self.user.pk), False
+            )
+
+        self.assertNotEqual(payloads.version(self.user.pk), version)
+
+    def test_version_bumped_on_commit(self):
+        payloads = get_payload_cache()
+        version = payloads.version(self.user.pk)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.save()
+            # A miss now must not store the row under a new version.
+            self.assertEqual(payloads.version(self.user.pk), version)
+        for callback in callbacks:
+            callback()
+
+        self.assertNotEqual(payloads.version(self.user.pk), version)
+
+    def test_deleted_user_unauthorized(self):
+        get_user_model().objects.filter(pk=self.user.pk).delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(USER_PAYLOAD_CACHE={
+        **settings.USER_PAYLOAD_CACHE, 'CACHE_ALIAS': '',
+    })
+    def test_off_without_shared_alias(self):
+        self.assertIsNone(get_payload_cache())
+
+    @override_settings(USER_PAYLOAD_CACHE={
+        **settings.USER_PAYLOAD_CACHE, 'ENABLED': False,
+    })
+    def test_disabled_cache_still_validates(self):
+        etag = self.client.get(ME_URL)['ETag']
+
+        res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertIsNone(get_payload_cache())
+
+    @override_settings(ROOT_URLCONF='users.tests.test_async_views')
+    def test_async_view_not_modified(self):
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        res = client.get(ME_URL)
+        self.assertEqual(res.json()['name'], 'Name')
+        res = client.get(ME_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['Cache-Control'], 'private, no-cache')
+
+
+class UserPayloadCacheTests(SimpleTestCase):
+    """Test versioning and coalescing of loads."""
+
+    def setUp(self):
+        cache.clear()
+        self.payloads = UserPayloadCache(lock_timeout=1)
+
+    def test_bump_replaces_entry(self):
+        self.payloads.get(1, lambda: {'name': 'Old'})
+        self.payloads.bump(1)
+
+        etag, data = self.payloads.get(1, lambda: {'name': 'New'})
+
+        self.assertEqual(data, {'name': 'New'})
+        self.assertEqual(etag, make_etag({'name': 'New'}))
+
+    def test_concurrent_misses_load_once(self):
+        calls = []
+        release = threading.Event()
+        results = []
+
+        def load():
+            calls.append(1)
+            release.wait(1)
+            return {'name': 'Name'}
+
+        def get():
+            results.append(self.payloads.get(1, load))
+
+        threads = [threading.Thread(target=get) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [results[0]] * len(threads))
+
+    def test_waits_for_load_in_other_process(self):
+        key = f'userpayload:1:{self.payloads.version(1)}'
+        cache.add(f'{key}:lock', 1)
+        entry = (make_etag({'name': 'Name'}), {'name': 'Name'})
+        timer = threading.Timer(0.05, cache.set, (key, entry))
+        timer.start()
+        self.addCleanup(timer.join)
+
+        result = self.payloads.get(1, self.fail)
+
+        self.assertEqual(result, entry)
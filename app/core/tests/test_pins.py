@@ -0,0 +1,71 @@
+"""
+Tests for verification pin backends.
+"""
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import pins
+
+
+@override_settings(VERIFICATION_PIN={
+    'BACKEND': 'core.pins.HmacPinBackend',
+    'WINDOW': 60,
+})
+class HmacPinBackendTests(TestCase):
+    """Test stateless HMAC pins."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.backend = pins.get_pin_backend()
+
+    def test_issue_and_check_without_queries(self):
+        """Test pins are issued and checked without touching the db."""
+        with self.assertNumQueries(0):
+            pin = self.backend.issue(self.user, pins.PURPOSE_VERIFY)
+            self.backend.check(self.user, pin, pins.PURPOSE_VERIFY)
+
+        self.assertRegex(pin, r'^\d{6}$')
+
+    def test_wrong_pin_rejected(self):
+        pin = self.backend.issue(self.user, pins.PURPOSE_VERIFY)
+        wrong = f'{(int(pin) + 1) % 10 ** 6:06d}'
+
+        with self.assertRaises(pins.InvalidPin):
+            self.backend.check(self.user, wrong, pins.PURPOSE_VERIFY)
+
+    def test_pin_bound_to_purpose(self):
+        """Test a verification pin cannot reset a password."""
+        pin = self.backend.issue(self.user, pins.PURPOSE_VERIFY)
+
+        with self.assertRaises(pins.InvalidPin):
+            self.backend.check(self.user, pin, pins.PURPOSE_RESET)
+
+    def test_pin_expires_after_two_windows(self):
+        pin = self.backend.issue(self.user, pins.PURPOSE_VERIFY)
+
+        later = timezone.now() + timedelta(seconds=60)
+        with patch('core.pins.timezone.now', return_value=later):
+            self.backend.check(self.user, pin, pins.PURPOSE_VERIFY)
+
+        later = timezone.now() + timedelta(seconds=180)
+        with patch('core.pins.timezone.now', return_value=later):
+            with self.assertRaises(pins.ExpiredPin):
+                self.backend.check(self.user, pin, pins.PURPOSE_VERIFY)
+
+    def test_consume_invalidates_pin(self):
+        pin = self.backend.issue(self.user, pins.PURPOSE_RESET)
+        record = self.backend.check(self.user, pin, pins.PURPOSE_RESET)
+        self.backend.consume(self.user, record)
+        self.user.save()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.pin_counter, 1)
+        with self.assertRaises(pins.InvalidPin):
+            self.backend.check(self.user, pin, pins.PURPOSE_RESET)
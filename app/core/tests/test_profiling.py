@@ -0,0 +1,140 @@
+"""
+Tests for the request profiling middleware.
+"""
+import asyncio
+import cProfile
+import os
+import pstats
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import resolve, reverse
+
+from core import profiling
+from core.profiling import ProfilingMiddleware, check_token, make_token
+
+LOGIN_URL = reverse('login')
+
+
+class ProfilingMiddlewareTests(TestCase):
+    """Test picking and profiling requests."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.enable()
+        get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123'
+        )
+
+    def enable(self, **options):
+        override = override_settings(PROFILING={
+            **settings.PROFILING,
+            'ENABLED': True, 'DIR': self.dir, **options,
+        })
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def login(self, **headers):
+        return self.client.post(LOGIN_URL, {
+            'email': 'user@example.com', 'password': 'testpass123',
+        }, **headers)
+
+    def test_signed_header_profiles_request(self):
+        res = self.login(HTTP_X_PROFILE=make_token())
+
+        name = res['X-Profile-Id']
+        self.assertRegex(name, r'^\d{8}T\d{6}-login-\d+ms-\d+$')
+        base = os.path.join(self.dir, name)
+        stats = pstats.Stats(f'{base}.pstats', stream=StringIO())
+        self.assertTrue(stats.total_tt > 0)
+        with open(f'{base}.collapsed') as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            self.assertRegex(line, r'^\S.* \d+$')
+        self.assertTrue(
+            any('hashers.check_password' in line for line in lines)
+        )
+
+    def test_bad_signature_ignored(self):
+        res = self.login(HTTP_X_PROFILE=make_token() + 'x')
+
+        self.assertNotIn('X-Profile-Id', res)
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_sampled_request_profiled(self):
+        self.enable(SAMPLE_RATE=1)
+
+        self.assertIn('X-Profile-Id', self.login())
+
+    def test_unsampled_request_not_profiled(self):
+        self.assertNotIn('X-Profile-Id', self.login())
+
+    def test_async_view_profiled(self):
+        async def view(request):
+            request.resolver_match = resolve(LOGIN_URL)
+            return HttpResponse()
+
+        middleware = ProfilingMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        request = RequestFactory().post(LOGIN_URL, HTTP_X_PROFILE=make_token())
+
+        response = asyncio.run(middleware(request))
+
+        self.assertIn('X-Profile-Id', response)
+
+    def test_other_views_not_profiled(self):
+        res = self.client.get(reverse('metrics'), HTTP_X_PROFILE=make_token())
+
+        self.assertNotIn('X-Profile-Id', res)
+
+
+class ProfilingTests(SimpleTestCase):
+    """Test the middleware switch, tokens and stack collapsing."""
+
+    def test_disabled_middleware_not_used(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ProfilingMiddleware(lambda request: HttpResponse())
+
+    @override_settings(PROFILING={'TOKEN_MAX_AGE': -1})
+    def test_expired_token_rejected(self):
+        self.assertFalse(check_token(make_token()))
+
+    def test_command_prints_valid_token(self):
+        out = StringIO()
+        call_command('profile_token', stdout=out)
+
+        header, token = out.getvalue().strip().split(': ')
+        self.assertEqual(header, 'X-Profile')
+        self.assertTrue(check_token(token))
+
+    def test_collapse_follows_calls(self):
+        def leaf():
+            return sum(range(20000))
+
+        def outer():
+            for _ in range(20):
+                leaf()
+
+        profiler = cProfile.Profile()
+        profiler.runcall(outer)
+
+        lines = profiling.collapse(pstats.Stats(profiler).stats)
+
+        self.assertRegex(
+            lines,
+            r'(?m)^test_profiling\.outer:\d+;test_profiling\.leaf:\d+ \d+$'
+        )
@@ -0,0 +1,207 @@
+"""
+Tests for the read-replica router.
+
+The routing tests run with any settings. ReplicaApiTests needs a real
+second database and runs with app.replica_settings.
+"""
+import asyncio
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connections
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import get_token_cache
+from core.db import routers
+from core.db.routers import (
+    ReplicaPinningMiddleware,
+    ReplicaRouter,
+    RoutingState,
+)
+
+HAS_REPLICA = 'replica' in settings.DATABASES
+ROUTING = {
+    'REPLICAS': ['replica'],
+    'MAX_LAG': 5,
+    'LAG_CHECK_INTERVAL': 60,
+    'PIN_SECONDS': 10,
+    'COOKIE_NAME': 'replica_pin',
+}
+
+
+@override_settings(REPLICA_ROUTING=ROUTING)
+@patch('core.db.routers.replica_lag', return_value=0.0)
+class ReplicaRouterTests(SimpleTestCase):
+    """Test routing decisions."""
+
+    def setUp(self):
+        routers._health.clear()
+        self.router = ReplicaRouter()
+        self.User = get_user_model()
+
+    def in_request(self, state=None):
+        token = routers._state.set(state or RoutingState())
+        self.addCleanup(routers._state.reset, token)
+
+    def test_outside_request_uses_primary(self, lag):
+        self.assertEqual(self.router.db_for_read(self.User), 'default')
+        lag.assert_not_called()
+
+    def test_request_reads_from_replica(self, lag):
+        self.in_request()
+
+        self.assertEqual(self.router.db_for_read(self.User), 'replica')
+        self.assertEqual(self.router.db_for_read(Token), 'replica')
+        lag.assert_called_once_with('replica')
+
+    def test_write_pins_request_to_primary(self, lag):
+        self.in_request()
+        self.router.db_for_read(self.User)
+
+        self.assertEqual(self.router.db_for_write(self.User), 'default')
+        self.assertEqual(self.router.db_for_read(self.User), 'default')
+
+    def test_pinned_request_uses_primary(self, lag):
+        self.in_request(RoutingState(pinned=True))
+
+        self.assertEqual(self.router.db_for_read(self.User), 'default')
+
+    def test_reads_in_transaction_use_primary(self, lag):
+        self.in_request()
+        with patch.object(connections['default'], 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(self.User), 'default')
+
+    def test_lagging_replica_skipped(self, lag):
+        lag.return_value = 30.0
+        self.in_request()
+
+        self.assertEqual(self.router.db_for_read(self.User), 'default')
+
+    def test_unreachable_replica_skipped(self, lag):
+        lag.side_effect = DatabaseError('connection refused')
+        self.in_request()
+
+        self.assertEqual(self.router.db_for_read(self.User), 'default')
+
+    def test_lag_checked_once_per_interval(self, lag):
+        for _ in range(3):
+            self.in_request()
+            self.router.db_for_read(self.User)
+
+        lag.assert_called_once()
+
+
+@override_settings(REPLICA_ROUTING=ROUTING)
+class ReplicaPinningMiddlewareTests(SimpleTestCase):
+    """Test the per-request state and pin cookie."""
+
+    def run_request(self, view, **cookies):
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies)
+        return ReplicaPinningMiddleware(view)(request)
+
+    def test_write_sets_pin_cookie(self):
+        def view(request):
+            ReplicaRouter().db_for_write(get_user_model())
+            return HttpResponse()
+
+        response = self.run_request(view)
+
+        cookie = response.cookies['replica_pin']
+        self.assertEqual(cookie['max-age'], 10)
+        self.assertTrue(cookie['httponly'])
+        self.assertIsNone(routers._state.get())
+
+    def test_read_only_request_sets_no_cookie(self):
+        response = self.run_request(lambda request: HttpResponse())
+
+        self.assertNotIn('replica_pin', response.cookies)
+
+    def test_async_chain_stays_async(self):
+        async def view(request):
+            ReplicaRouter().db_for_write(get_user_model())
+            return HttpResponse()
+
+        middleware = ReplicaPinningMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+
+        request = RequestFactory().get('/')
+        response = asyncio.run(middleware(request))
+
+        self.assertIn('replica_pin', response.cookies)
+
+    def test_cookie_pins_request(self):
+        states = []
+
+        def view(request):
+            states.append(routers._state.get())
+            return HttpResponse()
+
+        self.run_request(view, replica_pin='1')
+
+        self.assertTrue(states[0].pinned)
+
+
+@skipUnless(HAS_REPLICA, 'needs --settings=app.replica_settings')
+@override_settings(USER_PAYLOAD_CACHE={'ENABLED': False})
+class ReplicaApiTests(TransactionTestCase):
+    """
+    Test read-your-writes through the API with two databases. Reads in
+    a transaction stay on the primary, so TestCase cannot be used. The
+    /me payload cache is off: it fills from the primary.
+    """
+
+    # The test runner checks every alias named here, skipped or not.
+    databases = {'default', 'replica'} if HAS_REPLICA else {'default'}
+
+    def setUp(self):
+        routers._health.clear()
+        get_token_cache().clear()
+        # The replica holds a stale copy of the user.
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123', name='Fresh'
+        )
+        token = Token.objects.create(user=self.user)
+        self.user.name = 'Stale'
+        self.user.save(using='replica')
+        token.save(using='replica')
+        self.user.name = 'Fresh'
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_reads_from_replica(self):
+        res = self.client.get(reverse('user-detail'))
+
+        self.assertEqual(res.json()['name'], 'Stale')
+        self.assertNotIn('replica_pin', res.cookies)
+
+    def test_reads_own_writes_while_pinned(self):
+        res = self.client.patch(reverse('user-detail'), {'name': 'New'})
+        self.assertEqual(res.json()['name'], 'New')
+        self.assertIn('replica_pin', res.cookies)
+
+        res = self.client.get(reverse('user-detail'))
+        self.assertEqual(res.json()['name'], 'New')
+
+        # Once the pin expires, the replica (not yet caught up here) is
+        # read again.
+        self.client.cookies.clear()
+        res = self.client.get(reverse('user-detail'))
+        self.assertEqual(res.json()['name'], 'Stale')
+
+    @patch('core.db.routers.replica_lag', return_value=60.0)
+    def test_lagging_replica_falls_back_to_primary(self, lag):
+        res = self.client.get(reverse('user-detail'))
+
+        self.assertEqual(res.json()['name'], 'Fresh')
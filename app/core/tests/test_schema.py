@@ -0,0 +1,135 @@
+"""
+Tests for the cached OpenAPI schema view.
+"""
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import get_resolver, reverse
+
+from core import schema
+
+SCHEMA_URL = reverse('api-schema')
+
+
+class CachedSchemaTests(TestCase):
+    """Test serving the schema from the cache."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'schema.json')
+        cache_settings = override_settings(OPENAPI_SCHEMA_CACHE={
+            'ENABLED': True, 'FILE': self.path, 'MAX_AGE': 300,
+        })
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
+
+    def test_yaml_by_default(self):
+        res = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            res['Content-Type'], 'application/vnd.oai.openapi; charset=utf-8'
+        )
+        self.assertIn(b'/api/users/login/', res.content)
+        self.assertEqual(res['Cache-Control'], 'public, max-age=300')
+        self.assertTrue(res['ETag'].startswith('"'))
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    def test_json_variant(self):
+        res = self.client.get(SCHEMA_URL, {'format': 'json'})
+
+        self.assertEqual(
+            res['Content-Type'], 'application/vnd.oai.openapi+json'
+        )
+        self.assertIn('/api/users/login/', json.loads(res.content)['paths'])
+        self.assertNotEqual(res['ETag'], self.client.get(SCHEMA_URL)['ETag'])
+
+    def test_gzip_variant(self):
+        plain = self.client.get(SCHEMA_URL)
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+        self.assertNotEqual(res['ETag'], plain['ETag'])
+
+    def test_if_none_match(self):
+        etag = self.client.get(SCHEMA_URL)['ETag']
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b'')
+        self.assertEqual(res['ETag'], etag)
+
+    def test_generated_once_and_written_to_file(self):
+        with patch('core.schema.generate_schema',
+                   wraps=schema.generate_schema) as generate:
+            self.client.get(SCHEMA_URL)
+            self.client.get(SCHEMA_URL, {'format': 'json'})
+        self.assertEqual(generate.call_count, 1)
+
+        with open(self.path) as f:
+            data = json.load(f)
+        self.assertEqual(data['fingerprint'], schema.code_fingerprint())
+
+    def test_loads_matching_file_without_generating(self):
+        call_command('generate_schema', stdout=StringIO())
+        schema._cache = None
+
+        with patch('core.schema.generate_schema') as generate:
+            res = self.client.get(SCHEMA_URL)
+        self.assertEqual(res.status_code, 200)
+        generate.assert_not_called()
+
+    def test_regenerates_when_code_changes(self):
+        call_command('generate_schema', stdout=StringIO())
+        schema._cache = None
+
+        with patch('core.schema.code_fingerprint', return_value='changed'), \
+                patch('core.schema.generate_schema',
+                      wraps=schema.generate_schema) as generate:
+            self.client.get(SCHEMA_URL)
+        generate.assert_called_once()
+
+    def test_fingerprint_survives_copying_the_tree(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            copy = shutil.copytree(
+                settings.BASE_DIR, os.path.join(tmp, 'app'),
+                ignore=shutil.ignore_patterns('*.sqlite3', '__pycache__'),
+            )
+            with override_settings(BASE_DIR=Path(copy)):
+                copied = schema.code_fingerprint()
+
+        self.assertEqual(copied, schema.code_fingerprint())
+
+    def test_fingerprint_depends_on_routed_views(self):
+        fingerprint = schema.code_fingerprint()
+
+        with patch('core.schema.get_resolver',
+                   return_value=get_resolver('users.tests.test_async_views')):
+            self.assertNotEqual(schema.code_fingerprint(), fingerprint)
+
+    def test_command_skips_up_to_date_file(self):
+        out = StringIO()
+        call_command('generate_schema', stdout=out)
+        call_command('generate_schema', stdout=out)
+
+        self.assertIn('Wrote schema', out.getvalue())
+        self.assertIn('is up to date', out.getvalue())
+
+    def test_disabled_generates_per_request(self):
+        with override_settings(OPENAPI_SCHEMA_CACHE={'ENABLED': False}):
+            res = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('ETag', res)
+        self.assertFalse(os.path.exists(self.path))
@@ -0,0 +1,72 @@
+"""
+Tests for the startup profiler.
+"""
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from core.startup import MARKER, median_of, parse_importtime
+
+IMPORTTIME = f"""\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 | _io
+{MARKER}settings
+import time:       250 |        250 |     dotenv.main
+import time:       750 |       1000 |   dotenv
+{MARKER}setup
+import time:      2000 |       2000 |       django.db.models
+import time:      1000 |       3000 |   django
+Traceback (most recent call last):
+"""
+
+
+class StartupProfileTests(SimpleTestCase):
+    """Test aggregating and reporting startup timings."""
+
+    def test_parse_importtime(self):
+        packages, phases = parse_importtime(IMPORTTIME)
+
+        self.assertEqual(packages, {
+            '_io': {'seconds': 0.0001, 'modules': 1},
+            'dotenv': {'seconds': 0.001, 'modules': 2},
+            'django': {'seconds': 0.003, 'modules': 2},
+        })
+        self.assertEqual(phases, {
+            'interpreter': 0.0001, 'settings': 0.001, 'setup': 0.003,
+        })
+
+    def test_median_of(self):
+        runs = [
+            {'phases': {'setup': 3, 'urlconf': 1}},
+            {'phases': {'setup': 1}},
+            {'phases': {'setup': 2, 'urlconf': 3}},
+        ]
+
+        self.assertEqual(
+            median_of(runs, 'phases'), {'setup': 2, 'urlconf': 2}
+        )
+
+    def test_command_writes_report(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'profile.json')
+            out = StringIO()
+
+            call_command(
+                'startup_profile', runs=1, output=path, stdout=out
+            )
+
+            with open(path) as f:
+                report = json.load(f)
+        self.assertEqual(report['status'], 405)
+        self.assertEqual(list(report['phases_ms']), [
+            'settings', 'setup', 'urlconf', 'first_request',
+            'second_request',
+        ])
+        self.assertIn('core', report['ready_ms'])
+        self.assertIn('django', report['imports'])
+        self.assertGreater(report['imports']['django']['modules'], 0)
+        self.assertIn('ready core', out.getvalue())
@@ -0,0 +1,218 @@
+"""
+Tests for token-bucket throttling.
+"""
+import threading
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import throttling
+
+LOGIN_URL = reverse('login')
+FORGOT_PASSWORD_URL = reverse('forgot-password')
+VERIFY_EMAIL_URL = reverse('verify-email')
+
+
+class TokenBucketTests(TestCase):
+    """Test the bucket arithmetic and stores."""
+
+    def test_parse_rate(self):
+        self.assertEqual(throttling.parse_rate('10/min'), (10, 10 / 60))
+        self.assertEqual(throttling.parse_rate('5/hour'), (5, 5 / 3600))
+
+    def test_bucket_allows_burst_then_refills(self):
+        state = None
+        for _ in range(3):
+            state, wait = throttling.take_token(state, 3, 1.0, now=100.0)
+            self.assertEqual(wait, 0)
+
+        _, wait = throttling.take_token(state, 3, 1.0, now=100.0)
+        self.assertEqual(wait, 1.0)
+        _, wait = throttling.take_token(state, 3, 1.0, now=101.0)
+        self.assertEqual(wait, 0)
+
+    def test_local_store_evicts_oldest(self):
+        store = throttling.LocalBucketStore(max_size=2)
+        for key in ('a', 'b', 'c'):
+            store.consume(key, 1, 1.0)
+
+        self.assertEqual(list(store._buckets), ['b', 'c'])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }})
+    def test_cache_store_shared_between_instances(self):
+        first = throttling.CacheBucketStore()
+        second = throttling.CacheBucketStore()
+        first.clear()
+
+        self.assertEqual(first.consume('login:ip:1.2.3.4', 1, 1 / 60), 0)
+        self.assertGreater(second.consume('login:ip:1.2.3.4', 1, 1 / 60), 0)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }})
+    def test_cache_store_clear_keeps_other_keys(self):
+        store = throttling.CacheBucketStore()
+        store.consume('login:ip:1.2.3.4', 1, 1 / 60)
+        store.cache.set('other', 'kept')
+
+        store.clear()
+
+        self.assertEqual(store.cache.get('other'), 'kept')
+        self.assertEqual(store.consume('login:ip:1.2.3.4', 1, 1 / 60), 0)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }})
+    def test_cache_store_never_overspends(self):
+        store = throttling.CacheBucketStore()
+        store.clear()
+        waits = []
+        start = threading.Barrier(20)
+
+        def slow_take_tokens(*args):
+            # Widen the window between reading and writing the bucket.
+            time.sleep(0.01)
+            return take_tokens(*args)
+
+        def consume():
+            start.wait()
+            waits.append(store.consume('login:ip:1.2.3.4', 5, 1 / 60))
+
+        take_tokens = throttling.take_tokens
+        with patch('core.throttling.take_tokens', slow_take_tokens):
+            threads = [threading.Thread(target=consume) for _ in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(waits.count(0), 5)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }})
+    def test_cache_store_throttles_when_locked(self):
+        store = throttling.CacheBucketStore(lock_timeout=0.05)
+        store.clear()
+        generation = store.cache.get(store._generation_key)
+        store.cache.add(f'throttle:{generation}:login:ip:1.2.3.4:lock', 1)
+
+        self.assertGreater(store.consume('login:ip:1.2.3.4', 5, 1 / 60), 0)
+        self.assertEqual(store.consume('login:ip:5.6.7.8', 5, 1 / 60), 0)
+
+    def test_empty_bucket_spends_no_tokens(self):
+        store = throttling.LocalBucketStore()
+        store.consume('b', 1, 1.0)
+
+        wait = store.consume_all([('a', 1, 1.0), ('b', 1, 1.0)])
+
+        self.assertGreater(wait, 0)
+        self.assertEqual(store.consume('a', 1, 1.0), 0)
+
+
+@override_settings(THROTTLING={'RATES': {
+    'login': {'ip': '2/min', 'email': '1/min'},
+    'forgot-password': {'ip': '1/min'},
+}})
+class ThrottledEndpointTests(TestCase):
+    """Test throttles on the unauthenticated endpoints."""
+
+    def setUp(self):
+        self.client = APIClient()
+        throttling.get_bucket_store().clear()
+        get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123'
+        )
+
+    def test_throttled_before_hashing_or_queries(self):
+        payload = {'email': 'user@example.com', 'password': 'wrong'}
+        self.client.post(LOGIN_URL, payload)
+
+        with patch('users.serializers.verify_password') as mock_verify:
+            with self.assertNumQueries(0):
+                res = self.client.post(LOGIN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '60')
+        mock_verify.assert_not_called()
+
+    def test_email_limit_spans_addresses(self):
+        payload = {'email': 'user@example.com', 'password': 'wrong'}
+        self.client.post(LOGIN_URL, payload, REMOTE_ADDR='10.0.0.1')
+        res = self.client.post(
+            LOGIN_URL,
+            {'email': 'USER@example.com', 'password': 'wrong'},
+            REMOTE_ADDR='10.0.0.2',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_ip_limit_spans_emails(self):
+        for i in range(2):
+            self.client.post(LOGIN_URL, {
+                'email': f'other{i}@example.com', 'password': 'wrong',
+            })
+        res = self.client.post(LOGIN_URL, {
+            'email': 'user@example.com', 'password': 'wrong',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_forwarded_for_ignored_without_proxies(self):
+        for i in range(2):
+            self.client.post(LOGIN_URL, {
+                'email': f'other{i}@example.com', 'password': 'wrong',
+            }, HTTP_X_FORWARDED_FOR=f'10.0.0.{i}')
+        res = self.client.post(LOGIN_URL, {
+            'email': 'user@example.com', 'password': 'wrong',
+        }, HTTP_X_FORWARDED_FOR='10.0.0.9')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_rejected_request_keeps_ip_token(self):
+        payload = {'email': 'user@example.com', 'password': 'wrong'}
+        self.client.post(LOGIN_URL, payload)
+        res = self.client.post(LOGIN_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        res = self.client.post(LOGIN_URL, {
+            'email': 'other@example.com', 'password': 'wrong',
+        })
+
+        self.assertNotEqual(
+            res.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+
+    def test_scopes_have_separate_buckets(self):
+        res = self.client.post(
+            FORGOT_PASSWORD_URL, {'email': 'user@example.com'}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.post(LOGIN_URL, {
+            'email': 'user@example.com', 'password': 'testpass123',
+        })
+        self.assertNotEqual(
+            res.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+
+    @override_settings(THROTTLING={'RATES': {
+        'verify-email': {'email': '2/hour'},
+    }})
+    def test_pin_guesses_throttled_per_email(self):
+        for pin in ['000000', '000001']:
+            self.client.post(VERIFY_EMAIL_URL, {
+                'email': 'user@example.com', 'verification_pin': pin,
+            })
+        res = self.client.post(VERIFY_EMAIL_URL, {
+            'email': 'user@example.com', 'verification_pin': '000002',
+        }, REMOTE_ADDR='10.0.0.9')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
@@ -0,0 +1,248 @@
+"""
+Token-bucket throttling for unauthenticated endpoints.
+
+Each throttle scope (a URL name such as 'login') has rates in
+`THROTTLING['RATES']`, keyed by what is counted: 'ip' for the client
+address and 'email' for the canonical form of the submitted email. A
+rate of '10/min' is a bucket holding 10 tokens that refills at 10 per
+minute, so bursts up to the capacity are allowed.
+
+Buckets live in the store named by `THROTTLING['STORE']`:
+`LocalBucketStore` keeps them in process memory (single node),
+`CacheBucketStore` in a Django cache shared by every node. The cache
+store holds a lock key per bucket while it reads and writes it, so
+concurrent requests on different nodes cannot both take the last
+token; a request that cannot get the locks within `LOCK_TIMEOUT`
+seconds is throttled.
+
+Throttles run before the view body, so a rejected request costs
+neither a password hash nor a query.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+from core.models import canonicalize_email
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """Parse '10/min' into (capacity, tokens per second)."""
+    num, period = rate.split('/')
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+def take_token(state, capacity, rate, now):
+    """
+    Refill the bucket `state` (tokens, timestamp) up to `now` and take
+    one token. Returns the new state and 0, or the unchanged state and
+    the seconds until a token is available.
+    """
+    if state is None:
+        tokens = capacity
+    else:
+        tokens, stamp = state
+        tokens = min(capacity, tokens + (now - stamp) * rate)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return state, (1 - tokens) / rate
+
+
+def take_tokens(states, buckets, now):
+    """
+    `take_token` for several `(key, capacity, rate)` buckets at once: the
+    new states and 0, or the states unchanged and the longest wait if
+    any bucket is empty.
+    """
+    results = [
+        take_token(state, capacity, rate, now)
+        for state, (_, capacity, rate) in zip(states, buckets)
+    ]
+    wait = max((wait for _, wait in results), default=0)
+    if wait:
+        return states, wait
+    return [state for state, _ in results], 0
+
+
+class LocalBucketStore:
+    """Buckets in a bounded per-process LRU."""
+
+    local = True
+
+    def __init__(self, max_size=100000, **options):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def consume(self, key, capacity, rate):
+        """Take a token from `key`; return the seconds to wait, or 0."""
+        return self.consume_all([(key, capacity, rate)])
+
+    def consume_all(self, buckets):
+        """
+        Take a token from every `(key, capacity, rate)` bucket, or from
+        none of them if any is empty. Returns the seconds to wait, or 0.
+        """
+        with self._lock:
+            now = time.monotonic()
+            states, wait = take_tokens(
+                [self._buckets.get(key) for key, _, _ in buckets],
+                buckets, now,
+            )
+            if not wait:
+                for (key, _, _), state in zip(buckets, states):
+                    self._buckets[key] = state
+                    self._buckets.move_to_end(key)
+                while len(self._buckets) > self.max_size:
+                    self._buckets.popitem(last=False)
+            return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBucketStore:
+    """
+    Buckets in a Django cache shared between nodes. Keys include a
+    generation number, so `clear` can drop every bucket without touching
+    the rest of the cache.
+    """
+
+    local = False
+    key_prefix = 'throttle'
+
+    def __init__(self, cache_alias='default', lock_timeout=1, **options):
+        self.cache_alias = cache_alias
+        self.lock_timeout = lock_timeout
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    @property
+    def _generation_key(self):
+        return f'{self.key_prefix}:generation'
+
+    def consume(self, key, capacity, rate):
+        return self.consume_all([(key, capacity, rate)])
+
+    def consume_all(self, buckets):
+        generation = self.cache.get_or_set(self._generation_key, 0, None)
+        keys = [
+            f'{self.key_prefix}:{generation}:{key}' for key, _, _ in buckets
+        ]
+        locks = []
+        try:
+            # Always locked in the same order, so requests sharing
+            # buckets cannot wait on each other.
+            for key in sorted(set(keys)):
+                if not self._acquire(f'{key}:lock'):
+                    return self.lock_timeout
+                locks.append(f'{key}:lock')
+            found = self.cache.get_many(keys)
+            states, wait = take_tokens(
+                [found.get(key) for key in keys], buckets, time.time()
+            )
+            if not wait:
+                # Expire once the buckets would be full again anyway.
+                self.cache.set_many(
+                    dict(zip(keys, states)),
+                    timeout=max(
+                        math.ceil(capacity / rate)
+                        for _, capacity, rate in buckets
+                    ),
+                )
+            return wait
+        finally:
+            self.cache.delete_many(locks)
+
+    def _acquire(self, lock_key):
+        # The lock expires on its own if its holder dies.
+        deadline = time.monotonic() + self.lock_timeout
+        delay = 0.001
+        while not self.cache.add(lock_key, 1, self.lock_timeout):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+        return True
+
+    def clear(self):
+        try:
+            self.cache.incr(self._generation_key)
+        except ValueError:
+            self.cache.set(self._generation_key, 1, None)
+
+
+_store = None
+
+
+def get_bucket_store():
+    """Return the process-wide bucket store configured in settings."""
+    global _store
+    if _store is None:
+        options = getattr(settings, 'THROTTLING', {})
+        _store = import_string(
+            options.get('STORE', 'core.throttling.LocalBucketStore')
+        )(
+            max_size=options.get('MAX_SIZE', 100000),
+            cache_alias=options.get('CACHE_ALIAS', 'default'),
+            lock_timeout=options.get('LOCK_TIMEOUT', 1),
+        )
+    return _store
+
+
+def check_throttles(scope, ident, email):
+    """
+    Take a token from every bucket configured for `scope`, or from none
+    if any is empty, so a rejected request does not use up the others.
+    Returns the seconds to wait before retrying, or 0 if the request may
+    proceed.
+    """
+    rates = getattr(settings, 'THROTTLING', {}).get('RATES', {}).get(scope)
+    if not rates:
+        return 0
+    keys = {'ip': ident}
+    if email and isinstance(email, str):
+        keys['email'] = canonicalize_email(email)
+
+    buckets = [
+        (f'{scope}:{kind}:{keys[kind]}', *parse_rate(rate))
+        for kind, rate in rates.items()
+        if keys.get(kind)
+    ]
+    if not buckets:
+        return 0
+    return get_bucket_store().consume_all(buckets)
+
+
+def check_request(request, scope):
+    """
+    `check_throttles` for a Django or DRF request with parsed data. The
+    client address comes from X-Forwarded-For only behind the
+    `REST_FRAMEWORK['NUM_PROXIES']` trusted proxies.
+    """
+    data = request.data
+    email = data.get('email') if hasattr(data, 'get') else None
+    return check_throttles(scope, BaseThrottle().get_ident(request), email)
+
+
+class BucketThrottle(BaseThrottle):
+    """Throttle views by their `throttle_scope`, per IP and per email."""
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        self.wait_seconds = check_request(request, scope) if scope else 0
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
@@ -1,7 +1,12 @@
-from django.core.mail import send_mail
+import logging
+
 from django.conf import settings
 from django.core.exceptions import ValidationError
 
+from core.outbox import enqueue_email
+
+logger = logging.getLogger(__name__)
+
 
 def send_verification_email(user, verification_pin):
     subject = 'Verify your email with Darsana'
@@ -10,19 +15,15 @@ def send_verification_email(user, verification_pin):
     recipient_list = [user.email]
 
     try:
-        if settings.DEBUG:
-            print(
-                f"DEBUG: Email not sent. Verification pin for {user.email}: {verification_pin}" # noqa
-                )
-        else:
-            print(
-                f"Sending email to {user.email} with subject: {subject} from {from_email}" # noqa
-                )
-            send_mail(
-                subject,
-                message,
-                from_email,
-                recipient_list
-                )
+        logger.info(
+            'Queueing verification email',
+            extra={'user_id': user.pk, 'from_email': from_email},
+        )
+        enqueue_email(
+            subject,
+            message,
+            from_email,
+            recipient_list
+            )
     except Exception as e:
         raise ValidationError(f"Failed to send verification email: {str(e)}")
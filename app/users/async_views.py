@@ -0,0 +1,375 @@
+"""
+Async implementations of the auth endpoints for ASGI deployments.
+
+Enabled with `USERS_ASYNC_VIEWS`; users/urls.py then routes the same URL
+names here instead of to the DRF views in users/views.py, whose request
+formats, messages and status codes these mirror.
+
+Django 3.2 has no async ORM, so database work still runs in
+`sync_to_async`, grouped into as few hops per request as possible.
+Password hashing is awaited on the hashing process pool and mail is
+queued in the outbox inside the same hop as the other writes, so no
+thread is held while a password is hashed or a message is delivered.
+"""
+import functools
+import io
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model, login
+from django.db import IntegrityError, transaction
+from django.http import HttpResponseNotModified, JsonResponse, QueryDict
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions, status
+from rest_framework.authentication import get_authorization_header
+from rest_framework.authtoken.models import Token
+from rest_framework.settings import api_settings
+
+from core.authentication import (
+    CachedTokenAuthentication,
+    current_user,
+    get_token_cache,
+)
+from core.hashing import amake_password, aset_password, averify_password
+from core.payload_cache import add_validators, not_modified, user_payload
+from core.pins import (
+    PURPOSE_RESET,
+    PURPOSE_VERIFY,
+    ExpiredPin,
+    InvalidPin,
+    get_pin_backend,
+)
+from core.throttling import check_request, get_bucket_store
+from core.utils import send_verification_email
+
+from . import views
+from .serializers import (
+    CustomRegisterSerializer,
+    ForgotPasswordSerializer,
+    LoginSerializer,
+    ResendVerificationSerializer,
+    ResetPasswordSerializer,
+    UserSerializer,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def exception_response(exc):
+    """Render an APIException the way DRF's exception handler does."""
+    if isinstance(exc.detail, (list, dict)):
+        data = exc.detail
+    else:
+        data = {'detail': exc.detail}
+    response = JsonResponse(data, status=exc.status_code, safe=False)
+    auth_header = getattr(exc, 'auth_header', None)
+    if auth_header:
+        response['WWW-Authenticate'] = auth_header
+    wait = getattr(exc, 'wait', None)
+    if wait:
+        response['Retry-After'] = '%d' % wait
+    return response
+
+
+def parse_body(request):
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError as exc:
+            raise exceptions.ParseError(f'JSON parse error - {exc}')
+    if request.method == 'POST':
+        return request.POST
+    # Django only parses form bodies of POST requests.
+    if request.content_type == 'multipart/form-data':
+        data, files = request.parse_file_upload(
+            request.META, io.BytesIO(request.body)
+        )
+        return data
+    return QueryDict(request.body, encoding=request.encoding)
+
+
+def async_api_view(*methods, documented_as):
+    """
+    Turn an async function into a CSRF-exempt view that accepts
+    `methods`, exposes the parsed body as `request.data` and renders
+    APIExceptions. drf-spectacular only introspects DRF views, so the
+    view carries the DRF view it mirrors, `documented_as`, where DRF's
+    `as_view()` puts it, and the schema is the same in either mode.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def view(request, *args, **kwargs):
+            try:
+                if request.method not in methods:
+                    raise exceptions.MethodNotAllowed(request.method)
+                request.data = parse_body(request)
+                return await func(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                response = exception_response(exc)
+                if isinstance(exc, exceptions.MethodNotAllowed):
+                    response['Allow'] = ', '.join(methods)
+                return response
+        view.csrf_exempt = True
+        view.cls = documented_as
+        view.initkwargs = {}
+        return view
+    return decorator
+
+
+async def authenticate(request):
+    """
+    Return the user for the request's token. Tokens in the local token
+    cache are resolved without leaving the event loop.
+    """
+    authenticator = CachedTokenAuthentication()
+    auth = get_authorization_header(request).split()
+    token = None
+    if len(auth) == 2 and auth[0].lower() == b'token':
+        try:
+            token = get_token_cache().get_local(auth[1].decode())
+        except UnicodeError:
+            pass
+    if token is not None:
+        if not token.user.is_active:
+            get_token_cache().invalidate_user(token.user_id)
+            exc = exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+            exc.auth_header = authenticator.authenticate_header(request)
+            raise exc
+        return token.user
+
+    try:
+        result = await sync_to_async(authenticator.authenticate)(request)
+        if result is None:
+            raise exceptions.NotAuthenticated()
+    except (exceptions.AuthenticationFailed,
+            exceptions.NotAuthenticated) as exc:
+        exc.auth_header = authenticator.authenticate_header(request)
+        raise
+    return result[0]
+
+
+async def throttle(request, scope):
+    """Raise Throttled if `request` is over the limits for `scope`."""
+    if get_bucket_store().local:
+        wait = check_request(request, scope)
+    else:
+        wait = await sync_to_async(check_request)(request, scope)
+    if wait:
+        raise exceptions.Throttled(wait)
+
+
+def _create_registered_user(serializer, request, user):
+    with transaction.atomic():
+        user.save()
+        serializer.custom_signup(request, user)
+        pin = get_pin_backend().issue(user, PURPOSE_VERIFY, created=True)
+        send_verification_email(user, pin)
+
+
+@async_api_view('POST', documented_as=views.RegisterView)
+async def register(request):
+    await throttle(request, 'register')
+    serializer = CustomRegisterSerializer(
+        data=request.data, context={'request': request}
+    )
+    await sync_to_async(serializer.is_valid)(raise_exception=True)
+    user = serializer.new_user(request)
+    await aset_password(user, serializer.validated_data['password'])
+    try:
+        await sync_to_async(_create_registered_user)(
+            serializer, request, user
+        )
+    except IntegrityError:
+        error = await sync_to_async(serializer.duplicate_email_error)()
+        if error is not None:
+            raise error
+        logger.exception('Registration failed')
+        return JsonResponse(
+            {"detail": "An error occurred during registration. Please try again."}, # noqa
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    except Exception:
+        logger.exception('Registration failed')
+        return JsonResponse(
+            {"detail": "An error occurred during registration. Please try again."}, # noqa
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    return JsonResponse(
+        {"detail": "Verification e-mail sent."},
+        status=status.HTTP_201_CREATED
+    )
+
+
+def _verify_email(email, verification_pin):
+    try:
+        user = get_user_model().objects.with_email(email).get()
+        if user.is_active:
+            return JsonResponse(
+                {'detail': 'Email is already verified.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        backend = get_pin_backend()
+        record = backend.check(user, verification_pin, PURPOSE_VERIFY)
+        backend.consume(user, record)
+        user.is_active = True
+        user.save()
+    except get_user_model().DoesNotExist:
+        raise exceptions.ValidationError(
+            "User with this email does not exist."
+        )
+    except InvalidPin:
+        raise exceptions.ValidationError("Invalid verification pin.")
+    except ExpiredPin:
+        raise exceptions.ValidationError("Verification pin has expired.")
+    return JsonResponse(
+        {'detail': 'Email verified successfully.'},
+        status=status.HTTP_200_OK
+    )
+
+
+@async_api_view('POST', documented_as=views.VerifyEmailView)
+async def verify_email(request):
+    await throttle(request, 'verify-email')
+    verification_pin = request.data.get('verification_pin')
+    email = request.data.get('email')
+
+    if not email or not verification_pin:
+        raise exceptions.ValidationError(
+            "Both email and verification pin are required."
+        )
+    return await sync_to_async(_verify_email)(email, verification_pin)
+
+
+def _complete_login(request, user):
+    if user.is_active:
+        if settings.API_LOGIN_MODE == 'session':
+            login(
+                request,
+                user,
+                backend='django.contrib.auth.backends.ModelBackend'
+            )
+        token, created = Token.objects.get_or_create(user=user)
+        return JsonResponse({
+            "detail": "Login successful.",
+            "token": token.key
+        }, status=status.HTTP_200_OK)
+
+    pin = get_pin_backend().issue(user, PURPOSE_VERIFY)
+    send_verification_email(user, pin)
+    return JsonResponse(
+        {"detail": "Email not verified. A new verification email has been sent."}, # noqa
+        status=status.HTTP_403_FORBIDDEN
+    )
+
+
+@async_api_view('POST', documented_as=views.LoginView)
+async def login_view(request):
+    await throttle(request, 'login')
+    # Field validation only; LoginSerializer.validate would hash inline.
+    attrs = LoginSerializer().to_internal_value(request.data)
+    user = await sync_to_async(
+        get_user_model().objects.with_email(attrs['email']).first
+    )()
+    if user is None or not await averify_password(user, attrs['password']):
+        raise exceptions.ValidationError({
+            api_settings.NON_FIELD_ERRORS_KEY: [
+                "Unable to log in with provided credentials."
+            ]
+        })
+    return await sync_to_async(_complete_login)(request, user)
+
+
+def _send_pin(serializer, purpose):
+    serializer.is_valid(raise_exception=True)
+    email = serializer.validated_data['email']
+    user = get_user_model().objects.with_email(email).get()
+    pin = get_pin_backend().issue(user, purpose)
+    send_verification_email(user, pin)
+
+
+@async_api_view('POST', documented_as=views.ForgotPasswordView)
+async def forgot_password(request):
+    await throttle(request, 'forgot-password')
+    serializer = ForgotPasswordSerializer(data=request.data)
+    await sync_to_async(_send_pin)(serializer, PURPOSE_RESET)
+    return JsonResponse(
+        {"detail": "Password reset email sent."},
+        status=status.HTTP_200_OK
+    )
+
+
+def _reset_password(user, record):
+    get_pin_backend().consume(user, record)
+    user.save()
+
+
+@async_api_view('POST', documented_as=views.ResetPasswordView)
+async def reset_password(request):
+    await throttle(request, 'reset-password')
+    serializer = ResetPasswordSerializer(data=request.data)
+    await sync_to_async(serializer.is_valid)(raise_exception=True)
+
+    user = serializer.validated_data['user']
+    await aset_password(user, serializer.validated_data['new_password'])
+    await sync_to_async(_reset_password)(
+        user, serializer.validated_data['pin_record']
+    )
+    return JsonResponse(
+        {"detail": "Password has been reset successfully."},
+        status=status.HTTP_200_OK
+    )
+
+
+@async_api_view('POST', documented_as=views.ResendVerificationView)
+async def resend_verification(request):
+    await throttle(request, 'resend-verification')
+    serializer = ResendVerificationSerializer(data=request.data)
+    await sync_to_async(_send_pin)(serializer, PURPOSE_VERIFY)
+    return JsonResponse(
+        {"detail": "Verification email has been resent."},
+        status=status.HTTP_200_OK
+    )
+
+
+@async_api_view(
+    'GET', 'PUT', 'PATCH', documented_as=views.UserDetailView
+)
+async def user_detail(request):
+    user = await authenticate(request)
+    if request.method == 'GET':
+        etag, data = await sync_to_async(user_payload)(
+            user, lambda user: UserSerializer(user).data
+        )
+        if not_modified(request, etag):
+            return add_validators(HttpResponseNotModified(), etag)
+        return add_validators(JsonResponse(data), etag)
+
+    # `user` may be a cached snapshot; never save it back.
+    user = await sync_to_async(current_user)(user)
+    serializer = UserSerializer(
+        user, data=request.data, partial=request.method == 'PATCH'
+    )
+    await sync_to_async(serializer.is_valid)(raise_exception=True)
+    extra = {}
+    password = serializer.validated_data.get('password')
+    if password:
+        extra['password_hash'] = await amake_password(password)
+    await sync_to_async(serializer.save)(**extra)
+    return JsonResponse(serializer.data)
+
+
+# URL name -> view, see users/urls.py.
+ENDPOINTS = {
+    'register': register,
+    'verify-email': verify_email,
+    'login': login_view,
+    'forgot-password': forgot_password,
+    'reset-password': reset_password,
+    'resend-verification': resend_verification,
+    'user-detail': user_detail,
+}
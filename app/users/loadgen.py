@@ -0,0 +1,301 @@
+"""
+Load generator for the users API.
+
+Drives a weighted mix of register / verify / login / me / forgot / reset
+traffic against a running server from many concurrent asyncio clients,
+each holding one keep-alive HTTP/1.1 connection. PINs are read straight
+from the database through the configured pin backend, so the whole
+verification flow runs without a mail relay. Used by the `loadtest`
+management command and the ASGI/WSGI benchmark.
+"""
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
+
+from core.hashing import make_password
+from core.models import canonicalize_email
+from core.pins import PURPOSE_RESET, PURPOSE_VERIFY, get_pin_backend
+
+PASSWORD = 'loadtest-pass-123'
+DEFAULT_MIX = {
+    'register': 1,
+    'verify': 1,
+    'login': 4,
+    'me': 20,
+    'forgot': 1,
+    'reset': 1,
+}
+PATHS = {
+    'register': '/api/users/register/',
+    'verify': '/api/users/verify-email/',
+    'login': '/api/users/login/',
+    'me': '/api/users/me/',
+    'forgot': '/api/users/forgot-password/',
+    'reset': '/api/users/reset-password/',
+}
+
+
+def parse_mix(value):
+    """Parse 'login=4,me=20' into a weight dict."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in PATHS:
+            raise ValueError(f'Unknown endpoint in mix: {name}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client over asyncio streams."""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.reader = self.writer = None
+
+    async def request(self, method, path, data=None, token=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port
+            )
+        body = urlencode(data).encode() if data else b''
+        headers = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            f'Content-Length: {len(body)}',
+        ]
+        if body:
+            headers.append('Content-Type: application/x-www-form-urlencoded')
+        if token:
+            headers.append(f'Authorization: Token {token}')
+        self.writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode() + body)
+        try:
+            return await self._read_response()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            await self.close()
+            raise
+
+    async def _read_response(self):
+        status_line = await self.reader.readuntil(b'\r\n')
+        status = int(status_line.split()[1])
+        length = None
+        keep_alive = True
+        while True:
+            line = await self.reader.readuntil(b'\r\n')
+            if line == b'\r\n':
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            name = name.strip().lower()
+            if name == 'content-length':
+                length = int(value)
+            elif name == 'connection' and 'close' in value.lower():
+                keep_alive = False
+        if length is None:
+            body = await self.reader.read()
+            keep_alive = False
+        else:
+            body = await self.reader.readexactly(length)
+        if not keep_alive:
+            await self.close()
+        return status, body
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+def seed_users(count, run_id):
+    """Create `count` active users with tokens; returns {email: token}."""
+    User = get_user_model()
+    encoded = make_password(PASSWORD)
+    emails = [f'loadtest-{run_id}-{i}@example.com' for i in range(count)]
+    users = User.objects.bulk_create([
+        User(
+            email=email,
+            email_canonical=canonicalize_email(email),
+            password=encoded,
+            is_active=True,
+        )
+        for email in emails
+    ])
+    if users and users[0].pk is None:
+        users = list(User.objects.filter(email__in=emails))
+    tokens = Token.objects.bulk_create([
+        Token(key=Token.generate_key(), user=user) for user in users
+    ])
+    return {token.user.email: token.key for token in tokens}
+
+
+def peek_pin(email, purpose):
+    user = get_user_model().objects.with_email(email).get()
+    return get_pin_backend().peek(user, purpose)
+
+
+class LoadRun:
+    """Shared state and statistics for one load test run."""
+
+    def __init__(self, base_url, mix, tokens, run_id):
+        self.base_url = base_url
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.tokens = dict(tokens)
+        self.active = list(tokens)
+        self.with_token = list(tokens)
+        self.pending_verify = []
+        self.pending_reset = []
+        self.run_id = run_id
+        self.counter = 0
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def new_email(self):
+        self.counter += 1
+        return f'loadtest-{self.run_id}-new-{self.counter}@example.com'
+
+    async def step(self, conn):
+        name = random.choices(self.names, self.weights)[0]
+        if name == 'verify' and not self.pending_verify:
+            name = 'register'
+        if name == 'reset' and not self.pending_reset:
+            name = 'forgot'
+        if name in ('login', 'forgot') and not self.active:
+            name = 'register'
+        if name == 'me' and not self.with_token:
+            name = 'register'
+
+        expected = 201 if name == 'register' else 200
+        method, data, token = 'POST', None, None
+        if name == 'register':
+            email = self.new_email()
+            data = {'email': email, 'password': PASSWORD}
+        elif name == 'verify':
+            email = self.pending_verify.pop()
+            pin = await sync_to_async(peek_pin)(email, PURPOSE_VERIFY)
+            data = {'email': email, 'verification_pin': pin}
+        elif name == 'reset':
+            email = self.pending_reset.pop()
+            pin = await sync_to_async(peek_pin)(email, PURPOSE_RESET)
+            data = {
+                'email': email,
+                'verification_pin': pin,
+                'new_password': PASSWORD,
+            }
+        elif name == 'me':
+            email = random.choice(self.with_token)
+            method, token = 'GET', self.tokens[email]
+        else:
+            email = random.choice(self.active)
+            data = {'email': email}
+            if name == 'login':
+                data['password'] = PASSWORD
+
+        start = time.perf_counter()
+        try:
+            status, body = await conn.request(
+                method, PATHS[name], data, token
+            )
+        except (OSError, asyncio.IncompleteReadError):
+            status, body = 0, b''
+        self.latencies[name].append(time.perf_counter() - start)
+        if status == 0:
+            # Server unreachable; do not spin on refused connections.
+            await asyncio.sleep(0.1)
+
+        if status != expected:
+            self.errors[name] += 1
+            return
+        if name == 'register':
+            self.pending_verify.append(email)
+        elif name == 'verify':
+            self.active.append(email)
+        elif name == 'forgot':
+            self.pending_reset.append(email)
+        elif name == 'login':
+            if email not in self.tokens:
+                self.with_token.append(email)
+            self.tokens[email] = json.loads(body)['token']
+
+    async def client(self, deadline, max_requests):
+        conn = HttpConnection(self.base_url)
+        try:
+            while time.monotonic() < deadline:
+                if max_requests and self.total >= max_requests:
+                    break
+                await self.step(conn)
+        finally:
+            await conn.close()
+
+    @property
+    def total(self):
+        return sum(len(values) for values in self.latencies.values())
+
+    async def run(self, concurrency, duration, max_requests=0):
+        deadline = time.monotonic() + duration
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            self.client(deadline, max_requests) for _ in range(concurrency)
+        ])
+        return time.perf_counter() - start
+
+    def report(self, elapsed):
+        """Per-endpoint stats: requests, rps, error rate, latencies."""
+        rows = {}
+        for name in self.names:
+            values = sorted(self.latencies.get(name, []))
+            if not values:
+                continue
+            rows[name] = {
+                'requests': len(values),
+                'rps': len(values) / elapsed,
+                'error_rate': self.errors[name] / len(values),
+                'p50_ms': percentile(values, 50) * 1000,
+                'p95_ms': percentile(values, 95) * 1000,
+                'p99_ms': percentile(values, 99) * 1000,
+            }
+        return rows
+
+
+def run_load(base_url, concurrency, duration, mix=None, seed=100,
+             max_requests=0):
+    """Seed users, run the load and return (elapsed, report rows)."""
+    run_id = uuid.uuid4().hex[:8]
+    tokens = seed_users(seed, run_id)
+    load = LoadRun(base_url, mix or DEFAULT_MIX, tokens, run_id)
+    elapsed = asyncio.run(load.run(concurrency, duration, max_requests))
+    return elapsed, load.report(elapsed)
+
+
+def format_report(elapsed, rows):
+    total = sum(row['requests'] for row in rows.values())
+    lines = [
+        f'{total} requests in {elapsed:.1f}s '
+        f'({total / elapsed if elapsed else 0:.1f} req/s)',
+        f"{'endpoint':<10}{'requests':>10}{'req/s':>9}{'errors':>8}"
+        f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}",
+    ]
+    for name, row in rows.items():
+        lines.append(
+            f"{name:<10}{row['requests']:>10}{row['rps']:>9.1f}"
+            f"{row['error_rate']:>8.1%}{row['p50_ms']:>9.1f}"
+            f"{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+        )
+    return '\n'.join(lines)
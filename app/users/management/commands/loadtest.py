@@ -0,0 +1,76 @@
+"""
+Django command to replay a mix of users API traffic against a server
+"""
+import json
+from typing import Any
+from django.core.management.base import BaseCommand, CommandError
+
+from users.loadgen import DEFAULT_MIX, format_report, parse_mix, run_load
+
+
+class Command(BaseCommand):
+    """Django command to load test the users API"""
+
+    help = (
+        'Seed users and replay register/verify/login/me/forgot/reset '
+        'traffic against a running server. Must use the same database as '
+        'the server, since pins are read from it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url', default='http://127.0.0.1:8000'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=20,
+            help='Number of concurrent keep-alive clients.'
+        )
+        parser.add_argument('--duration', type=float, default=30)
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=0,
+            help='Stop after this many requests (0 = run for --duration).'
+        )
+        parser.add_argument(
+            '--seed-users',
+            type=int,
+            default=100,
+            help='Active users with tokens created before the run.'
+        )
+        parser.add_argument(
+            '--mix',
+            default=','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items()),
+            help='Comma separated endpoint=weight pairs.'
+        )
+        parser.add_argument(
+            '--json',
+            dest='json_path',
+            help='Also write the per-endpoint report to this file.'
+        )
+
+    def handle(self, *args: Any, **options: Any):
+        """Entrypoint for command"""
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            f"Running {options['concurrency']} clients against "
+            f"{options['base_url']}..."
+        )
+        elapsed, rows = run_load(
+            options['base_url'],
+            options['concurrency'],
+            options['duration'],
+            mix=mix,
+            seed=options['seed_users'],
+            max_requests=options['requests'],
+        )
+        self.stdout.write(format_report(elapsed, rows))
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump({'elapsed': elapsed, 'endpoints': rows}, f, indent=2)
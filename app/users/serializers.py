@@ -1,18 +1,35 @@
+import logging
+
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from core.models import EmailVerification
 from dj_rest_auth.registration.serializers import RegisterSerializer
 from allauth.account.adapter import get_adapter
-from django.utils.translation import gettext as _
-from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from core.hashing import set_password, verify_password
+from core.pins import (
+    PURPOSE_RESET,
+    ExpiredPin,
+    InvalidPin,
+    get_pin_backend,
+)
+
+logger = logging.getLogger(__name__)
+
+ALREADY_REGISTERED = _(
+    "A user is already registered with this e-mail address."
+)
 
 
 def email_address_exists(email):
     User = get_user_model()
-    exists = User.objects.filter(email__iexact=email).exists()
-    print(f"Checking if email {email} exists: {exists}")
+    exists = User.objects.with_email(email).exists()
+    logger.debug(
+        'Checked whether email exists',
+        extra={'email': email, 'exists': exists},
+    )
     return exists
 
 
@@ -39,11 +56,15 @@ class UserSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         password = validated_data.pop('password', None)
+        # pre-computed by callers that hash off the request thread
+        password_hash = validated_data.pop('password_hash', None)
         name = validated_data.pop('name', None)
         user = super().update(instance, validated_data)
 
-        if password:
-            user.set_password(password)
+        if password_hash:
+            user.password = password_hash
+        elif password:
+            set_password(user, password)
 
         if name:
             user.name = name
@@ -69,11 +90,9 @@ class CustomRegisterSerializer(RegisterSerializer):
         extra_kwargs = {'password': {'write_only': True}}
 
     def validate_email(self, email):
-        email = get_adapter().clean_email(email)
-        if email and email_address_exists(email):
-            raise serializers.ValidationError(
-                _("A user is already registered with this e-mail address."))
-        return email
+        # Uniqueness is left to the unique index on insert; see
+        # `duplicate_email_error`.
+        return get_adapter().clean_email(email)
 
     def validate_password(self, password):
         return get_adapter().clean_password(password)
@@ -97,15 +116,32 @@ class CustomRegisterSerializer(RegisterSerializer):
 
         return super().validate(data)
 
-    def save(self, request):
+    def new_user(self, request):
+        """Build the unsaved user without hashing its password."""
         adapter = get_adapter()
         user = adapter.new_user(request)
         self.cleaned_data = self.get_cleaned_data()
+        self.cleaned_data.pop('password1')
         user = adapter.save_user(request, user, self, commit=False)
         user.is_active = False  # Set user as inactive initially
+        return user
+
+    def duplicate_email_error(self):
+        """
+        The error for an IntegrityError raised while saving, or None if
+        the email is not actually taken and the error is something else.
+        """
+        if email_address_exists(self.validated_data['email']):
+            return serializers.ValidationError({
+                'email': [ALREADY_REGISTERED]
+            })
+        return None
+
+    def save(self, request):
+        user = self.new_user(request)
+        set_password(user, self.validated_data['password'])
         user.save()
         self.custom_signup(request, user)
-        EmailVerification.objects.create(user=user)
         return user
 
 
@@ -126,8 +162,8 @@ class LoginSerializer(serializers.ModelSerializer):
         password = attrs.get('password')
 
         if email and password:
-            user = get_user_model().objects.filter(email=email).first()
-            if user and user.check_password(password):
+            user = get_user_model().objects.with_email(email).first()
+            if user and verify_password(user, password):
                 attrs['user'] = user
                 return attrs
         raise serializers.ValidationError(
@@ -140,7 +176,7 @@ class ForgotPasswordSerializer(serializers.Serializer):
 
     def validate_email(self, value):
         User = get_user_model()
-        if not User.objects.filter(email=value).exists():
+        if not User.objects.with_email(value).exists():
             raise serializers.ValidationError(
                 "User with this email does not exist."
                 )
@@ -157,26 +193,26 @@ class ResetPasswordSerializer(serializers.Serializer):
 
     def validate(self, data):
         User = get_user_model()
-        user = User.objects.filter(email=data['email']).first()
+        user = User.objects.with_email(data['email']).first()
         if not user:
             raise serializers.ValidationError(
                 "User with this email does not exist."
                 )
 
         try:
-            verification = EmailVerification.objects.get(
-                user=user,
-                verification_pin=data['verification_pin'],
+            data['pin_record'] = get_pin_backend().check(
+                user, data['verification_pin'], PURPOSE_RESET
             )
-            if verification.expires_at <= timezone.now():
-                raise serializers.ValidationError(
-                    "Verification pin has expired."
-                    )
-        except EmailVerification.DoesNotExist:
+        except ExpiredPin:
+            raise serializers.ValidationError(
+                "Verification pin has expired."
+                )
+        except InvalidPin:
             raise serializers.ValidationError(
                 "Invalid verification pin."
                 )
 
+        data['user'] = user
         return data
 
 
@@ -185,7 +221,7 @@ class ResendVerificationSerializer(serializers.Serializer):
 
     def validate_email(self, value):
         User = get_user_model()
-        user = User.objects.filter(email=value).first()
+        user = User.objects.with_email(value).first()
         if not user:
             raise serializers.ValidationError(
                 "User with this email does not exist."
@@ -0,0 +1,236 @@
+"""
+Tests for the async auth endpoints in users/async_views.py.
+"""
+import asyncio
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.urls import include, path, reverse
+from drf_spectacular.generators import SchemaGenerator
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import get_token_cache
+from core.models import EmailOutbox
+from core.pins import PURPOSE_RESET, PURPOSE_VERIFY, get_pin_backend
+from core.throttling import get_bucket_store
+from users import async_views
+from users.urls import urlpatterns as users_urlpatterns
+
+# users.urls with USERS_ASYNC_VIEWS on.
+urlpatterns = [
+    path('api/users/', include([
+        path(
+            str(pattern.pattern),
+            async_views.ENDPOINTS.get(pattern.name, pattern.callback),
+            name=pattern.name,
+        )
+        for pattern in users_urlpatterns
+    ])),
+]
+
+
+def create_user(email='user@example.com', password='testpass123',
+                is_active=True):
+    user = get_user_model().objects.create_user(
+        email=email, password=password
+    )
+    user.is_active = is_active
+    user.save()
+    return user
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncAuthApiTests(TestCase):
+    """Test the async endpoints behave like the DRF views."""
+
+    def setUp(self):
+        self.client = APIClient()
+        get_bucket_store().clear()
+
+    def test_views_are_coroutines(self):
+        for view in async_views.ENDPOINTS.values():
+            self.assertTrue(asyncio.iscoroutinefunction(view))
+
+    def test_register_verify_and_login(self):
+        payload = {'email': 'new@example.com', 'password': 'testpass123'}
+        res = self.client.post(reverse('register'), payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.json(), {'detail': 'Verification e-mail sent.'})
+        user = get_user_model().objects.get(email=payload['email'])
+        self.assertFalse(user.is_active)
+        self.assertTrue(user.check_password(payload['password']))
+        self.assertEqual(EmailOutbox.objects.count(), 1)
+
+        pin = get_pin_backend().peek(user, PURPOSE_VERIFY)
+        res = self.client.post(reverse('verify-email'), {
+            'email': payload['email'], 'verification_pin': pin,
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.post(reverse('login'), payload)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        token = Token.objects.get(user=user)
+        self.assertEqual(res.json()['token'], token.key)
+
+    def test_register_duplicate_email_error_format(self):
+        create_user(email='taken@example.com')
+        res = self.client.post(reverse('register'), {
+            'email': 'taken@example.com', 'password': 'testpass123',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.json(), {'email': [
+            'A user is already registered with this e-mail address.'
+        ]})
+
+    def test_register_failure_logged(self):
+        payload = {'email': 'new@example.com', 'password': 'testpass123'}
+        for error in [IntegrityError('other'), RuntimeError('down')]:
+            with patch(
+                'users.async_views._create_registered_user',
+                side_effect=error,
+            ), self.assertLogs('users.async_views', 'ERROR') as logs:
+                res = self.client.post(reverse('register'), payload)
+
+            self.assertEqual(
+                res.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+            self.assertIn('Registration failed', logs.output[0])
+
+    def test_schema_same_as_drf_views(self):
+        drf = SchemaGenerator(patterns=[
+            path('api/users/', include('users.urls')),
+        ]).get_schema(public=True)
+        native = SchemaGenerator(patterns=urlpatterns).get_schema(public=True)
+
+        self.assertEqual(native, drf)
+        self.assertEqual(len(native['paths']), len(users_urlpatterns))
+
+    def test_login_bad_credentials_error_format(self):
+        create_user()
+        res = self.client.post(reverse('login'), {
+            'email': 'user@example.com', 'password': 'wrong',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.json(), {'non_field_errors': [
+            'Unable to log in with provided credentials.'
+        ]})
+
+    def test_login_missing_field(self):
+        res = self.client.post(reverse('login'), {'email': 'a@example.com'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('password', res.json())
+
+    def test_login_unverified_user_gets_new_pin(self):
+        create_user(is_active=False)
+        res = self.client.post(reverse('login'), {
+            'email': 'user@example.com', 'password': 'testpass123',
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(EmailOutbox.objects.count(), 1)
+
+    def test_verify_invalid_pin_error_format(self):
+        create_user(is_active=False)
+        res = self.client.post(reverse('verify-email'), {
+            'email': 'user@example.com', 'verification_pin': '000000',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.json(), ['Invalid verification pin.'])
+
+    def test_forgot_and_reset_password(self):
+        user = create_user()
+        res = self.client.post(
+            reverse('forgot-password'), {'email': user.email}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.post(reverse('reset-password'), {
+            'email': user.email,
+            'verification_pin': get_pin_backend().peek(user, PURPOSE_RESET),
+            'new_password': 'newpassword123',
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.check_password('newpassword123'))
+
+    def test_resend_verification_unknown_email(self):
+        res = self.client.post(
+            reverse('resend-verification'), {'email': 'no@example.com'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.json(), {'email': [
+            'User with this email does not exist.'
+        ]})
+
+    def test_me_requires_token(self):
+        res = self.client.get(reverse('user-detail'))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+    def test_me_retrieve_and_update_password(self):
+        user = create_user()
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        res = self.client.get(reverse('user-detail'))
+        self.assertEqual(res.json(), {'email': user.email, 'name': ''})
+
+        res = self.client.patch(reverse('user-detail'), {
+            'name': 'New Name', 'password': 'newpassword123',
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertEqual(user.name, 'New Name')
+        self.assertTrue(user.check_password('newpassword123'))
+
+    def test_me_update_starts_from_current_row(self):
+        user = create_user()
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.client.get(reverse('user-detail'))
+        # Changed by another process, whose signals do not reach here.
+        get_user_model().objects.filter(pk=user.pk).update(pin_counter=5)
+
+        res = self.client.patch(reverse('user-detail'), {'name': 'New'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertEqual(user.pin_counter, 5)
+
+    def test_me_inactive_cached_user_rejected(self):
+        user = create_user()
+        token = Token.objects.create(user=user)
+        user.is_active = False
+        get_token_cache().set(token.key, token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        res = self.client.get(reverse('user-detail'))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+    def test_method_not_allowed(self):
+        res = self.client.get(reverse('login'))
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.assertEqual(res['Allow'], 'POST')
+
+    @override_settings(THROTTLING={'RATES': {'login': {'ip': '1/min'}}})
+    def test_throttled_login(self):
+        payload = {'email': 'user@example.com', 'password': 'wrong'}
+        self.client.post(reverse('login'), payload)
+        res = self.client.post(reverse('login'), payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '60')
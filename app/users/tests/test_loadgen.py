@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+
+from core.models import EmailVerification
+from core.pins import PURPOSE_VERIFY, get_pin_backend
+from users import loadgen
+
+
+class LoadgenTests(TestCase):
+    def test_parse_mix(self):
+        self.assertEqual(
+            loadgen.parse_mix('login=4,me=20,register'),
+            {'login': 4.0, 'me': 20.0, 'register': 1.0}
+        )
+        with self.assertRaises(ValueError):
+            loadgen.parse_mix('bogus=1')
+
+    def test_percentile(self):
+        values = [float(i) for i in range(1, 101)]
+        self.assertEqual(loadgen.percentile(values, 50), 50.0)
+        self.assertEqual(loadgen.percentile(values, 99), 99.0)
+        self.assertEqual(loadgen.percentile([], 99), 0.0)
+
+    def test_seed_users_creates_active_users_with_tokens(self):
+        tokens = loadgen.seed_users(3, 'test')
+
+        self.assertEqual(len(tokens), 3)
+        for email, key in tokens.items():
+            user = get_user_model().objects.with_email(email).get()
+            self.assertTrue(user.is_active)
+            self.assertTrue(user.check_password(loadgen.PASSWORD))
+            self.assertEqual(Token.objects.get(user=user).key, key)
+
+    def test_peek_pin_reads_outstanding_pin(self):
+        user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        pin = get_pin_backend().issue(user, PURPOSE_VERIFY)
+
+        self.assertEqual(
+            loadgen.peek_pin('test@example.com', PURPOSE_VERIFY), pin
+        )
+        self.assertEqual(EmailVerification.objects.get().verification_pin, pin)
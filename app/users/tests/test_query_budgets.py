@@ -0,0 +1,250 @@
+"""
+Query-count and latency budgets for every route in users/urls.py.
+
+Each endpoint is driven once through the test client. The number of
+SQL queries, the time spent in the database and the wall time are
+compared against query_budgets.json, and a comparison table is printed
+at the end. Run it anywhere with
+
+    python manage.py test users.tests.test_query_budgets \
+        --settings=app.bench_settings
+
+Set UPDATE_QUERY_BUDGETS=1 to rewrite the query budgets from the
+measured counts after an intentional change.
+"""
+import json
+import os
+import time
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import get_token_cache
+from core.pins import PURPOSE_RESET, PURPOSE_VERIFY, get_pin_backend
+from core.throttling import get_bucket_store
+
+BUDGET_FILE = Path(__file__).with_name('query_budgets.json')
+PASSWORD = 'testpass123'
+
+
+class QueryRecorder:
+    """Execute wrapper counting queries and the time spent in them."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+def create_user(email='user@example.com', is_active=True):
+    user = get_user_model().objects.create_user(
+        email=email, password=PASSWORD
+    )
+    user.is_active = is_active
+    user.save()
+    return user
+
+
+def authenticated_client(user):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def register():
+    payload = {'email': 'new@example.com', 'password': PASSWORD}
+    return APIClient(), 'post', reverse('register'), payload
+
+
+def verify_email():
+    user = create_user(is_active=False)
+    pin = get_pin_backend().issue(user, PURPOSE_VERIFY)
+    payload = {'email': user.email, 'verification_pin': pin}
+    return APIClient(), 'post', reverse('verify-email'), payload
+
+
+def login():
+    user = create_user()
+    Token.objects.create(user=user)
+    payload = {'email': user.email, 'password': PASSWORD}
+    return APIClient(), 'post', reverse('login'), payload
+
+
+def forgot_password():
+    user = create_user()
+    payload = {'email': user.email}
+    return APIClient(), 'post', reverse('forgot-password'), payload
+
+
+def reset_password():
+    user = create_user()
+    payload = {
+        'email': user.email,
+        'verification_pin': get_pin_backend().issue(user, PURPOSE_RESET),
+        'new_password': 'newpassword123',
+    }
+    return APIClient(), 'post', reverse('reset-password'), payload
+
+
+def resend_verification():
+    user = create_user(is_active=False)
+    get_pin_backend().issue(user, PURPOSE_VERIFY)
+    payload = {'email': user.email}
+    return APIClient(), 'post', reverse('resend-verification'), payload
+
+
+def me_get():
+    client = authenticated_client(create_user())
+    return client, 'get', reverse('user-detail'), None
+
+
+def me_patch():
+    client = authenticated_client(create_user())
+    return client, 'patch', reverse('user-detail'), {'name': 'New Name'}
+
+
+def me_delete():
+    client = authenticated_client(create_user())
+    return client, 'delete', reverse('user-delete'), None
+
+
+# name -> (scenario, expected status)
+ENDPOINTS = {
+    'register': (register, status.HTTP_201_CREATED),
+    'verify-email': (verify_email, status.HTTP_200_OK),
+    'login': (login, status.HTTP_200_OK),
+    'forgot-password': (forgot_password, status.HTTP_200_OK),
+    'reset-password': (reset_password, status.HTTP_200_OK),
+    'resend-verification': (resend_verification, status.HTTP_200_OK),
+    'user-detail GET': (me_get, status.HTTP_200_OK),
+    'user-detail PATCH': (me_patch, status.HTTP_200_OK),
+    'user-delete': (me_delete, status.HTTP_200_OK),
+}
+
+
+@override_settings(PASSWORD_HASHERS=[
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+])
+class QueryBudgetTests(TestCase):
+    """Fail when an endpoint exceeds its checked-in budget."""
+
+    results = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.budgets = json.loads(BUDGET_FILE.read_text())
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if os.getenv('UPDATE_QUERY_BUDGETS'):
+            for name, result in cls.results.items():
+                cls.budgets.setdefault(name, {'queries': 0, 'max_ms': 1000})
+                cls.budgets[name]['queries'] = result['queries']
+            ordered = {
+                name: cls.budgets[name]
+                for name in ENDPOINTS if name in cls.budgets
+            }
+            BUDGET_FILE.write_text(json.dumps(ordered, indent=2) + '\n')
+        print(cls.format_table())
+
+    @classmethod
+    def format_table(cls):
+        lines = [
+            '',
+            f"{'endpoint':<22}{'queries':>8}{'budget':>8}"
+            f"{'db ms':>9}{'wall ms':>9}",
+        ]
+        for name in ENDPOINTS:
+            result = cls.results.get(name)
+            if result is None:
+                continue
+            budget = cls.budgets.get(name, {}).get('queries', '-')
+            flag = '' if budget == '-' or result['queries'] <= budget \
+                else '  OVER'
+            lines.append(
+                f"{name:<22}{result['queries']:>8}{budget:>8}"
+                f"{result['db_ms']:>9.2f}{result['wall_ms']:>9.2f}{flag}"
+            )
+        return '\n'.join(lines)
+
+    def measure(self, name):
+        scenario, expected_status = ENDPOINTS[name]
+        client, method, url, payload = scenario()
+        get_token_cache().clear()
+        get_bucket_store().clear()
+
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            start = time.perf_counter()
+            res = getattr(client, method)(url, payload)
+            wall_ms = (time.perf_counter() - start) * 1000
+
+        self.assertEqual(res.status_code, expected_status, res.content)
+        result = {
+            'queries': recorder.count,
+            'db_ms': recorder.seconds * 1000,
+            'wall_ms': wall_ms,
+        }
+        self.results[name] = result
+        return result
+
+    def check_budget(self, name):
+        result = self.measure(name)
+        if os.getenv('UPDATE_QUERY_BUDGETS'):
+            return
+        budget = self.budgets.get(name)
+        self.assertIsNotNone(budget, f'No budget for {name}')
+        self.assertLessEqual(
+            result['queries'], budget['queries'],
+            f"{name} ran {result['queries']} queries"
+        )
+        self.assertLessEqual(result['wall_ms'], budget['max_ms'])
+
+    def test_register(self):
+        self.check_budget('register')
+
+    def test_verify_email(self):
+        self.check_budget('verify-email')
+
+    def test_login(self):
+        self.check_budget('login')
+
+    def test_forgot_password(self):
+        self.check_budget('forgot-password')
+
+    def test_reset_password(self):
+        self.check_budget('reset-password')
+
+    def test_resend_verification(self):
+        self.check_budget('resend-verification')
+
+    def test_user_detail_get(self):
+        self.check_budget('user-detail GET')
+
+    def test_user_detail_patch(self):
+        self.check_budget('user-detail PATCH')
+
+    def test_user_delete(self):
+        self.check_budget('user-delete')
+
+    def test_every_route_has_a_budget(self):
+        from users.urls import urlpatterns
+
+        covered = {name.split(' ')[0] for name in ENDPOINTS}
+        self.assertEqual({p.name for p in urlpatterns}, covered)
@@ -1,10 +1,15 @@
-from django.test import TestCase
+from django.contrib.sessions.models import Session
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 from unittest.mock import patch
-from core.models import EmailVerification
+from core.models import EmailOutbox, EmailVerification
+from core.pins import PURPOSE_RESET, PURPOSE_VERIFY, get_pin_backend
+from core.throttling import get_bucket_store
+from users.serializers import CustomRegisterSerializer
+from rest_framework.authtoken.models import Token
 from django.utils import timezone
 from datetime import timedelta
 
@@ -22,6 +27,7 @@ DELETE_URL = reverse('user-delete')
 class UserApiTests(TestCase):
     def setUp(self):
         self.client = APIClient()
+        get_bucket_store().clear()
 
     # User Registration Tests
     @patch('users.views.send_verification_email')
@@ -82,6 +88,46 @@ class UserApiTests(TestCase):
         res = self.client.post(REGISTER_URL, payload)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_user_duplicate_canonical_email(self):
+        get_user_model().objects.create_user(
+            email='Test@Example.com', password='testpass123'
+        )
+        res = self.client.post(REGISTER_URL, {
+            'email': 'test@example.com', 'password': 'testpass123',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.json(), {'email': [
+            'A user is already registered with this e-mail address.'
+        ]})
+        self.assertEqual(get_user_model().objects.count(), 1)
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    def test_create_user_concurrent_duplicate(self):
+        # Another signup for the same email commits between validation
+        # and our insert.
+        validate_email = CustomRegisterSerializer.validate_email
+
+        def race(serializer, email):
+            email = validate_email(serializer, email)
+            get_user_model().objects.create_user(
+                email=email, password='otherpass123'
+            )
+            return email
+
+        payload = {'email': 'test@example.com', 'password': 'testpass123'}
+        with patch.object(CustomRegisterSerializer, 'validate_email', race):
+            res = self.client.post(REGISTER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.json(), {'email': [
+            'A user is already registered with this e-mail address.'
+        ]})
+        user = get_user_model().objects.get(email=payload['email'])
+        self.assertTrue(user.check_password('otherpass123'))
+        self.assertFalse(EmailVerification.objects.exists())
+        self.assertFalse(EmailOutbox.objects.exists())
+
     @patch('users.views.send_verification_email')
     def test_verification_email_sent(self, mock_send_email):
         payload = {
@@ -95,6 +141,20 @@ class UserApiTests(TestCase):
         verification = EmailVerification.objects.get(user=user)
         mock_send_email.assert_called_with(user, verification.verification_pin)
 
+    def test_create_user_queues_verification_email(self):
+        payload = {
+            'email': 'test@example.com',
+            'password': 'testpass123',
+        }
+        res = self.client.post(REGISTER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        user = get_user_model().objects.get(email=payload['email'])
+        verification = EmailVerification.objects.get(user=user)
+        queued = EmailOutbox.objects.get(recipients=[payload['email']])
+        self.assertEqual(queued.status, EmailOutbox.STATUS_PENDING)
+        self.assertIn(verification.verification_pin, queued.body)
+
     @patch('users.views.send_verification_email')
     def test_create_user_email_fails(self, mock_send_email):
         mock_send_email.side_effect = Exception("Email sending failed")
@@ -385,6 +445,45 @@ class UserApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertIn('token', res.data)
 
+    @override_settings(API_LOGIN_MODE='token')
+    def test_login_token_mode_skips_session(self):
+        # Test token mode returns the existing token in two queries
+        user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        token = Token.objects.create(user=user)
+        payload = {
+            'email': 'test@example.com',
+            'password': 'testpass123'
+        }
+        with self.assertNumQueries(2):
+            res = self.client.post(LOGIN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['token'], token.key)
+        self.assertNotIn('sessionid', res.cookies)
+        self.assertFalse(Session.objects.exists())
+        user.refresh_from_db()
+        self.assertIsNone(user.last_login)
+
+    @override_settings(API_LOGIN_MODE='token')
+    def test_login_token_mode_creates_token(self):
+        # Test token mode issues a token on first login
+        user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123'
+        )
+        payload = {
+            'email': 'test@example.com',
+            'password': 'testpass123'
+        }
+        res = self.client.post(LOGIN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['token'], Token.objects.get(user=user).key)
+        self.assertFalse(Session.objects.exists())
+
     def test_login_unverified_user(self):
         # Test login attempt with unverified user
         user = get_user_model().objects.create_user(
@@ -444,6 +543,55 @@ class UserApiTests(TestCase):
         self.assertTrue(user.check_password('newpassword123'))
 
 
+@override_settings(VERIFICATION_PIN={
+    'BACKEND': 'core.pins.HmacPinBackend',
+    'WINDOW': 3600,
+})
+class HmacPinApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        get_bucket_store().clear()
+
+    @patch('users.views.send_verification_email')
+    def test_register_and_verify(self, mock_send_email):
+        payload = {'email': 'test@example.com', 'password': 'testpass123'}
+        res = self.client.post(REGISTER_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        user = get_user_model().objects.get(email=payload['email'])
+        pin = mock_send_email.call_args[0][1]
+        self.assertEqual(pin, get_pin_backend().issue(user, PURPOSE_VERIFY))
+        self.assertFalse(EmailVerification.objects.exists())
+
+        res = self.client.post(VERIFY_EMAIL_URL, {
+            'email': payload['email'],
+            'verification_pin': pin,
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.is_active)
+        self.assertEqual(user.pin_counter, 1)
+
+    def test_reset_password_pin_single_use(self):
+        user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='oldpassword123'
+        )
+        payload = {
+            'email': 'test@example.com',
+            'verification_pin': get_pin_backend().issue(user, PURPOSE_RESET),
+            'new_password': 'newpassword123'
+        }
+        res = self.client.post(RESET_PASSWORD_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.check_password('newpassword123'))
+
+        res = self.client.post(RESET_PASSWORD_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
 class PrivateUserApiTests(TestCase):
     def setUp(self):
         self.user = get_user_model().objects.create_user(
@@ -498,6 +646,7 @@ class PrivateUserApiTests(TestCase):
 class PublicUserApiTests(TestCase):
     def setUp(self):
         self.client = APIClient()
+        get_bucket_store().clear()
 
     def test_auth_required(self):
         res = self.client.get(ME_URL)
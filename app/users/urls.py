@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.urls import path
+from . import async_views
 from .views import (
     RegisterView,
     VerifyEmailView,
@@ -10,25 +12,38 @@ from .views import (
     UserDeleteView
 )
 
+endpoints = {
+    'register': RegisterView.as_view(),
+    'verify-email': VerifyEmailView.as_view(),
+    'login': LoginView.as_view(),
+    'forgot-password': ForgotPasswordView.as_view(),
+    'reset-password': ResetPasswordView.as_view(),
+    'resend-verification': ResendVerificationView.as_view(),
+    'user-detail': UserDetailView.as_view(),
+    'user-delete': UserDeleteView.as_view(),
+}
+if settings.USERS_ASYNC_VIEWS:
+    endpoints.update(async_views.ENDPOINTS)
+
 urlpatterns = [
-    path('register/', RegisterView.as_view(), name='register'),
-    path('verify-email/', VerifyEmailView.as_view(), name='verify-email'),
-    path('login/', LoginView.as_view(), name='login'),
+    path('register/', endpoints['register'], name='register'),
+    path('verify-email/', endpoints['verify-email'], name='verify-email'),
+    path('login/', endpoints['login'], name='login'),
     path(
         'forgot-password/',
-        ForgotPasswordView.as_view(),
+        endpoints['forgot-password'],
         name='forgot-password'
         ),
     path(
         'reset-password/',
-        ResetPasswordView.as_view(),
+        endpoints['reset-password'],
         name='reset-password'
         ),
     path(
         'resend-verification/',
-        ResendVerificationView.as_view(),
+        endpoints['resend-verification'],
         name='resend-verification'
         ),
-    path('me/', UserDetailView.as_view(), name='user-detail'),
-    path('me/delete/', UserDeleteView.as_view(), name='user-delete'),
+    path('me/', endpoints['user-detail'], name='user-detail'),
+    path('me/delete/', endpoints['user-delete'], name='user-delete'),
 ]
@@ -1,12 +1,29 @@
+import logging
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import transaction
-from django.utils import timezone
+from django.db import IntegrityError, transaction
 
 from rest_framework import generics, status
 from rest_framework.exceptions import ValidationError
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import (
+    SAFE_METHODS,
+    AllowAny,
+    IsAuthenticated,
+)
 from rest_framework.response import Response
 from django.contrib.auth import login
+from core.authentication import current_user
+from core.hashing import set_password
+from core.payload_cache import add_validators, not_modified, user_payload
+from core.throttling import BucketThrottle
+from core.pins import (
+    PURPOSE_RESET,
+    PURPOSE_VERIFY,
+    ExpiredPin,
+    InvalidPin,
+    get_pin_backend,
+)
 from core.utils import send_verification_email
 
 from core.models import EmailVerification
@@ -22,42 +39,57 @@ from .serializers import (
 
 from rest_framework.authtoken.models import Token
 
+logger = logging.getLogger(__name__)
+
 
 class RegisterView(generics.CreateAPIView):
     queryset = get_user_model().objects.all()
     serializer_class = CustomRegisterSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [BucketThrottle]
+    throttle_scope = 'register'
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
-        print(f"Request data: {request.data}")
-        if serializer.is_valid():
-            print("Serializer is valid")
-        else:
-            print(f"Serializer errors: {serializer.errors}")
+        logger.debug('Registration request', extra={'data': request.data})
+        if not serializer.is_valid():
+            logger.info(
+                'Registration rejected', extra={'errors': serializer.errors}
+            )
         serializer.is_valid(raise_exception=True)
 
+        # The email is not checked up front: the unique index rejects a
+        # taken (or concurrently registered) address on insert, and the
+        # user, pin and outbox rows are written in one transaction.
         try:
             with transaction.atomic():
                 user = serializer.save(request)
-                print(f"User created: {user.email}")
-                verification, created = EmailVerification.objects.get_or_create(user=user) # noqa
-                print(
-                    f"Verification object: {verification}, Created: {created}"
-                    )
-                send_verification_email(user, verification.verification_pin)
+                pin = get_pin_backend().issue(
+                    user, PURPOSE_VERIFY, created=True
+                )
+                send_verification_email(user, pin)
         except ValidationError as e:
             return Response(
                 {"detail": str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        except Exception as e:
-            print(f"An error occurred during registration: {e}")
+        except IntegrityError:
+            error = serializer.duplicate_email_error()
+            if error is not None:
+                raise error
+            logger.exception('Registration failed')
+            return Response(
+                {"detail": "An error occurred during registration. Please try again."}, # noqa
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        except Exception:
+            logger.exception('Registration failed')
             return Response(
                 {"detail": "An error occurred during registration. Please try again."}, # noqa
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+        logger.info('User registered', extra={'user_id': user.pk})
         headers = self.get_success_headers(serializer.data)
         return Response(
             {"detail": "Verification e-mail sent."},
@@ -69,6 +101,8 @@ class RegisterView(generics.CreateAPIView):
 class VerifyEmailView(generics.CreateAPIView):
     serializer_class = EmailVerificationSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [BucketThrottle]
+    throttle_scope = 'verify-email'
 
     def create(self, request, *args, **kwargs):
         verification_pin = request.data.get('verification_pin')
@@ -80,22 +114,16 @@ class VerifyEmailView(generics.CreateAPIView):
             )
 
         try:
-            user = get_user_model().objects.get(email=email)
+            user = get_user_model().objects.with_email(email).get()
             if user.is_active:
                 return Response(
                     {'detail': 'Email is already verified.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            verification = EmailVerification.objects.get(
-                verification_pin=verification_pin,
-                user=user,
-                is_verified=False,
-            )
-            if verification.expires_at <= timezone.now():
-                raise ValidationError("Verification pin has expired.")
-            verification.is_verified = True
-            verification.save()
+            backend = get_pin_backend()
+            record = backend.check(user, verification_pin, PURPOSE_VERIFY)
+            backend.consume(user, record)
             user.is_active = True
             user.save()
             return Response(
@@ -104,13 +132,17 @@ class VerifyEmailView(generics.CreateAPIView):
             )
         except get_user_model().DoesNotExist:
             raise ValidationError("User with this email does not exist.")
-        except EmailVerification.DoesNotExist:
+        except InvalidPin:
             raise ValidationError("Invalid verification pin.")
+        except ExpiredPin:
+            raise ValidationError("Verification pin has expired.")
 
 
 class LoginView(generics.CreateAPIView):
     serializer_class = LoginSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [BucketThrottle]
+    throttle_scope = 'login'
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -118,21 +150,20 @@ class LoginView(generics.CreateAPIView):
         user = serializer.validated_data['user']
 
         if user.is_active:
-            login(
-                request,
-                user,
-                backend='django.contrib.auth.backends.ModelBackend'
-                )
+            if settings.API_LOGIN_MODE == 'session':
+                login(
+                    request,
+                    user,
+                    backend='django.contrib.auth.backends.ModelBackend'
+                    )
             token, created = Token.objects.get_or_create(user=user)
             return Response({
                 "detail": "Login successful.",
                 "token": token.key
             }, status=status.HTTP_200_OK)
         else:
-            verification, created = EmailVerification.objects.get_or_create(user=user) # noqa
-            if not created:
-                verification.generate_new_pin()
-            send_verification_email(user, verification.verification_pin)
+            pin = get_pin_backend().issue(user, PURPOSE_VERIFY)
+            send_verification_email(user, pin)
             return Response(
                 {"detail": "Email not verified. A new verification email has been sent."}, # noqa
                 status=status.HTTP_403_FORBIDDEN
@@ -142,18 +173,17 @@ class LoginView(generics.CreateAPIView):
 class ForgotPasswordView(generics.CreateAPIView):
     serializer_class = ForgotPasswordSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [BucketThrottle]
+    throttle_scope = 'forgot-password'
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         email = serializer.validated_data['email']
-        user = get_user_model().objects.get(email=email)
-
-        verification, created = EmailVerification.objects.get_or_create(user=user) # noqa
-        if not created:
-            verification.generate_new_pin()
+        user = get_user_model().objects.with_email(email).get()
 
-        send_verification_email(user, verification.verification_pin)
+        pin = get_pin_backend().issue(user, PURPOSE_RESET)
+        send_verification_email(user, pin)
 
         return Response(
             {"detail": "Password reset email sent."},
@@ -164,27 +194,22 @@ class ForgotPasswordView(generics.CreateAPIView):
 class ResetPasswordView(generics.CreateAPIView):
     serializer_class = ResetPasswordSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [BucketThrottle]
+    throttle_scope = 'reset-password'
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        user = get_user_model().objects.get(
-            email=serializer.validated_data['email']
-            )
-        verification = EmailVerification.objects.get(
-            user=user,
-            verification_pin=serializer.validated_data['verification_pin']
-        )
+        user = serializer.validated_data['user']
+        record = serializer.validated_data['pin_record']
 
         try:
             password = serializer.validated_data['new_password']
-            user.set_password(password)
+            set_password(user, password)
+            get_pin_backend().consume(user, record)
             user.save()
 
-            verification.is_verified = True
-            verification.save()
-
             return Response(
                 {"detail": "Password has been reset successfully."},
                 status=status.HTTP_200_OK
@@ -199,18 +224,17 @@ class ResetPasswordView(generics.CreateAPIView):
 class ResendVerificationView(generics.CreateAPIView):
     serializer_class = ResendVerificationSerializer
     permission_classes = [AllowAny]
+    throttle_classes = [BucketThrottle]
+    throttle_scope = 'resend-verification'
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         email = serializer.validated_data['email']
-        user = get_user_model().objects.get(email=email)
-
-        verification, created = EmailVerification.objects.get_or_create(user=user) # noqa
-        if not created:
-            verification.generate_new_pin()
+        user = get_user_model().objects.with_email(email).get()
 
-        send_verification_email(user, verification.verification_pin)
+        pin = get_pin_backend().issue(user, PURPOSE_VERIFY)
+        send_verification_email(user, pin)
         return Response(
             {"detail": "Verification email has been resent."},
             status=status.HTTP_200_OK
@@ -222,7 +246,19 @@ class UserDetailView(generics.RetrieveUpdateAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        if self.request.method in SAFE_METHODS:
+            return self.request.user
+        return current_user(self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        etag, data = user_payload(
+            self.get_object(), lambda user: self.get_serializer(user).data
+        )
+        if not_modified(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        return add_validators(response, etag)
 
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
@@ -240,19 +276,12 @@ class UserDetailView(generics.RetrieveUpdateAPIView):
 
         return Response(serializer.data)
 
-    def perform_update(self, serializer):
-        serializer.save()
-        if 'password' in self.request.data:
-            instance = serializer.instance
-            instance.set_password(self.request.data['password'])
-            instance.save()
-
 
 class UserDeleteView(generics.DestroyAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        return current_user(self.request.user)
 
     def destroy(self, request, *args, **kwargs):
         user = self.get_object()